@@ -0,0 +1,127 @@
+import os
+import time
+import tempfile
+from datetime import timedelta
+import streamlit as st
+from data.database.export import EXPORT_FORMATS, write_file
+from data.database.export_store import get_export_store
+from config.logger import setup_logging
+
+# 設置 logger
+logger = setup_logging()
+
+# 匯出格式選項
+FORMAT_OPTIONS = {
+    'CSV': 'csv',
+    'Parquet (zstd)': 'parquet',
+}
+
+# 匯出每日資料預設的天數
+DEFAULT_EXPORT_DAYS = 365
+
+
+def write_table_file(table, fmt: str, path: str) -> int:
+    """將已取回的 Arrow Table（例如篩選結果）寫入檔案"""
+    return write_file([table.to_reader()], fmt, path)
+
+
+def render_export(state, key: str, file_stem: str, export, signature=None):
+    """
+    匯出按鈕與下載連結
+    按下按鈕時以串流寫入本機暫存檔，上傳到 GCS 後刪除，下載使用有期限的簽名網址，
+    檔案不經過 Streamlit 伺服器的記憶體；沒有設定 EXPORT_BUCKET 時（本機開發）改用 st.download_button
+    Args:
+        state: 頁面狀態的字典，保存最近一次匯出的結果
+        key: 元件 key 的前綴
+        file_stem: 檔名（不含副檔名）
+        export: 函數 export(fmt, path)，寫入檔案並回傳筆數
+        signature: 匯出內容的條件，條件改變後不再顯示舊的下載連結
+    """
+    col1, col2 = st.columns([2, 1])
+    with col1:
+        format_labels = list(FORMAT_OPTIONS)
+        format_label = st.selectbox(
+            "檔案格式",
+            options=format_labels,
+            index=format_labels.index(state.get(f'{key}_format', format_labels[0])),
+            key=f"{key}_format_input"
+        )
+        state[f'{key}_format'] = format_label
+    with col2:
+        # 與下拉選單對齊
+        st.markdown("######")
+        generate = st.button("產生下載檔", key=f"{key}_button", use_container_width=True)
+
+    if generate:
+        fmt = FORMAT_OPTIONS[format_label]
+        mime, extension = EXPORT_FORMATS[fmt]
+        file_name = f"{file_stem}.{extension}"
+        store = get_export_store()
+        with st.spinner("正在產生檔案..."), tempfile.TemporaryDirectory(prefix='stockhero-export-') as directory:
+            started = time.perf_counter()
+            path = os.path.join(directory, file_name)
+            rows = export(fmt, path)
+            size = os.path.getsize(path)
+            if store is None:
+                with open(path, 'rb') as f:
+                    download = {'data': f.read()}
+            else:
+                download = store.upload(path, file_name, mime)
+        logger.info(f"Export {file_name} ({size} bytes) ready in {time.perf_counter() - started:.2f}s")
+        state[key] = {'name': file_name, 'mime': mime, 'rows': rows, 'size': size,
+                      'signature': signature, **download}
+
+    result = state.get(key)
+    if not result or result['signature'] != signature:
+        return
+    label = f"⬇️ 下載 {result['name']}"
+    if 'url' in result:
+        if time.time() >= result['expires_at']:
+            st.caption("下載連結已過期，請重新產生")
+            return
+        st.link_button(label, result['url'])
+    else:
+        st.download_button(label, data=result['data'], file_name=result['name'], mime=result['mime'],
+                           key=f"{key}_download")
+    st.caption(f"{result['rows']:,} 筆，{result['size'] / 1024 / 1024:.1f} MB")
+
+
+def render_history_export(db, state, key: str, stock_ids: list, file_stem: str, signature=None):
+    """
+    匯出多檔股票的每日資料，日期區間可涵蓋全部歷史
+    Args:
+        db: DatabaseManager
+        stock_ids: 股票代碼，None 為全部股票
+    """
+    first_date, latest_date = db.get_trading_date_range()
+    if latest_date is None:
+        return
+    default_start = max(first_date, latest_date - timedelta(days=DEFAULT_EXPORT_DAYS))
+    col1, col2 = st.columns(2)
+    with col1:
+        start_date = st.date_input(
+            "開始日期",
+            value=state.get(f'{key}_start_date', default_start),
+            min_value=first_date,
+            max_value=latest_date,
+            key=f"{key}_start_date_input"
+        )
+        state[f'{key}_start_date'] = start_date
+    with col2:
+        end_date = st.date_input(
+            "結束日期",
+            value=state.get(f'{key}_end_date', latest_date),
+            min_value=first_date,
+            max_value=latest_date,
+            key=f"{key}_end_date_input"
+        )
+        state[f'{key}_end_date'] = end_date
+
+    if start_date > end_date:
+        st.warning("開始日期必須早於結束日期")
+        return
+    render_export(
+        state, key, file_stem,
+        lambda fmt, path: db.export_stock_history(stock_ids, start_date, end_date, fmt, path),
+        signature=(signature, start_date, end_date)
+    )
@@ -0,0 +1,252 @@
+import streamlit as st
+import pandas as pd
+import plotly.graph_objects as go
+from plotly.subplots import make_subplots
+from datetime import timedelta
+from data.database.db_manager import get_db_manager
+from data.database.models import StockDB
+from config.logger import setup_logging
+from utils.instrumentation import instrument_page
+
+# 設置 logger
+logger = setup_logging()
+
+# 買賣超以股數儲存，顯示時換算為張
+SHARES_PER_LOT = 1000
+
+INVESTOR_COLORS = {
+    'foreign': 'royalblue',
+    'trust': 'darkorange',
+    'dealer': 'seagreen',
+    'total': 'crimson',
+}
+
+# 排行的累計天數選項，None 為當日買賣超
+WINDOW_OPTIONS = {'當日': None, **{f'{window}日': window for window in StockDB.INSTITUTIONAL_WINDOWS}}
+
+# 個股趨勢預設顯示的天數
+DEFAULT_TREND_DAYS = 120
+
+RANKING_SIZES = [20, 50, 100]
+
+
+def to_lots(values):
+    """股數換算為張（四捨五入），可傳入 Series 或單一數值"""
+    if isinstance(values, pd.Series):
+        return (values / SHARES_PER_LOT).round().astype('Int64')
+    return None if pd.isna(values) else round(values / SHARES_PER_LOT)
+
+
+def build_flow_figure(stock_id, history):
+    """
+    建立法人買賣超圖表：上方為各法人每日買賣超，下方為三大法人合計的累計買賣超
+    Args:
+        stock_id: 股票代碼
+        history: 日期升序的 institutional_daily 資料
+    """
+    fig = make_subplots(
+        rows=2,
+        cols=1,
+        shared_xaxes=True,
+        vertical_spacing=0.1,
+        row_heights=[0.6, 0.4]
+    )
+
+    for investor in ['foreign', 'trust', 'dealer']:
+        fig.add_trace(
+            go.Bar(
+                x=history['date'],
+                y=to_lots(history[f'{investor}_net']),
+                name=StockDB.INSTITUTIONAL_INVESTORS[investor],
+                marker_color=INVESTOR_COLORS[investor],
+                hovertemplate='%{y:,} 張'
+            ),
+            row=1, col=1
+        )
+
+    for window, dash in zip(StockDB.INSTITUTIONAL_WINDOWS, ['dot', 'dash', 'solid']):
+        fig.add_trace(
+            go.Scatter(
+                x=history['date'],
+                y=to_lots(history[f'total_net_{window}']),
+                name=f'合計 {window} 日',
+                line=dict(color=INVESTOR_COLORS['total'], dash=dash),
+                hovertemplate='%{y:,} 張'
+            ),
+            row=2, col=1
+        )
+
+    fig.update_layout(
+        title=f'{stock_id} 三大法人買賣超（張）',
+        barmode='relative',
+        yaxis_title='每日買賣超',
+        yaxis2_title='累計買賣超',
+        height=700,
+        hovermode='x unified',
+        xaxis=dict(hoverformat='%Y/%m/%d', fixedrange=True),
+        xaxis2=dict(hoverformat='%Y/%m/%d', fixedrange=True),
+        yaxis=dict(fixedrange=True),
+        yaxis2=dict(fixedrange=True),
+        dragmode=False
+    )
+    return fig
+
+
+def render_stock_trend(db, state, latest_date):
+    """個股的法人買賣超趨勢，資料與累計值都來自預先計算的 institutional_daily"""
+    def on_stock_id_change():
+        state['stock_id'] = st.session_state.institutional_stock_id_input
+        state.pop('start_date', None)
+
+    stock_id = st.text_input(
+        "請輸入股票代碼",
+        value=state.get('stock_id', ''),
+        placeholder="例如: 2330",
+        key="institutional_stock_id_input",
+        on_change=on_stock_id_change
+    )
+    if not stock_id:
+        return
+
+    def on_start_date_change():
+        state['start_date'] = st.session_state.institutional_start_date_input
+
+    start_date = st.date_input(
+        "開始日期",
+        value=state.get('start_date', latest_date - timedelta(days=DEFAULT_TREND_DAYS)),
+        max_value=latest_date,
+        key="institutional_start_date_input",
+        on_change=on_start_date_change
+    )
+
+    history = db.get_institutional_history(stock_id, start_date, latest_date)
+    if history.empty:
+        st.warning("找不到該股票的法人資料")
+        return
+
+    st.plotly_chart(build_flow_figure(stock_id, history), use_container_width=True)
+
+    # 最新交易日各法人的買賣超、累計值與連續買超天數
+    latest = history.iloc[-1]
+    st.markdown(f"### 最新法人動向（{latest['date']:%Y-%m-%d}）")
+    summary = [
+        {
+            '法人': name,
+            '當日 (張)': to_lots(latest[f'{investor}_net']),
+            **{
+                f'{window}日 (張)': to_lots(latest[f'{investor}_net_{window}'])
+                for window in StockDB.INSTITUTIONAL_WINDOWS
+            },
+            '連續買超天數': latest[f'{investor}_buy_streak'],
+        }
+        for investor, name in StockDB.INSTITUTIONAL_INVESTORS.items()
+    ]
+    # 張數與天數為整數，不指定 format 以保留千分位
+    st.dataframe(summary, use_container_width=True, hide_index=True)
+
+
+def render_market_ranking(db, state, latest_date):
+    """全市場單一交易日的法人買賣超排行，只查詢最新交易日的預先計算欄位"""
+    investor_names = list(StockDB.INSTITUTIONAL_INVESTORS.values())
+    investor_keys = list(StockDB.INSTITUTIONAL_INVESTORS)
+    window_labels = list(WINDOW_OPTIONS)
+
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        investor_name = st.selectbox(
+            "法人",
+            options=investor_names,
+            index=investor_keys.index(state.get('ranking_investor', 'total')),
+            key="ranking_investor_input"
+        )
+        state['ranking_investor'] = investor_keys[investor_names.index(investor_name)]
+    with col2:
+        window_label = st.selectbox(
+            "累計天數",
+            options=window_labels,
+            index=window_labels.index(state.get('ranking_window', '當日')),
+            key="ranking_window_input"
+        )
+        state['ranking_window'] = window_label
+    with col3:
+        direction = st.radio(
+            "排行",
+            options=['買超', '賣超'],
+            index=['買超', '賣超'].index(state.get('ranking_direction', '買超')),
+            horizontal=True,
+            key="ranking_direction_input"
+        )
+        state['ranking_direction'] = direction
+    with col4:
+        limit = st.selectbox(
+            "顯示筆數",
+            options=RANKING_SIZES,
+            index=RANKING_SIZES.index(state.get('ranking_limit', RANKING_SIZES[0])),
+            key="ranking_limit_input"
+        )
+        state['ranking_limit'] = limit
+
+    ranking = db.get_institutional_ranking(
+        latest_date,
+        investor=state['ranking_investor'],
+        window=WINDOW_OPTIONS[window_label],
+        ascending=direction == '賣超',
+        limit=limit
+    )
+    if ranking.empty:
+        st.warning("該交易日沒有法人資料")
+        return
+
+    st.caption(f"{latest_date:%Y-%m-%d} {investor_name}{window_label}{direction}排行")
+    # 查詢結果為共用的快取物件，組成新的 DataFrame 顯示
+    display_df = ranking[['stock_id', 'stock_name', 'industry']].rename(columns={
+        'stock_id': '股票代號',
+        'stock_name': '股票名稱',
+        'industry': '產業別',
+    }).assign(**{
+        '買賣超 (張)': to_lots(ranking['net']),
+        '連續買超天數': ranking['buy_streak'],
+        '收盤價': ranking['closing_price'],
+        '漲跌幅(%)': ranking['change_percent'],
+    })
+    st.dataframe(
+        display_df,
+        use_container_width=True,
+        hide_index=True,
+        column_config={
+            '收盤價': st.column_config.NumberColumn(format='%.2f'),
+            '漲跌幅(%)': st.column_config.NumberColumn(format='%.2f'),
+        }
+    )
+
+
+@instrument_page('institutional')
+def render(state=None):
+    """
+    渲染法人動向頁面
+    Args:
+        state: 用於保存頁面狀態的字典
+    """
+    if state is None:
+        state = {}
+
+    st.markdown("# 👥 法人動向")
+
+    # 取得共用的資料庫連線
+    db = get_db_manager()
+
+    try:
+        latest_date = db.get_institutional_latest_date()
+        if latest_date is None:
+            st.warning("尚無三大法人資料")
+            return
+
+        trend_tab, ranking_tab = st.tabs(['個股趨勢', '市場排行'])
+        with trend_tab:
+            render_stock_trend(db, state, latest_date)
+        with ranking_tab:
+            render_market_ranking(db, state, latest_date)
+
+    except Exception as e:
+        logger.error(f"法人動向發生錯誤: {str(e)}")
+        st.error(f"❌ 載入資料時發生錯誤: {str(e)}")
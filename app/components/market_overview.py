@@ -0,0 +1,134 @@
+import streamlit as st
+import pandas as pd
+import plotly.graph_objects as go
+from data.database.db_manager import get_db_manager
+from config.logger import setup_logging
+from utils.instrumentation import instrument_page
+
+# 設置 logger
+logger = setup_logging()
+
+# 均線的欄位與顯示名稱
+MA_PERIODS = {5: '5日線', 10: '10日線', 20: '20日線', 60: '60日線'}
+
+# 台股慣例：上漲為紅色、下跌為綠色
+SECTOR_COLORSCALE = [[0, '#1a9850'], [0.5, '#f7f7f7'], [1, '#d73027']]
+
+
+def to_share(count, total) -> float:
+    """家數換算為 %，分母為 0 時為 NaN"""
+    return count / total * 100 if total else float('nan')
+
+
+def build_sector_figure(sectors: pd.DataFrame):
+    """產業熱力圖：面積為成交值，顏色為平均漲跌幅"""
+    limit = max(sectors['avg_change_percent'].abs().max(), 0.5)
+    fig = go.Figure(go.Treemap(
+        labels=sectors['industry'],
+        parents=[''] * len(sectors),
+        values=sectors['trade_value'],
+        customdata=sectors[['avg_change_percent', 'advances', 'declines', 'stock_count']],
+        texttemplate='%{label}<br>%{customdata[0]:+.2f}%',
+        hovertemplate=(
+            '%{label}<br>平均漲跌幅 %{customdata[0]:+.2f}%<br>'
+            '上漲 %{customdata[1]} / 下跌 %{customdata[2]} / 共 %{customdata[3]} 檔<extra></extra>'
+        ),
+        marker=dict(
+            colors=sectors['avg_change_percent'],
+            colorscale=SECTOR_COLORSCALE,
+            cmin=-limit,
+            cmax=limit,
+            cmid=0,
+            showscale=True,
+            colorbar=dict(title='%')
+        ),
+    ))
+    fig.update_layout(height=450, margin=dict(t=30, l=10, r=10, b=10))
+    return fig
+
+
+def build_sector_table(sectors: pd.DataFrame) -> pd.DataFrame:
+    """各產業的漲跌家數與平均漲跌幅"""
+    return pd.DataFrame({
+        '產業別': sectors['industry'],
+        '平均漲跌幅(%)': sectors['avg_change_percent'],
+        '上漲': sectors['advances'],
+        '下跌': sectors['declines'],
+        '站上 20 日線(%)': [to_share(count, total) for count, total in zip(sectors['above_ma20'], sectors['ma20_count'])],
+        '成交值 (億)': sectors['trade_value'] / 1e8,
+    })
+
+
+def build_leader_table(leaders) -> pd.DataFrame:
+    """成交量排行，成交量換算為張"""
+    leaders = pd.DataFrame(list(leaders))
+    return pd.DataFrame({
+        '股票代號': leaders['stock_id'],
+        '股票名稱': leaders['stock_name'],
+        '收盤價': leaders['closing_price'],
+        '漲跌幅(%)': leaders['change_percent'],
+        '成交量 (張)': (leaders['trade_volume'] / 1000).round().astype('int64'),
+    })
+
+
+@instrument_page('market_overview')
+def render():
+    """渲染首頁的市場概況，資料於寫入時預先彙總，頁面只讀取一張小表"""
+    db = get_db_manager()
+
+    try:
+        overview = db.get_market_overview()
+        if overview.empty:
+            st.info("尚無市場資料")
+            return
+        market = overview.iloc[0]
+        sectors = overview.iloc[1:]
+
+        st.markdown(f"### 市場概況（{market['date']:%Y/%m/%d}）")
+
+        col1, col2, col3, col4 = st.columns(4)
+        with col1:
+            st.metric("上漲家數", f"{market['advances']:,}")
+        with col2:
+            st.metric("下跌家數", f"{market['declines']:,}")
+        with col3:
+            st.metric("平盤家數", f"{market['unchanged']:,}")
+        with col4:
+            st.metric("成交值 (億)", f"{market['trade_value'] / 1e8:,.0f}")
+
+        st.markdown("#### 站上均線比例")
+        ma_cols = st.columns(len(MA_PERIODS))
+        for col, (period, label) in zip(ma_cols, MA_PERIODS.items()):
+            with col:
+                share = to_share(market[f'above_ma{period}'], market[f'ma{period}_count'])
+                st.metric(label, '-' if pd.isna(share) else f"{share:.1f}%")
+
+        sector_col, leader_col = st.columns([3, 2])
+        with sector_col:
+            st.markdown("#### 產業漲跌")
+            st.plotly_chart(build_sector_figure(sectors), use_container_width=True)
+            st.dataframe(
+                build_sector_table(sectors),
+                use_container_width=True,
+                hide_index=True,
+                column_config={
+                    '平均漲跌幅(%)': st.column_config.NumberColumn(format='%.2f'),
+                    '站上 20 日線(%)': st.column_config.NumberColumn(format='%.1f'),
+                    '成交值 (億)': st.column_config.NumberColumn(format='%.1f'),
+                }
+            )
+        with leader_col:
+            st.markdown("#### 成交量排行")
+            st.dataframe(
+                build_leader_table(market['volume_leaders']),
+                use_container_width=True,
+                hide_index=True,
+                column_config={
+                    '收盤價': st.column_config.NumberColumn(format='%.2f'),
+                    '漲跌幅(%)': st.column_config.NumberColumn(format='%.2f'),
+                }
+            )
+
+    except Exception as e:
+        logger.error(f"市場概況發生錯誤: {str(e)}")
+        st.error(f"❌ 載入資料時發生錯誤: {str(e)}")
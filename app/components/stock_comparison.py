@@ -0,0 +1,176 @@
+import streamlit as st
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+from datetime import timedelta
+from data.database.db_manager import get_db_manager
+from config.config import CHART_MAX_POINTS, COMPARISON_MAX_STOCKS, COMPARISON_CORRELATION_WINDOW
+from config.logger import setup_logging
+from utils.downsample import downsample_series
+from utils.comparison import daily_returns
+from utils.instrumentation import instrument_page
+
+# 設置 logger
+logger = setup_logging()
+
+# 預設比較的天數
+DEFAULT_COMPARISON_DAYS = 365
+
+# 滾動相關係數的交易日數選項
+CORRELATION_WINDOWS = sorted({20, 60, 120, COMPARISON_CORRELATION_WINDOW})
+
+# 一年的交易日數，用於年化波動率
+TRADING_DAYS_PER_YEAR = 252
+
+
+def build_line_figure(dates, matrix, labels, title, yaxis_title):
+    """每檔股票一條線的圖表，資料點過多時以 LTTB 降採樣"""
+    fig = go.Figure()
+    for column, label in enumerate(labels):
+        x, y = dates, matrix[:, column]
+        if len(dates) > CHART_MAX_POINTS:
+            x, y = downsample_series(dates, y, CHART_MAX_POINTS)
+        fig.add_trace(go.Scatter(x=x, y=y, name=label, mode='lines'))
+    fig.update_layout(
+        title=title,
+        yaxis_title=yaxis_title,
+        height=500,
+        hovermode='x unified',
+        xaxis=dict(hoverformat='%Y/%m/%d')
+    )
+    return fig
+
+
+def build_heatmap_figure(correlation, labels):
+    """日報酬相關係數的熱力圖"""
+    fig = go.Figure(go.Heatmap(
+        z=correlation,
+        x=labels,
+        y=labels,
+        zmin=-1,
+        zmax=1,
+        colorscale='RdBu_r',
+        text=np.round(correlation, 2),
+        texttemplate='%{text}',
+        hovertemplate='%{y} / %{x}: %{z:.2f}<extra></extra>'
+    ))
+    fig.update_layout(
+        title='日報酬相關係數',
+        height=max(400, 40 * len(labels) + 150),
+        yaxis=dict(autorange='reversed')
+    )
+    return fig
+
+
+def summarize_comparison(result, labels):
+    """各股票的區間報酬、年化波動率與和基準股票的相關係數"""
+    returns = daily_returns(result['closes'])
+    with np.errstate(invalid='ignore'):
+        volatility = np.nanstd(returns, axis=0, ddof=1) * np.sqrt(TRADING_DAYS_PER_YEAR) * 100
+    return pd.DataFrame({
+        '股票': labels,
+        '區間報酬(%)': result['normalized'][-1],
+        '年化波動率(%)': volatility,
+        '與基準相關係數': result['correlation'][0],
+    })
+
+
+@instrument_page('stock_comparison')
+def render(state=None):
+    """
+    渲染多檔股票比較頁面
+    Args:
+        state: 用於保存頁面狀態的字典
+    """
+    if state is None:
+        state = {}
+
+    st.markdown("# 📊 股票比較")
+
+    # 取得共用的資料庫連線
+    db = get_db_manager()
+
+    try:
+        names = db.get_stock_names()
+        latest_date = db.get_latest_trading_date()
+        if names.empty or latest_date is None:
+            st.warning("尚無股票資料")
+            return
+        name_map = dict(zip(names['stock_id'], names['stock_name']))
+
+        stock_ids = st.multiselect(
+            f"選擇股票（最多 {COMPARISON_MAX_STOCKS} 檔，第一檔為相關係數的比較基準）",
+            options=list(name_map),
+            default=[stock_id for stock_id in state.get('stock_ids', []) if stock_id in name_map],
+            format_func=lambda stock_id: f"{stock_id} {name_map[stock_id]}",
+            max_selections=COMPARISON_MAX_STOCKS,
+            key="comparison_stocks_input"
+        )
+        state['stock_ids'] = stock_ids
+
+        col1, col2, col3 = st.columns([2, 2, 1])
+        with col1:
+            start_date = st.date_input(
+                "開始日期",
+                value=state.get('start_date', latest_date - timedelta(days=DEFAULT_COMPARISON_DAYS)),
+                max_value=latest_date,
+                key="comparison_start_date_input"
+            )
+            state['start_date'] = start_date
+        with col2:
+            end_date = st.date_input(
+                "結束日期",
+                value=state.get('end_date', latest_date),
+                max_value=latest_date,
+                key="comparison_end_date_input"
+            )
+            state['end_date'] = end_date
+        with col3:
+            window = st.selectbox(
+                "相關係數天數",
+                options=CORRELATION_WINDOWS,
+                index=CORRELATION_WINDOWS.index(state.get('window', COMPARISON_CORRELATION_WINDOW)),
+                key="comparison_window_input"
+            )
+            state['window'] = window
+
+        if len(stock_ids) < 2:
+            st.info("請至少選擇兩檔股票")
+            return
+        if start_date >= end_date:
+            st.warning("開始日期必須早於結束日期")
+            return
+
+        result = db.get_stock_comparison(stock_ids, start_date, end_date, window)
+        if len(result['dates']) == 0:
+            st.warning("日期區間內沒有交易資料")
+            return
+
+        labels = [f"{stock_id} {name_map[stock_id]}" for stock_id in result['stock_ids']]
+        st.plotly_chart(
+            build_line_figure(result['dates'], result['normalized'], labels, '累積報酬（%）', '報酬率(%)'),
+            use_container_width=True
+        )
+        st.plotly_chart(
+            build_line_figure(
+                result['dates'], result['rolling_correlation'][:, 1:], labels[1:],
+                f'與 {labels[0]} 的 {window} 日滾動相關係數', '相關係數'
+            ),
+            use_container_width=True
+        )
+        st.plotly_chart(build_heatmap_figure(result['correlation'], labels), use_container_width=True)
+
+        st.dataframe(
+            summarize_comparison(result, labels),
+            use_container_width=True,
+            hide_index=True,
+            column_config={
+                '區間報酬(%)': st.column_config.NumberColumn(format='%.2f'),
+                '年化波動率(%)': st.column_config.NumberColumn(format='%.2f'),
+                '與基準相關係數': st.column_config.NumberColumn(format='%.2f'),
+            }
+        )
+
+    except Exception as e:
+        logger.error(f"股票比較發生錯誤: {str(e)}")
+        st.error(f"❌ 載入資料時發生錯誤: {str(e)}")
@@ -1,61 +1,399 @@
+import threading
+from collections import Counter
 import streamlit as st
 import plotly.graph_objects as go
+import plotly.io as pio
 from plotly.subplots import make_subplots
-from data.database.db_manager import DatabaseManager
-import os
+from data.database.db_manager import get_db_manager
+from data.database.query_cache import QueryCache
 from datetime import datetime, timedelta
+from utils.downsample import choose_resolution, downsample_series
+from config.config import (CHART_MAX_POINTS, FIGURE_CACHE_MAX_BYTES, FIGURE_PREWARM_LIMIT, FIGURE_PREWARM_STOCKS,
+                           SYMBOL_SUGGESTION_LIMIT)
+from config.logger import setup_logging
+from app.components.downloads import render_export
+from utils.instrumentation import instrument_page, metrics
 
+# 設置 logger
+logger = setup_logging()
 
+# K 線週期選項，自動模式會依資料筆數選擇
+RESOLUTION_OPTIONS = {
+    '自動': None,
+    '日K': 'day',
+    '週K': 'week',
+    '月K': 'month',
+}
+RESOLUTION_LABELS = {'day': '日K', 'week': '週K', 'month': '月K'}
+
+# 歷史交易數據表格每頁筆數
+HISTORY_PAGE_SIZE = 100
+
+# 歷史交易數據表格的欄位與顯示名稱
+HISTORY_COLUMNS = {
+    'date': '日期',
+    'opening_price': '開盤價',
+    'highest_price': '最高價',
+    'lowest_price': '最低價',
+    'closing_price': '收盤價',
+    'trade_volume': '成交量',
+    'transaction_count': '成交筆數',
+    'change_percent': '漲跌幅(%)',
+    'ma5': '5日均線',
+    'ma10': '10日均線',
+    'ma20': '20日均線',
+    'ma60': '60日均線'
+}
+
+# 歷史交易數據表格的排序方向
+HISTORY_SORT_ORDERS = {
+    '由大到小': 'descending',
+    '由小到大': 'ascending',
+}
+
+# 預設顯示最近幾天的資料
+DEFAULT_CHART_DAYS = 90
+
+# 技術指標選項，布林通道疊加在 K 線上，其餘各自一個子圖
+INDICATOR_OPTIONS = {
+    '布林通道': 'bollinger',
+    'MACD': 'macd',
+    'RSI': 'rsi',
+    'KD': 'kd',
+}
+INDICATOR_SUBPLOTS = ['macd', 'rsi', 'kd']
+
+
+def add_indicator_traces(fig, indicator_df, indicators, resolution, first_row):
+    """
+    加入預先計算的技術指標，非日 K 時以 LTTB 降採樣
+    Args:
+        indicator_df: 日期升序的 stock_indicators 資料
+        indicators: 要顯示的指標（INDICATOR_OPTIONS 的值）
+        first_row: 第一個指標子圖的列數
+    """
+    def series(column):
+        if resolution == 'day':
+            return indicator_df['date'], indicator_df[column]
+        return downsample_series(indicator_df['date'], indicator_df[column], CHART_MAX_POINTS)
+
+    def line(column, name, color, row, dash=None):
+        dates, values = series(column)
+        fig.add_trace(
+            go.Scatter(x=dates, y=values, name=name, line=dict(color=color, dash=dash, width=1)),
+            row=row, col=1
+        )
+
+    if 'bollinger' in indicators:
+        for column, name in [('bb_upper', '布林上軌'), ('bb_middle', '布林中軌'), ('bb_lower', '布林下軌')]:
+            line(column, name, 'gray', 1, dash='dot')
+
+    for row, indicator in enumerate([i for i in INDICATOR_SUBPLOTS if i in indicators], start=first_row):
+        if indicator == 'macd':
+            dates, values = series('macd_hist')
+            fig.add_trace(
+                go.Bar(
+                    x=dates,
+                    y=values,
+                    name='MACD 柱狀體',
+                    marker_color=['lightcoral' if value > 0 else 'lightgreen' for value in values],
+                ),
+                row=row, col=1
+            )
+            line('macd', 'DIF', 'orange', row)
+            line('macd_signal', 'MACD', 'blue', row)
+        elif indicator == 'rsi':
+            line('rsi', 'RSI', 'purple', row)
+            for level in (70, 30):
+                fig.add_hline(y=level, line_dash='dot', line_color='gray', row=row, col=1)
+        elif indicator == 'kd':
+            line('k', 'K', 'orange', row)
+            line('d', 'D', 'blue', row)
+            for level in (80, 20):
+                fig.add_hline(y=level, line_dash='dot', line_color='gray', row=row, col=1)
+        fig.update_yaxes(title_text=indicator.upper(), fixedrange=True, row=row, col=1)
+        fig.update_xaxes(hoverformat='%Y/%m/%d', fixedrange=True, row=row, col=1)
+
+
+def build_price_figure(stock_id, result, chart_df, resolution, indicator_df=None, indicators=()):
+    """
+    建立 K 線、均線與成交量的圖表
+    Args:
+        stock_id: 股票代碼
+        result: 日期升序的每日資料（均線來源）
+        chart_df: K 線與成交量使用的資料，日 K 時與 result 相同
+        resolution: K 線週期（day / week / month）
+        indicator_df: 日期升序的技術指標資料，沒有選擇指標時可省略
+        indicators: 要顯示的技術指標（INDICATOR_OPTIONS 的值）
+    """
+    subplot_count = len([indicator for indicator in INDICATOR_SUBPLOTS if indicator in indicators])
+    # 建立 K 線圖，每個指標在成交量下方各佔一列
+    fig = make_subplots(
+        rows=2 + subplot_count,
+        cols=1,
+        shared_xaxes=True,
+        vertical_spacing=0.2 if subplot_count == 0 else 0.06,
+        row_heights=[0.7, 0.3] if subplot_count == 0 else [0.5, 0.15] + [0.35 / subplot_count] * subplot_count
+    )
+
+    # K線圖
+    fig.add_trace(
+        go.Candlestick(
+            x=chart_df['date'],
+            open=chart_df['opening_price'],
+            high=chart_df['highest_price'],
+            low=chart_df['lowest_price'],
+            close=chart_df['closing_price'],
+            name='',
+            text=[f'開盤: {open}<br>最高: {high}<br>最低: {low}<br>收盤: {close}<br>量: {volume:,}' 
+                  for open, high, low, close, volume in zip(
+                      chart_df['opening_price'],
+                      chart_df['highest_price'],
+                      chart_df['lowest_price'],
+                      chart_df['closing_price'],
+                      chart_df['trade_volume']
+                  )],
+            hoverinfo='text+name',
+            increasing_line_color='red',
+            decreasing_line_color='lightgreen',
+        ),
+        row=1, col=1
+    )
+
+    # 均線，非日 K 時以 LTTB 降採樣日均線
+    for ma, color in [('ma5', 'orange'), ('ma10', 'blue'), 
+                    ('ma20', 'purple'), ('ma60', 'green')]:
+        if resolution == 'day':
+            ma_dates, ma_values = result['date'], result[ma]
+        else:
+            ma_dates, ma_values = downsample_series(result['date'], result[ma], CHART_MAX_POINTS)
+        fig.add_trace(
+            go.Scatter(
+                x=ma_dates,
+                y=ma_values,
+                name=ma.upper(),
+                line=dict(color=color)
+            ),
+            row=1, col=1
+        )
+
+    # 根據漲跌設定成交量顏色
+    colors = []
+    for change in chart_df['change_percent']:
+        if change > 0:
+            colors.append('lightcoral')
+        elif change < 0:
+            colors.append('lightgreen')
+        else:
+            colors.append('gold')
+
+    # 成交量圖
+    fig.add_trace(
+        go.Bar(
+            x=chart_df['date'],
+            y=chart_df['trade_volume'],
+            name='成交量',
+            marker_color=colors,
+            opacity=0.7,
+            hovertemplate='成交量: %{y:,}<extra></extra>'
+        ),
+        row=2, col=1
+    )
+
+    if indicator_df is not None and indicators:
+        add_indicator_traces(fig, indicator_df, indicators, resolution, first_row=3)
+
+    # 更新版面設置
+    fig.update_layout(
+        title=f'{stock_id} 股價走勢圖（{RESOLUTION_LABELS[resolution]}）',
+        yaxis_title='股價',
+        yaxis2_title='成交量',
+        xaxis_rangeslider_visible=subplot_count == 0,
+        height=800 + 200 * subplot_count,
+        hovermode='x unified',
+        hoverdistance=1,
+        spikedistance=1000,
+        xaxis=dict(
+            showspikes=True,
+            spikesnap='data',
+            spikemode='across',
+            spikethickness=1,
+            spikedash='solid',
+            spikecolor='gray',
+            rangeslider=dict(visible=subplot_count == 0),
+            hoverformat='%Y/%m/%d',
+            fixedrange=True  # 鎖定 X 軸縮放
+        ),
+        xaxis2=dict(
+            hoverformat='%Y/%m/%d',
+            fixedrange=True  # 鎖定第二個 X 軸縮放
+        ),
+        yaxis=dict(
+            showspikes=True,
+            spikesnap='cursor',
+            spikemode='across',
+            spikethickness=1,
+            spikedash='solid',
+            spikecolor='gray',
+            fixedrange=True  # 鎖定 Y 軸縮放
+        ),
+        yaxis2=dict(
+            fixedrange=True  # 鎖定第二個 Y 軸縮放
+        ),
+        dragmode=False  # 禁用拖曳
+    )
+
+    return fig
+
+
+# 建好的圖表物件，以 (股票, 日期區間, K 線週期, 指標) 與資料版本快取，同一程序的所有 session 共用
+# 命中時省去查詢與建立圖表，st.plotly_chart 每次執行仍會將圖表轉為 JSON（約數毫秒）
+figure_cache = QueryCache(max_bytes=FIGURE_CACHE_MAX_BYTES)
+
+# 各股票被查看的次數，資料更新後預先建立最常查看的股票的圖表
+_view_counts = Counter()
+_view_lock = threading.Lock()
+
+
+def figure_size(fig) -> int:
+    """以圖表 JSON 的長度估計快取大小，None（沒有資料）不佔空間"""
+    return len(pio.to_json(fig, validate=False)) if fig is not None else 0
+
+
+def get_price_figure(db, stock_id, start_date, end_date, resolution_option=None, indicators=()):
+    """
+    取得 K 線圖，沒有快取時查詢資料並建立圖表
+    快取的圖表由多個 session 共用，取用後不可修改
+    Args:
+        resolution_option: RESOLUTION_OPTIONS 的值，None 為依資料筆數自動選擇
+        indicators: 要顯示的技術指標（INDICATOR_OPTIONS 的值）
+    Returns:
+        plotly Figure，日期區間內沒有資料時為 None
+    """
+    def _build():
+        history = db.get_stock_history(stock_id, start_date, end_date, arrow=True)
+        if history.num_rows == 0:
+            return None
+        # 查詢結果依日期降序，圖表使用升序的 DataFrame，只在建立圖表時轉換
+        result = history.to_pandas(date_as_object=False).iloc[::-1].reset_index(drop=True)
+
+        # 資料點過多時改以週 K / 月 K 顯示，圖表資料量不隨日期區間無限增加
+        resolution = resolution_option or choose_resolution(len(result))
+        if resolution == 'day':
+            chart_df = result
+        else:
+            chart_df = db.get_stock_history_resampled(stock_id, start_date, end_date, resolution)
+
+        # 技術指標由資料更新時預先計算，只在有選擇時查詢
+        indicator_df = db.get_stock_indicators(stock_id, start_date, end_date) if indicators else None
+        return build_price_figure(stock_id, result, chart_df, resolution, indicator_df, indicators)
+
+    key = (stock_id, start_date, end_date, resolution_option, tuple(indicators))
+    return figure_cache.get_or_load(db.snapshot_version, key, _build, sizer=figure_size)
+
+
+def prewarm_figures(db, limit: int = FIGURE_PREWARM_LIMIT):
+    """程序啟動與資料更新後預先建立最常查看的股票的預設圖表（最近 DEFAULT_CHART_DAYS 天、自動週期、不含指標）"""
+    with _view_lock:
+        stock_ids = [stock_id for stock_id, _ in _view_counts.most_common(limit)]
+    stock_ids += [stock_id for stock_id in FIGURE_PREWARM_STOCKS if stock_id not in stock_ids]
+
+    built = 0
+    for stock_id in stock_ids[:limit]:
+        summary = db.get_stock_summary(stock_id)
+        if summary is None:
+            continue
+        end_date = summary['last_date']
+        get_price_figure(db, stock_id, end_date - timedelta(days=DEFAULT_CHART_DAYS), end_date)
+        built += 1
+    logger.info(f"Prewarmed price figures for {built} stocks")
+
+
+def build_history_table(history, page: int, sort_column: str = 'date', order: str = 'descending'):
+    """
+    歷史交易數據表格的一頁
+    查詢結果已依日期降序，預設排序時切出目前頁面並改為顯示名稱，都不複製資料；保留數值型別，格式交由前端處理
+    其他排序先套用到整段歷史再分頁，同值時依日期降序
+    """
+    if (sort_column, order) != ('date', 'descending'):
+        history = history.sort_by([(sort_column, order), ('date', 'descending')])
+    return (
+        history.slice((page - 1) * HISTORY_PAGE_SIZE, HISTORY_PAGE_SIZE)
+        .select(list(HISTORY_COLUMNS))
+        .rename_columns(list(HISTORY_COLUMNS.values()))
+    )
+
+
+@instrument_page('stock_detail')
 def render(state=None):
     if state is None:
         state = {}
         
     st.markdown("# 📈 股票詳情")
     
-    # 初始化資料庫連接
-    db = DatabaseManager(
-        db_path=os.getenv('DB_PATH', 'StockHero.db'),
-        bucket_name=os.getenv('BUCKET_NAME', 'ian-line-bot-files')
-    )
-    db.connect()
+    # 取得共用的資料庫連線，查詢結果會依資料版本快取
+    db = get_db_manager()
+    # 在背景預先建立熱門股票的圖表，程序第一次開啟頁面時立即執行，之後於資料更新後執行
+    db.add_snapshot_listener(prewarm_figures, run_now=True)
     
     try:
         # 定義股票代碼更新的回調函數
-        def on_stock_id_change():
-            new_stock_id = st.session_state.stock_id_input
+        def on_stock_id_change(new_stock_id=None):
+            if new_stock_id is None:
+                new_stock_id = st.session_state.stock_id_input
             state['stock_id'] = new_stock_id
             # 清除日期選擇的狀態，因為新的股票可能有不同的日期範圍
             state.pop('start_date', None)
             state.pop('end_date', None)
+            state.pop('history_page', None)
 
-        # 搜尋框
+        def on_suggestion_click(suggested_id):
+            # 清除搜尋框的狀態，重新建立時以 state 中的股票代碼為預設值
+            st.session_state.pop('stock_id_input', None)
+            on_stock_id_change(suggested_id)
+
+        # 搜尋框，可輸入代碼或名稱
         search_col1, search_col2 = st.columns([3, 1])
         with search_col1:
-            stock_id = st.text_input(
-                "請輸入股票代碼",
+            query = st.text_input(
+                "請輸入股票代碼或名稱",
                 value=state.get('stock_id', ''),
-                placeholder="例如: 2330",
+                placeholder="例如: 2330 或 台積電",
                 key="stock_id_input",
                 on_change=on_stock_id_change
-            )
-        
+            ).strip()
+
+        # 代碼或名稱完全相同時直接顯示，否則列出搜尋建議
+        stock_id = None
+        if query:
+            symbol_index = db.get_symbol_index()
+            stock_id = symbol_index.resolve(query)
+            if stock_id is None:
+                suggestions = symbol_index.search(query, SYMBOL_SUGGESTION_LIMIT)
+                if suggestions:
+                    st.caption("您要找的是：")
+                    suggestion_cols = st.columns(5)
+                    for i, suggested_id in enumerate(suggestions):
+                        with suggestion_cols[i % 5]:
+                            st.button(
+                                symbol_index.label(suggested_id),
+                                key=f"stock_suggestion_{suggested_id}",
+                                on_click=on_suggestion_click,
+                                args=(suggested_id,),
+                                use_container_width=True
+                            )
+                else:
+                    st.warning("找不到該股票的資料")
+
         if stock_id:
-            # 取得該股票的最早和最晚交易日期
-            date_range_query = """
-                SELECT MIN(date) as min_date, MAX(date) as max_date
-                FROM stock_daily
-                WHERE stock_id = ?
-            """
-            date_range = db.conn.execute(date_range_query, [stock_id]).fetchdf()
+            # 從股票摘要取得最早和最晚交易日期與基本資料
+            summary = db.get_stock_summary(stock_id)
             
-            if not date_range.empty:
-                # 直接使用 Timestamp 對象
-                min_date = date_range['min_date'].iloc[0]
-                max_date = date_range['max_date'].iloc[0]
-                
-                # 將 Timestamp 轉換為 datetime.date 對象
-                min_date = min_date.date()
-                max_date = max_date.date()
+            if summary is None:
+                st.warning("找不到該股票的資料")
+            else:
+                min_date = summary['first_date']
+                max_date = summary['last_date']
                 
                 # 定義日期更新的回調函數
                 def on_start_date_change():
@@ -65,11 +403,11 @@ def render(state=None):
                     state['end_date'] = st.session_state.end_date_input
                 
                 # 從狀態中讀取之前的日期，如果沒有則使用預設值
-                default_start = max_date - timedelta(days=90)
+                default_start = max_date - timedelta(days=DEFAULT_CHART_DAYS)
                 default_end = max_date
                 
                 # 日期選擇器
-                col1, col2 = st.columns(2)
+                col1, col2, col3 = st.columns([2, 2, 1])
                 with col1:
                     start_date = st.date_input(
                         "開始日期",
@@ -91,128 +429,36 @@ def render(state=None):
                     )
                     # 更新狀態
                     state['end_date'] = end_date
+
+                with col3:
+                    resolution_labels = list(RESOLUTION_OPTIONS)
+                    resolution_label = st.selectbox(
+                        "K 線週期",
+                        options=resolution_labels,
+                        index=resolution_labels.index(state.get('resolution', '自動')),
+                        key="resolution_input"
+                    )
+                    state['resolution'] = resolution_label
+
+                indicator_labels = st.multiselect(
+                    "技術指標",
+                    options=list(INDICATOR_OPTIONS),
+                    default=state.get('indicators', []),
+                    key="indicator_input"
+                )
+                state['indicators'] = indicator_labels
                 
-                # 查詢股票資料
-                query = """
-                    SELECT *
-                    FROM stock_daily
-                    WHERE stock_id = ?
-                    AND date BETWEEN ? AND ?
-                    ORDER BY date DESC
-                """
-                result = db.conn.execute(query, [stock_id, start_date, end_date]).fetchdf()
+                # 查詢股票資料（依日期降序的 Arrow Table，表格與最新資料直接切片，不複製）
+                history = db.get_stock_history(stock_id, start_date, end_date, arrow=True)
                 
-                if not result.empty:
-                    # 將資料轉換為正確的時間順序
-                    result = result.sort_values('date')
-                    
-                    # 建立 K 線圖
-                    fig = make_subplots(
-                        rows=2, 
-                        cols=1,
-                        shared_xaxes=True,
-                        vertical_spacing=0.2,
-                        row_heights=[0.7, 0.3]
-                    )
-                    
-                    # K線圖
-                    fig.add_trace(
-                        go.Candlestick(
-                            x=result['date'],
-                            open=result['opening_price'],
-                            high=result['highest_price'],
-                            low=result['lowest_price'],
-                            close=result['closing_price'],
-                            name='',
-                            text=[f'開盤: {open}<br>最高: {high}<br>最低: {low}<br>收盤: {close}<br>量: {volume:,}' 
-                                  for open, high, low, close, volume in zip(
-                                      result['opening_price'],
-                                      result['highest_price'],
-                                      result['lowest_price'],
-                                      result['closing_price'],
-                                      result['trade_volume']
-                                  )],
-                            hoverinfo='text+name',
-                            increasing_line_color='red',
-                            decreasing_line_color='lightgreen',
-                        ),
-                        row=1, col=1
-                    )
-                    
-                    # 均線
-                    for ma, color in [('ma5', 'orange'), ('ma10', 'blue'), 
-                                    ('ma20', 'purple'), ('ma60', 'green')]:
-                        fig.add_trace(
-                            go.Scatter(
-                                x=result['date'],
-                                y=result[ma],
-                                name=ma.upper(),
-                                line=dict(color=color)
-                            ),
-                            row=1, col=1
-                        )
-                    
-                    # 根據漲跌設定成交量顏色
-                    colors = []
-                    for change in result['change_percent']:
-                        if change > 0:
-                            colors.append('lightcoral')
-                        elif change < 0:
-                            colors.append('lightgreen')
-                        else:
-                            colors.append('gold')
-                    
-                    # 成交量圖
-                    fig.add_trace(
-                        go.Bar(
-                            x=result['date'],
-                            y=result['trade_volume'],
-                            name='成交量',
-                            marker_color=colors,
-                            opacity=0.7,
-                            hovertemplate='成交量: %{y:,}<extra></extra>'
-                        ),
-                        row=2, col=1
-                    )
-                    
-                    # 更新版面設置
-                    fig.update_layout(
-                        title=f'{stock_id} 股價走勢圖',
-                        yaxis_title='股價',
-                        yaxis2_title='成交量',
-                        xaxis_rangeslider_visible=True,
-                        height=800,
-                        hovermode='x unified',
-                        hoverdistance=1,
-                        spikedistance=1000,
-                        xaxis=dict(
-                            showspikes=True,
-                            spikesnap='data',
-                            spikemode='across',
-                            spikethickness=1,
-                            spikedash='solid',
-                            spikecolor='gray',
-                            rangeslider=dict(visible=True),
-                            hoverformat='%Y/%m/%d',
-                            fixedrange=True  # 鎖定 X 軸縮放
-                        ),
-                        xaxis2=dict(
-                            hoverformat='%Y/%m/%d',
-                            fixedrange=True  # 鎖定第二個 X 軸縮放
-                        ),
-                        yaxis=dict(
-                            showspikes=True,
-                            spikesnap='cursor',
-                            spikemode='across',
-                            spikethickness=1,
-                            spikedash='solid',
-                            spikecolor='gray',
-                            fixedrange=True  # 鎖定 Y 軸縮放
-                        ),
-                        yaxis2=dict(
-                            fixedrange=True  # 鎖定第二個 Y 軸縮放
-                        ),
-                        dragmode=False  # 禁用拖曳
+                if history.num_rows > 0:
+                    with _view_lock:
+                        _view_counts[stock_id] += 1
+
+                    fig = get_price_figure(
+                        db, stock_id, start_date, end_date,
+                        RESOLUTION_OPTIONS[resolution_label],
+                        [INDICATOR_OPTIONS[label] for label in indicator_labels]
                     )
                     
                     # 顯示圖表
@@ -220,27 +466,20 @@ def render(state=None):
                     
                     st.markdown("---")
                     
-                    # 顯示基本資料
-                    info_query = """
-                        SELECT * 
-                        FROM stock_info 
-                        WHERE stock_id = ?
-                    """
-                    stock_info = db.conn.execute(info_query, [stock_id]).fetchdf()
-                    
-                    if not stock_info.empty:
+                    # 顯示基本資料（沒有 stock_info 的股票，摘要中的產業別為空）
+                    if summary['industry'] is not None:
                         st.markdown("### 股票基本資料")
                         col1, col2, col3 = st.columns(3)
                         with col1:
-                            st.metric("股票名稱", stock_info['stock_name'].iloc[0])
+                            st.metric("股票名稱", summary['stock_name'])
                         with col2:
-                            st.metric("產業別", stock_info['industry'].iloc[0])
+                            st.metric("產業別", summary['industry'])
                         with col3:
-                            st.metric("市場別", stock_info['market_type'].iloc[0])
+                            st.metric("市場別", summary['market_type'])
                     
                     # 顯示最近交易數據
                     st.markdown("### 最近交易數據")
-                    latest_data = result.iloc[-1]
+                    latest_data = history.slice(0, 1).to_pandas().iloc[0]
                     metrics_col1, metrics_col2, metrics_col3, metrics_col4 = st.columns(4)
                     
                     with metrics_col1:
@@ -260,50 +499,112 @@ def render(state=None):
                     # 新增表格顯示
                     st.markdown("### 歷史交易數據")
                     
-                    # 選擇要顯示的欄位並重新命名
-                    display_columns = {
-                        'date': '日期',
-                        'opening_price': '開盤價',
-                        'highest_price': '最高價',
-                        'lowest_price': '最低價',
-                        'closing_price': '收盤價',
-                        'trade_volume': '成交量',
-                        'transaction_count': '成交筆數',
-                        'change_percent': '漲跌幅(%)',
-                        'ma5': '5日均線',
-                        'ma10': '10日均線',
-                        'ma20': '20日均線',
-                        'ma60': '60日均線'
-                    }
-                    
-                    # 準備顯示用的資料框
-                    display_df = result[display_columns.keys()].copy()
-                    
-                    # 依日期降序排序
-                    display_df = display_df.sort_values('date', ascending=False)
-                    
-                    # 重新命名欄位
-                    display_df.columns = display_columns.values()
-                    
-                    # 格式化數值
-                    display_df['日期'] = display_df['日期'].dt.strftime('%Y-%m-%d')
-                    display_df['成交量'] = display_df['成交量'].apply(lambda x: f"{x:,}")
-                    display_df['成交筆數'] = display_df['成交筆數'].apply(lambda x: f"{x:,}")
-                    for col in ['開盤價', '最高價', '最低價', '收盤價', '5日均線', '10日均線', '20日均線', '60日均線']:
-                        display_df[col] = display_df[col].apply(lambda x: f"{x:.2f}")
-                    display_df['漲跌幅(%)'] = display_df['漲跌幅(%)'].apply(lambda x: f"{x:.2f}")
+                    # 表頭的排序只作用於目前頁面，整段歷史的排序由此選擇，切換時回到第一頁
+                    def on_history_sort_change():
+                        state.pop('history_page', None)
+                        st.session_state.pop('history_page_input', None)
+
+                    sort_labels = list(HISTORY_COLUMNS.values())
+                    sort_order_labels = list(HISTORY_SORT_ORDERS)
+                    sort_col1, sort_col2, _ = st.columns([2, 2, 4])
+                    with sort_col1:
+                        sort_label = st.selectbox(
+                            "排序欄位",
+                            options=sort_labels,
+                            index=sort_labels.index(state.get('history_sort', '日期')),
+                            key="history_sort_input",
+                            on_change=on_history_sort_change
+                        )
+                        state['history_sort'] = sort_label
+                    with sort_col2:
+                        sort_order_label = st.selectbox(
+                            "排序方向",
+                            options=sort_order_labels,
+                            index=sort_order_labels.index(state.get('history_sort_order', '由大到小')),
+                            key="history_sort_order_input",
+                            on_change=on_history_sort_change
+                        )
+                        state['history_sort_order'] = sort_order_label
+                    sort_column = list(HISTORY_COLUMNS)[sort_labels.index(sort_label)]
+
+                    # 分頁顯示，只有目前頁面的資料會傳送到瀏覽器
+                    total_rows = history.num_rows
+                    page_count = max(1, -(-total_rows // HISTORY_PAGE_SIZE))
+                    page = min(state.get('history_page', 1), page_count)
+                    if page_count > 1:
+                        page = st.number_input(
+                            "頁數",
+                            min_value=1,
+                            max_value=page_count,
+                            value=page,
+                            step=1,
+                            key="history_page_input"
+                        )
+                    state['history_page'] = page
                     
                     # 顯示表格
                     st.dataframe(
-                        display_df,
+                        build_history_table(history, page, sort_column, HISTORY_SORT_ORDERS[sort_order_label]),
                         use_container_width=True,
                         height=400,
-                        hide_index=True
+                        hide_index=True,
+                        column_config={
+                            '日期': st.column_config.DateColumn(format='YYYY-MM-DD'),
+                            # 成交量與成交筆數為整數欄位，不指定 format 以保留千分位
+                            **{
+                                col: st.column_config.NumberColumn(format='%.2f')
+                                for col in ['開盤價', '最高價', '最低價', '收盤價', '漲跌幅(%)',
+                                            '5日均線', '10日均線', '20日均線', '60日均線']
+                            },
+                        }
                     )
+                    st.caption(
+                        f"第 {page} / {page_count} 頁，共 {total_rows} 筆，依{sort_label}{sort_order_label}排序"
+                        "（點選表頭排序只會排列目前頁面）"
+                    )
+
+                    # 匯出選擇的日期區間內全部的每日資料，不受分頁影響
+                    with st.expander("匯出資料"):
+                        render_export(
+                            state, 'detail_export', f"{stock_id}_history",
+                            lambda fmt, path: db.export_stock_history([stock_id], start_date, end_date, fmt, path),
+                            signature=(stock_id, start_date, end_date)
+                        )
                     
                 else:
                     st.warning("找不到該股票的資料")
     
-    finally:
-        # 關閉資料庫連接
-        db.close()
\ No newline at end of file
+    except Exception as e:
+        logger.error(f"股票詳情發生錯誤: {str(e)}")
+        st.error(f"❌ 載入資料時發生錯誤: {str(e)}")
+    
+    # 查詢快取的命中統計與各查詢、頁面的延遲，用來調整快取容量與找出慢查詢
+    with st.expander("效能監控"):
+        for label, cache in [('查詢快取', db.query_cache), ('圖表快取', figure_cache)]:
+            cache_stats = cache.stats()
+            st.caption(
+                f"{label}：命中 {cache_stats['hits']} / 未命中 {cache_stats['misses']}"
+                f"（命中率 {cache_stats['hit_rate']:.0%}），"
+                f"{cache_stats['entries']} 筆、{cache_stats['bytes'] / 1024 / 1024:.1f} / "
+                f"{cache_stats['max_bytes'] / 1024 / 1024:.0f} MB，淘汰 {cache_stats['evictions']} 筆"
+            )
+        st.dataframe(
+            [
+                {
+                    '種類': entry['kind'],
+                    '名稱': entry['name'],
+                    '次數': entry['count'],
+                    'p50 (ms)': entry['p50_ms'],
+                    'p95 (ms)': entry['p95_ms'],
+                    '最大 (ms)': entry['max_ms'],
+                    '筆數': entry['rows'],
+                    'MB': entry['bytes'] / 1024 / 1024,
+                }
+                for entry in metrics.snapshot()
+            ],
+            hide_index=True,
+            column_config={
+                col: st.column_config.NumberColumn(format='%.1f')
+                for col in ['p50 (ms)', 'p95 (ms)', '最大 (ms)', 'MB']
+            }
+        )
@@ -1,13 +1,49 @@
 import streamlit as st
 import pandas as pd
-from data.database.db_manager import DatabaseManager
-import os
-import json
+import pyarrow as pa
+import pyarrow.compute as pc
+import plotly.graph_objects as go
+from data.database.db_manager import get_db_manager
+from data.database.models import StockDB
+from data.database.screener_rules import RuleError, FIELD_ALIASES, MAX_LOOKBACK
 from config.logger import setup_logging
+from app.components.downloads import render_export, render_history_export, write_table_file
+from utils.instrumentation import instrument_page
 
 # 設置 logger
 logger = setup_logging()
 
+# 定義篩選條件分類
+CONDITION_CATEGORIES = {
+    "站上相關": {
+        "above_ma5": "站上 5 日線",
+        "above_ma10": "站上 10 日線",
+        "above_ma20": "站上 20 日線",
+        "above_ma60": "站上 60 日線"
+    },
+    "成交量相關": {
+        "volume_increase": "成交量大於前日兩倍"
+    }
+}
+
+# 自訂規則的範例
+RULE_EXAMPLES = [
+    "close > ma20 and volume > 2 * avg(volume, 20)",
+    "close >= max(close, 60)",
+    "close > prev(close, 5) * 1.1",
+]
+
+RULE_HELP = f"""
+- 欄位：{'、'.join(f'`{alias}`' for alias in FIELD_ALIASES)}、`ma5`、`ma10`、`ma20`、`ma60`（也可使用資料表欄位名稱）
+- 運算：`+ - * /`、比較 `> >= < <= == !=`，以 `and`、`or`、`not` 與括號組合
+- 函數：`avg / sum / min / max / std(欄位, n)` 為最近 n 個交易日（含當日）的統計，
+  `prev(欄位, n)` 為 n 個交易日前的值（n 省略時為 1），`abs(運算式)` 為絕對值；n 最大為 {MAX_LOOKBACK}
+- 以全部股票的最新交易日計算，資料不足的股票視為不符合
+"""
+
+# 回測結果的統計對象：符合條件的訊號與全市場
+BACKTEST_GROUPS = {'signal': '訊號', 'market': '全市場'}
+
 def create_condition_card(condition_name, condition_key, state):
     """
     創建條件選擇卡片
@@ -43,199 +79,454 @@ def create_condition_card(condition_name, condition_key, state):
     
     return is_selected
 
-def render(state=None):
+def build_condition_filter(selected_conditions, industry=None, stock_ids=None):
     """
-    渲染股票篩選器
+    將勾選的條件、產業別與股票代號搜尋組成 SQL 的 WHERE 條件
     Args:
-        state: 用於保存篩選器狀態的字典
+        selected_conditions: 勾選的條件 key 列表
+        industry: 產業別，None 或 '全部' 表示不篩選
+        stock_ids: 搜尋到的股票代碼，None 表示不篩選
+    Returns:
+        (WHERE 條件字串, 查詢參數列表)
     """
-    if state is None:
-        state = {}
+    clauses = ['conditions IS NOT NULL']
+    params = []
+    for condition in selected_conditions:
+        # 條件 key 直接作為欄位名稱，只接受已定義的條件欄位
+        if condition not in StockDB.CONDITION_COLUMNS:
+            raise ValueError(f"未知的篩選條件: {condition}")
+        clauses.append(condition)
+    if industry and industry != '全部':
+        clauses.append('industry = ?')
+        params.append(industry)
+    if stock_ids is not None:
+        clauses.append('stock_id IN (SELECT UNNEST(?::VARCHAR[]))')
+        params.append(list(stock_ids))
+    return ' AND '.join(clauses), params
 
-    # 使用容器來組織內容
-    with st.container():
-        # 主標題使用更醒目的樣式
-        st.title(" 💎 股票篩選器")
-        st.markdown("---")  # 分隔線
-    
-    # 初始化資料庫連接
-    db_manager = DatabaseManager(
-        db_path=os.getenv('DB_PATH', 'StockHero.db'),
-        bucket_name=os.getenv('BUCKET_NAME', 'ian-line-bot-files')
+def fetch_industry_counts(db_manager, selected_conditions):
+    """依勾選的條件在資料庫中篩選，只取回各產業的符合數量 [(產業別, 數量), ...]"""
+    where_sql, params = build_condition_filter(selected_conditions)
+    with db_manager.cursor('screener_industry_counts') as cur:
+        return cur.execute(f"""
+            SELECT industry, COUNT(*) AS stock_count
+            FROM stock_info
+            WHERE {where_sql}
+            GROUP BY industry
+        """, params).fetchall()
+
+def fetch_screener_table(db_manager, selected_conditions, industry=None, stock_ids=None):
+    """
+    取得篩選結果表格（pyarrow Table），產業別與搜尋到的股票也一併交給資料庫篩選，條件欄位直接在 SQL 中轉為 ✓
+    欄位名稱已是顯示名稱，結果直接交給 st.dataframe，不經過 pandas
+    """
+    where_sql, params = build_condition_filter(selected_conditions, industry, stock_ids)
+    all_conditions = {k: v for d in CONDITION_CATEGORIES.values() for k, v in d.items()}
+    condition_columns = ', '.join(
+        f"CASE WHEN {condition_key} THEN '✓' ELSE '' END AS \"{condition_name}\""
+        for condition_key, condition_name in all_conditions.items()
     )
-    db_manager.connect()
+    with db_manager.cursor('screener_table') as cur:
+        return cur.execute(f"""
+            SELECT
+                industry AS "產業別",
+                stock_id AS "股票代號",
+                stock_name AS "股票名稱",
+                {condition_columns}
+            FROM stock_info
+            WHERE {where_sql}
+            ORDER BY industry, stock_id
+        """, params).fetch_arrow_table()
 
-    try:
-        # 從資料庫獲取所有股票資料
-        query = """
-            SELECT 
-                si.stock_id,
-                si.stock_name,
-                si.industry,
-                si.conditions
-            FROM stock_info si
-            WHERE si.conditions IS NOT NULL
-        """
-        results = db_manager.conn.execute(query).fetchdf()
+def render_condition_screener(db_manager, state):
+    """以預先計算的條件欄位篩選股票"""
+    # 獲取所有條件的 key
+    all_condition_keys = [key for category in CONDITION_CATEGORIES.values() for key in category.keys()]
+
+    # 使用容器來組織篩選條件區域
+    with st.container():
+        st.header("選擇條件")
         
-        # 將 conditions 欄位從 JSON 字串轉換為 Python 字典
-        results['conditions'] = results['conditions'].apply(
-            lambda x: json.loads(x) if isinstance(x, str) else x
-        )
+        # 添加全選/全不選按鈕（所有條件）
+        col1, col2 = st.columns(2)
+        with col1:
+            if st.button("全部選取", key="select_all_conditions"):
+                for key in all_condition_keys:
+                    state[f'condition_{key}'] = True
+        with col2:
+            if st.button("全部取消", key="deselect_all_conditions"):
+                for key in all_condition_keys:
+                    state[f'condition_{key}'] = False
         
-        # 定義篩選條件分類
-        condition_categories = {
-            "站上相關": {
-                "above_ma5": "站上 5 日線",
-                "above_ma10": "站上 10 日線",
-                "above_ma20": "站上 20 日線",
-                "above_ma60": "站上 60 日線"
-            },
-            "成交量相關": {
-                "volume_increase": "成交量大於前日兩倍"
-            }
-        }
+        selected_conditions = []
+        
+        # 使用 tabs 來組織不同類別的條件
+        tabs = st.tabs(list(CONDITION_CATEGORIES.keys()))
+        
+        for tab, (category, conditions) in zip(tabs, CONDITION_CATEGORIES.items()):
+            with tab:
+                # 使用 columns 來創建網格布局
+                num_columns = 2  # 每行顯示的條件數
+                conditions_list = list(conditions.items())
+                
+                for i in range(0, len(conditions_list), num_columns):
+                    cols = st.columns(num_columns)
+                    for j in range(num_columns):
+                        if i + j < len(conditions_list):
+                            condition_key, condition_name = conditions_list[i + j]
+                            with cols[j]:
+                                if create_condition_card(condition_name, condition_key, state):
+                                    selected_conditions.append(condition_key)
+        
+        # 添加分隔線
+        st.markdown("---")
 
-        # 獲取所有條件的 key
-        all_condition_keys = [key for category in condition_categories.values() for key in category.keys()]
+    # 依勾選的條件在資料庫中篩選，只取回各產業的符合數量
+    industry_counts = fetch_industry_counts(db_manager, selected_conditions)
+    total_count = sum(count for _, count in industry_counts)
 
-        # 使用容器來組織篩選條件區域
+    # 顯示篩選結果
+    if total_count:
         with st.container():
-            st.header("選擇條件")
+            st.header("篩選結果")
+            
+            # 在顯示表格前顯示符合條件的股票數量
+            st.markdown(f"🎯 共找到 **{total_count}** 檔符合條件的股票")
             
-            # 添加全選/全不選按鈕（所有條件）
+            # 使用 columns 來並排放置產業別選擇和股票代號搜尋
             col1, col2 = st.columns(2)
-            with col1:
-                if st.button("全部選取", key="select_all_conditions"):
-                    for key in all_condition_keys:
-                        state[f'condition_{key}'] = True
-            with col2:
-                if st.button("全部取消", key="deselect_all_conditions"):
-                    for key in all_condition_keys:
-                        state[f'condition_{key}'] = False
             
-            selected_conditions = []
+            with col1:
+                # 獲取所有唯一的產業別並添加"全部"選項
+                industries = ['全部'] + sorted(industry for industry, _ in industry_counts if industry is not None)
+                
+                # 從狀態中讀取之前選擇的產業別，如果沒有則使用預設值
+                default_industry_index = industries.index(state.get('selected_industry', '全部')) if state.get('selected_industry') in industries else 0
+                
+                # 產業別選擇
+                selected_industry = st.selectbox(
+                    "選擇產業別",
+                    options=industries,
+                    index=default_industry_index,
+                    key="industry_selector"
+                )
+                # 更新狀態
+                state['selected_industry'] = selected_industry
             
-            # 使用 tabs 來組織不同類別的條件
-            tabs = st.tabs(condition_categories.keys())
+            with col2:
+                # 從狀態中讀取之前的搜尋文字
+                default_search = state.get('stock_id_search', '')
+                
+                # 股票代號或名稱搜尋
+                stock_id_search = st.text_input(
+                    "輸入股票代號或名稱",
+                    value=default_search,
+                    placeholder="例如: 2330 或 台積",
+                    help="可輸入完整或部分的股票代號、名稱，名稱中的字不需相連",
+                    key="stock_search"
+                ).strip()
+                # 更新狀態
+                state['stock_id_search'] = stock_id_search
             
-            for tab, (category, conditions) in zip(tabs, condition_categories.items()):
-                with tab:
-                    # 使用 columns 來創建網格布局
-                    num_columns = 2  # 每行顯示的條件數
-                    conditions_list = list(conditions.items())
-                    
-                    for i in range(0, len(conditions_list), num_columns):
-                        cols = st.columns(num_columns)
-                        for j in range(num_columns):
-                            if i + j < len(conditions_list):
-                                condition_key, condition_name = conditions_list[i + j]
-                                with cols[j]:
-                                    if create_condition_card(condition_name, condition_key, state):
-                                        selected_conditions.append(condition_key)
+            # 以共用的搜尋索引找出股票代碼，產業別與搜尋結果一併交給資料庫篩選
+            matched_ids = None
+            if stock_id_search:
+                matched_ids = db_manager.get_symbol_index().search(stock_id_search, industry=False)
+            display_df = fetch_screener_table(
+                db_manager, selected_conditions, selected_industry, matched_ids
+            )
             
-            # 添加分隔線
-            st.markdown("---")
+            # 使用 streamlit 的自動調整大小功能顯示表格
+            st.dataframe(
+                display_df,
+                use_container_width=True,  # 使用容器寬度
+                hide_index=True  # 隱藏索引列
+            )
 
-        # 篩選股票
-        filtered_stocks = results.copy()
-            
-        # 根據選定的條件進行篩選
-        if selected_conditions:
-            for condition in selected_conditions:
-                mask = filtered_stocks['conditions'].apply(
-                    lambda x: isinstance(x, dict) and x.get(condition, False) == True
+            # 匯出篩選結果與符合條件股票的每日資料
+            signature = (tuple(selected_conditions), selected_industry, stock_id_search)
+            with st.expander("匯出資料"):
+                st.markdown("**篩選結果**")
+                render_export(
+                    state, 'screener_table_export', 'screener',
+                    lambda fmt, path: write_table_file(display_df, fmt, path),
+                    signature=signature
                 )
-                filtered_stocks = filtered_stocks[mask]
-
-        # 顯示篩選結果
-        if not filtered_stocks.empty:
-            with st.container():
-                st.header("篩選結果")
-                
-                # 在顯示表格前顯示符合條件的股票數量
-                st.markdown(f"🎯 共找到 **{len(filtered_stocks)}** 檔符合條件的股票")
-                
-                # 使用 columns 來並排放置產業別選擇和股票代號搜尋
-                col1, col2 = st.columns(2)
-                
-                with col1:
-                    # 獲取所有唯一的產業別並添加"全部"選項
-                    industries = ['全部'] + sorted(filtered_stocks['industry'].unique().tolist())
-                    
-                    # 從狀態中讀取之前選擇的產業別，如果沒有則使用預設值
-                    default_industry_index = industries.index(state.get('selected_industry', '全部')) if state.get('selected_industry') in industries else 0
-                    
-                    # 產業別選擇
-                    selected_industry = st.selectbox(
-                        "選擇產業別",
-                        options=industries,
-                        index=default_industry_index,
-                        key="industry_selector"
-                    )
-                    # 更新狀態
-                    state['selected_industry'] = selected_industry
-                
-                with col2:
-                    # 從狀態中讀取之前的搜尋文字
-                    default_search = state.get('stock_id_search', '')
-                    
-                    # 股票代號搜尋
-                    stock_id_search = st.text_input(
-                        "輸入股票代號",
-                        value=default_search,
-                        placeholder="例如: 2330",
-                        help="可輸入完整或部分股票代號進行搜尋",
-                        key="stock_search"
-                    ).strip()
-                    # 更新狀態
-                    state['stock_id_search'] = stock_id_search
-                
-                # 準備顯示資料
-                display_df = pd.DataFrame()
-                
-                # 根據選擇的產業別和股票代號篩選
-                display_data = filtered_stocks
-                
-                if selected_industry != '全部':
-                    display_data = display_data[display_data['industry'] == selected_industry]
-                
-                if stock_id_search:
-                    display_data = display_data[display_data['stock_id'].str.contains(stock_id_search, case=False)]
-                
-                display_df['產業別'] = display_data['industry']
-                display_df['股票代號'] = display_data['stock_id']
-                display_df['股票名稱'] = display_data['stock_name']
-                
-                # 為每個條件創建欄位
-                all_conditions = {k: v for d in condition_categories.values() for k, v in d.items()}
-                for condition_key, condition_name in all_conditions.items():
-                    display_df[condition_name] = display_data['conditions'].apply(
-                        lambda x: '✓' if isinstance(x, dict) and x.get(condition_key, False) else ''
-                    )
-                
-                # 先按產業別排序，再按股票代號排序
-                display_df = display_df.sort_values(['產業別', '股票代號'])
-                
-                # 使用 streamlit 的自動調整大小功能顯示表格
-                st.dataframe(
-                    display_df,
-                    use_container_width=True,  # 使用容器寬度
-                    hide_index=True  # 隱藏索引列
+                st.markdown("**每日資料**（符合條件的股票）")
+                render_history_export(
+                    db_manager, state, 'screener_history_export',
+                    display_df['股票代號'].to_pylist(), 'screener_history',
+                    signature=signature
                 )
+    else:
+        if selected_conditions:
+            st.warning("⚠️ 沒有股票符合所選條件")
         else:
-            if selected_conditions:
-                st.warning("⚠️ 沒有股票符合所選條件")
-            else:
-                # 使用更友善的提示訊息
-                st.info("💡 請在上方選擇至少一個篩選條件來開始篩選股票")
+            # 使用更友善的提示訊息
+            st.info("💡 請在上方選擇至少一個篩選條件來開始篩選股票")
+
+def build_rule_table(result):
+    """
+    自訂規則的顯示表格
+    查詢結果為共用的快取 Arrow Table，以原本的欄位緩衝區組成新的 Table，只有成交量換算為張時產生新欄位
+    """
+    return pa.table({
+        '產業別': result['industry'],
+        '股票代號': result['stock_id'],
+        '股票名稱': result['stock_name'],
+        '收盤價': result['closing_price'],
+        '漲跌幅(%)': result['change_percent'],
+        '成交量 (張)': pc.round(pc.divide(result['trade_volume'], 1000.0)).cast(pa.int64()),
+    })
+
+def render_rule_screener(db_manager, state):
+    """以自訂規則篩選股票，規則編譯為單一 SQL 在全部股票的最新交易日上計算"""
+    st.header("自訂規則")
+    with st.expander("規則語法說明"):
+        st.markdown(RULE_HELP)
+
+    rule = st.text_area(
+        "輸入規則",
+        value=state.get('rule', ''),
+        placeholder=RULE_EXAMPLES[0],
+        help="以 and / or / not 組合條件，可使用欄位、數字與函數",
+        key="screener_rule_input"
+    ).strip()
+    state['rule'] = rule
+
+    if not rule:
+        st.info("💡 請輸入篩選規則，例如：" + "、".join(f"`{example}`" for example in RULE_EXAMPLES))
+        return
+
+    try:
+        result = db_manager.screen_by_rule(rule)
+    except RuleError as e:
+        st.error(f"❌ 規則錯誤：{str(e)}")
+        return
+
+    if result.num_rows == 0:
+        st.warning("⚠️ 沒有股票符合此規則")
+        return
+
+    st.markdown(f"🎯 共找到 **{result.num_rows}** 檔符合規則的股票")
+    st.dataframe(
+        build_rule_table(result),
+        use_container_width=True,
+        hide_index=True,
+        column_config={
+            '收盤價': st.column_config.NumberColumn(format='%.2f'),
+            '漲跌幅(%)': st.column_config.NumberColumn(format='%.2f'),
+        }
+    )
+
+    with st.expander("匯出資料"):
+        st.markdown("**篩選結果**")
+        render_export(
+            state, 'rule_table_export', 'screener_rule',
+            lambda fmt, path: write_table_file(build_rule_table(result), fmt, path),
+            signature=rule
+        )
+        st.markdown("**每日資料**（符合規則的股票）")
+        render_history_export(
+            db_manager, state, 'rule_history_export',
+            result['stock_id'].to_pylist(), 'screener_rule_history',
+            signature=rule
+        )
+
+def to_percent(numerator, count):
+    """加總除以筆數並換算為 %，筆數為 0 時為 NaN，可傳入 Series 或單一數值"""
+    if isinstance(count, pd.Series):
+        return numerator / count.where(count > 0) * 100
+    return numerator / count * 100 if count else float('nan')
+
+def summarize_backtest(totals, horizon):
+    """
+    由加總與筆數計算平均報酬與勝率（%）
+    Args:
+        totals: backtest_conditions 的結果（可為單一年度或加總後的 Series / DataFrame）
+        horizon: 持有天數
+    """
+    summary = {}
+    for group, label in BACKTEST_GROUPS.items():
+        count = totals[f'{group}_count_{horizon}']
+        summary[f'{label}平均報酬(%)'] = to_percent(totals[f'{group}_sum_{horizon}'], count)
+        summary[f'{label}勝率(%)'] = to_percent(totals[f'{group}_hits_{horizon}'], count)
+    summary['超額報酬(%)'] = summary['訊號平均報酬(%)'] - summary['全市場平均報酬(%)']
+    return summary
+
+def build_backtest_figure(yearly, horizon):
+    """各年度訊號與全市場的平均報酬"""
+    summary = summarize_backtest(yearly, horizon)
+    fig = go.Figure()
+    for label, color in zip(BACKTEST_GROUPS.values(), ['crimson', 'gray']):
+        fig.add_trace(go.Bar(
+            x=yearly['year'].astype(str),
+            y=summary[f'{label}平均報酬(%)'],
+            name=label,
+            marker_color=color,
+            hovertemplate='%{y:.2f}%'
+        ))
+    fig.update_layout(
+        title=f'各年度持有 {horizon} 日平均報酬',
+        barmode='group',
+        yaxis_title='平均報酬(%)',
+        height=400,
+        hovermode='x unified',
+        dragmode=False
+    )
+    return fig
+
+def render_backtest(db_manager, state):
+    """回測篩選條件在歷史上每個交易日的表現"""
+    st.header("歷史回測")
+    first_date, last_date = db_manager.get_trading_date_range()
+    if first_date is None:
+        st.warning("尚無每日資料")
+        return
+
+    all_conditions = {k: v for d in CONDITION_CATEGORIES.values() for k, v in d.items()}
+    conditions = st.multiselect(
+        "條件（同時符合）",
+        options=list(all_conditions),
+        default=state.get('backtest_conditions', []),
+        format_func=all_conditions.get,
+        key="backtest_conditions_input"
+    )
+    rule = st.text_input(
+        "自訂規則（可省略）",
+        value=state.get('backtest_rule', ''),
+        placeholder=RULE_EXAMPLES[0],
+        key="backtest_rule_input"
+    ).strip()
+    col1, col2 = st.columns(2)
+    with col1:
+        start_date = st.date_input(
+            "開始日期",
+            value=state.get('backtest_start_date', first_date),
+            min_value=first_date,
+            max_value=last_date,
+            key="backtest_start_date_input"
+        )
+    with col2:
+        end_date = st.date_input(
+            "結束日期",
+            value=state.get('backtest_end_date', last_date),
+            min_value=first_date,
+            max_value=last_date,
+            key="backtest_end_date_input"
+        )
+
+    # 回測需要數秒，只在按下按鈕時執行，結果存入狀態，之後的重新渲染（例如切換持有天數）直接使用
+    if st.button("執行回測", key="run_backtest"):
+        state['backtest_conditions'] = conditions
+        state['backtest_rule'] = rule
+        state['backtest_start_date'] = start_date
+        state['backtest_end_date'] = end_date
+        state.pop('backtest_result', None)
+        if not conditions and not rule:
+            st.warning("⚠️ 請至少選擇一個條件或輸入自訂規則")
+            return
+        try:
+            with st.spinner("回測中..."):
+                state['backtest_result'] = db_manager.backtest_conditions(
+                    conditions, rule or None, start_date, end_date
+                )
+        except RuleError as e:
+            st.error(f"❌ 規則錯誤：{str(e)}")
+            return
+
+    yearly = state.get('backtest_result')
+    if yearly is None:
+        st.info("💡 選擇條件或輸入自訂規則後按下「執行回測」")
+        return
+
+    if yearly.empty or yearly['signals'].sum() == 0:
+        st.warning("⚠️ 回測期間沒有符合條件的訊號")
+        return
+
+    totals = yearly.sum()
+    st.markdown(
+        f"🎯 回測期間共 **{int(totals['signals']):,}** 筆訊號，分布在 **{int(totals['signal_days']):,}** 個交易日"
+    )
+    st.dataframe(
+        pd.DataFrame([
+            {'持有天數': f'{horizon} 日', '訊號筆數': int(totals[f'signal_count_{horizon}']),
+             **summarize_backtest(totals, horizon)}
+            for horizon in StockDB.BACKTEST_HORIZONS
+        ]),
+        use_container_width=True,
+        hide_index=True,
+        column_config={
+            column: st.column_config.NumberColumn(format='%.2f')
+            for column in ['訊號平均報酬(%)', '訊號勝率(%)', '全市場平均報酬(%)', '全市場勝率(%)', '超額報酬(%)']
+        }
+    )
+
+    horizon = st.radio(
+        "持有天數",
+        options=StockDB.BACKTEST_HORIZONS,
+        index=StockDB.BACKTEST_HORIZONS.index(state.get('backtest_horizon', StockDB.BACKTEST_HORIZONS[1])),
+        format_func=lambda days: f'{days} 日',
+        horizontal=True,
+        key="backtest_horizon_input"
+    )
+    state['backtest_horizon'] = horizon
+    st.plotly_chart(build_backtest_figure(yearly, horizon), use_container_width=True)
+    st.dataframe(
+        pd.DataFrame({
+            '年度': yearly['year'].astype(str),
+            '訊號筆數': yearly[f'signal_count_{horizon}'],
+            **summarize_backtest(yearly, horizon),
+        }),
+        use_container_width=True,
+        hide_index=True,
+        column_config={
+            column: st.column_config.NumberColumn(format='%.2f')
+            for column in ['訊號平均報酬(%)', '訊號勝率(%)', '全市場平均報酬(%)', '全市場勝率(%)', '超額報酬(%)']
+        }
+    )
+
+@instrument_page('stock_screener')
+def render(state=None):
+    """
+    渲染股票篩選器
+    Args:
+        state: 用於保存篩選器狀態的字典
+    """
+    if state is None:
+        state = {}
+
+    # 使用容器來組織內容
+    with st.container():
+        # 主標題使用更醒目的樣式
+        st.title(" 💎 股票篩選器")
+        st.markdown("---")  # 分隔線
+    
+    # 取得共用的資料庫連線
+    db_manager = get_db_manager()
+
+    try:
+        # st.tabs 每次重新渲染都會執行所有分頁，改以選項切換，只執行目前的模式
+        modes = {
+            "條件篩選": render_condition_screener,
+            "自訂規則": render_rule_screener,
+            "歷史回測": render_backtest,
+        }
+        mode_labels = list(modes)
+        mode = st.radio(
+            "篩選方式",
+            options=mode_labels,
+            index=mode_labels.index(state.get('screener_mode', mode_labels[0])),
+            horizontal=True,
+            label_visibility="collapsed",
+            key="screener_mode_input"
+        )
+        state['screener_mode'] = mode
+        modes[mode](db_manager, state)
 
     except Exception as e:
         logger.error(f"股票篩選器發生錯誤: {str(e)}")
         st.error(f"❌ 載入資料時發生錯誤: {str(e)}")
-    
-    finally:
-        db_manager.close()
 
 if __name__ == "__main__":
     render()
\ No newline at end of file
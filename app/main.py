@@ -4,15 +4,16 @@ import streamlit as st
 import hmac
 from pathlib import Path
 from dotenv import load_dotenv
-from app.components import stock_screener, stock_detail
+
+# 載入 .env 檔案（需在匯入設定與元件之前）
+load_dotenv()
+
+# 頁面元件（plotly、pandas、duckdb 等）在第一次開啟該頁面時才匯入，登入頁不需要載入
 from config.logger import setup_logging
 
 # 設置 logger
 logger = setup_logging()
 
-# 載入 .env 檔案
-load_dotenv()
-
 # 設置頁面配置
 st.set_page_config(
     page_title="Stock Hero",
@@ -31,6 +32,10 @@ if 'stock_detail_state' not in st.session_state:
     st.session_state.stock_detail_state = {}
 if 'stock_screener_state' not in st.session_state:
     st.session_state.stock_screener_state = {}
+if 'institutional_state' not in st.session_state:
+    st.session_state.institutional_state = {}
+if 'stock_comparison_state' not in st.session_state:
+    st.session_state.stock_comparison_state = {}
 
 def check_password():
     """檢查密碼是否正確"""
@@ -66,7 +71,7 @@ if check_password():
         previous_page = st.session_state.current_page  # 保存切換前的頁面
         page = st.selectbox(
             "選擇功能",
-            options=['首頁', '股票詳情', '股票篩選器', '法人動向'],
+            options=['首頁', '股票詳情', '股票比較', '股票篩選器', '法人動向'],
             key='page_selector'
         )
         
@@ -75,6 +80,8 @@ if check_password():
             st.session_state.current_page = 'home'
         elif page == '股票詳情':
             st.session_state.current_page = 'stock_detail'
+        elif page == '股票比較':
+            st.session_state.current_page = 'stock_comparison'
         elif page == '股票篩選器':
             st.session_state.current_page = 'stock_screener'
         elif page == '法人動向':
@@ -84,7 +91,19 @@ if check_password():
         if st.button("登出"):
             st.session_state.authenticated = False
             st.rerun()
-    
+
+    # 資料庫結構比程式舊時顯示轉換說明，不載入頁面；寫入端發布新版本後自動恢復
+    from data.database.db_manager import get_db_manager
+    db = get_db_manager()
+    schema_error = db.check_schema()
+    if schema_error:
+        st.error(f"⚠️ 資料庫尚未更新：{schema_error}")
+        st.stop()
+
+    # 程序啟動後第一次登入時在背景預先建立熱門股票的圖表，之後於每次資料更新後重建
+    from app.components.stock_detail import prewarm_figures
+    db.add_snapshot_listener(prewarm_figures, run_now=True)
+
     # 根據當前頁面顯示相應的內容
     if st.session_state.current_page == 'home':
         st.markdown("# Stock Hero 📈")
@@ -94,10 +113,22 @@ if check_password():
         請從左側選單選擇功能：
         
         - 📈 **股票詳情**：查看個股詳細資訊            
+        - 📊 **股票比較**：比較多檔股票的報酬與相關性
         - 💎 **股票篩選器**：依照條件篩選股票
         - 👥 **法人動向**：查看個股法人買賣超趨勢
         """)
+        # 市場概況於寫入資料時預先彙總，登入後才載入資料庫與圖表套件
+        from app.components import market_overview
+        market_overview.render()
     elif st.session_state.current_page == 'stock_detail':
+        from app.components import stock_detail
         stock_detail.render(state=st.session_state.stock_detail_state)
+    elif st.session_state.current_page == 'stock_comparison':
+        from app.components import stock_comparison
+        stock_comparison.render(state=st.session_state.stock_comparison_state)
     elif st.session_state.current_page == 'stock_screener':
+        from app.components import stock_screener
         stock_screener.render(state=st.session_state.stock_screener_state)
+    elif st.session_state.current_page == 'institutional':
+        from app.components import institutional
+        institutional.render(state=st.session_state.institutional_state)
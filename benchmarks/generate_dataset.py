@@ -0,0 +1,129 @@
+"""
+產生模擬台股資料的 StockHero.db，供效能測試使用
+
+用法:
+    python benchmarks/generate_dataset.py --path bench/StockHero.db --symbols 2000 --years 10
+"""
+import sys, os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import argparse
+import time
+from datetime import date
+import duckdb
+import numpy as np
+import pandas as pd
+from data.database.db_manager import DatabaseManager
+
+INDUSTRIES = [
+    '半導體業', '電子零組件業', '光電業', '電腦及週邊設備業', '通信網路業', '其他電子業',
+    '金融保險業', '航運業', '鋼鐵工業', '塑膠工業', '生技醫療業', '食品工業', '建材營造業', '紡織纖維',
+]
+NAME_HEADS = list('台聯華鴻國中新永大長南東富元宏友群日光上')
+NAME_TAILS = ['電', '積電', '科', '光電', '化', '鋼', '航', '金', '紡', '通', '達', '電子', '精密', '材料', '生技']
+
+# 每批寫入的股票數，避免一次產生整個市場的資料
+SYMBOLS_PER_BATCH = 200
+
+def trading_days(years: int, end: date) -> np.ndarray:
+    """產生 years 年內的平日作為交易日"""
+    start = date(end.year - years, end.month, 1)
+    all_days = np.arange(np.datetime64(start), np.datetime64(end) + 1, dtype='datetime64[D]')
+    return all_days[np.is_busday(all_days)]
+
+def simulate_symbol(rng, stock_id: str, stock_name: str, days: np.ndarray) -> pd.DataFrame:
+    """以幾何隨機漫步模擬單一股票的每日行情，漲跌幅限制在 ±10%"""
+    # 部分股票較晚上市
+    if rng.random() < 0.2:
+        days = days[rng.integers(0, len(days) - 60):]
+    n = len(days)
+
+    returns = np.clip(rng.normal(0.0003, 0.02, n), -0.1, 0.1)
+    close = np.round(rng.uniform(10, 600) * np.exp(np.cumsum(returns)), 2)
+    prev_close = np.concatenate([[close[0]], close[:-1]])
+    opening = np.round(prev_close * (1 + rng.normal(0, 0.005, n)), 2)
+    high = np.round(np.maximum(opening, close) * (1 + np.abs(rng.normal(0, 0.008, n))), 2)
+    low = np.round(np.minimum(opening, close) * (1 - np.abs(rng.normal(0, 0.008, n))), 2)
+    volume = (rng.lognormal(13, 1.0, n)).astype(np.int64)
+
+    return pd.DataFrame({
+        'date': days,
+        'stock_id': stock_id,
+        'stock_name': stock_name,
+        'trade_volume': volume,
+        'trade_value': (volume * close).astype(np.int64),
+        'opening_price': opening,
+        'highest_price': high,
+        'lowest_price': low,
+        'closing_price': close,
+        'price_change': np.round(close - prev_close, 2),
+        'change_percent': np.round((close - prev_close) / prev_close * 100, 2),
+        'transaction_count': (volume / rng.uniform(500, 3000)).astype(np.int32) + 1,
+    })
+
+def simulate_institutional(rng, daily: pd.DataFrame) -> pd.DataFrame:
+    """依成交量模擬三大法人買賣超股數，外資買賣方向以指數平滑產生連續買超 / 賣超"""
+    n = len(daily)
+    volume = daily['trade_volume'].to_numpy()
+    foreign_trend = pd.Series(rng.normal(0, 1, n)).ewm(alpha=0.3).mean().to_numpy()
+    return pd.DataFrame({
+        'date': daily['date'],
+        'stock_id': daily['stock_id'],
+        'stock_name': daily['stock_name'],
+        'foreign_net': (volume * 0.2 * foreign_trend).astype(np.int64),
+        'trust_net': (volume * rng.normal(0, 0.03, n)).astype(np.int64),
+        'dealer_net': (volume * rng.normal(0, 0.05, n)).astype(np.int64),
+    })
+
+def generate(path: str, symbols: int, years: int, seed: int):
+    """產生資料庫：stock_info、stock_daily、institutional_daily，並計算均線與篩選條件"""
+    if os.path.exists(path):
+        os.remove(path)
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    # 先建立空檔案，避免 DatabaseManager 嘗試從 GCS 下載
+    duckdb.connect(path).close()
+
+    rng = np.random.default_rng(seed)
+    db = DatabaseManager(db_path=path, bucket_name='')
+    db.connect()
+    days = trading_days(years, date.today())
+    stock_ids = [str(1101 + i) for i in range(symbols)]
+    names = {
+        stock_id: f"{rng.choice(NAME_HEADS)}{rng.choice(NAME_HEADS)}{rng.choice(NAME_TAILS)}"
+        for stock_id in stock_ids
+    }
+
+    started = time.perf_counter()
+    for stock_id in stock_ids:
+        market_type = '上市' if rng.random() < 0.55 else '上櫃'
+        db.upsert_stock_info(
+            stock_id, names[stock_id], str(rng.choice(INDUSTRIES)), True,
+            market_type, 'twse' if market_type == '上市' else 'tpex'
+        )
+
+    for i in range(0, symbols, SYMBOLS_PER_BATCH):
+        batch = pd.concat([
+            simulate_symbol(rng, stock_id, names[stock_id], days)
+            for stock_id in stock_ids[i:i + SYMBOLS_PER_BATCH]
+        ], ignore_index=True)
+        db.upsert_daily_frame(batch)
+        db.upsert_institutional_frame(simulate_institutional(rng, batch))
+
+    db.update_moving_averages(full=True)
+    db.update_indicators(full=True)
+    db.evaluate_stock_conditions()
+    rows = db.conn.execute("SELECT COUNT(*) FROM stock_daily").fetchone()[0]
+    db.conn.execute("CHECKPOINT")
+    db.close()
+    print(f"Generated {path}: {symbols} symbols, {rows} daily rows in {time.perf_counter() - started:.1f}s")
+
+def main():
+    parser = argparse.ArgumentParser(description='產生模擬的 StockHero.db')
+    parser.add_argument('--path', default='bench/StockHero.db', help='輸出的資料庫路徑')
+    parser.add_argument('--symbols', type=int, default=2000, help='股票數量')
+    parser.add_argument('--years', type=int, default=10, help='歷史資料年數')
+    parser.add_argument('--seed', type=int, default=42, help='亂數種子')
+    args = parser.parse_args()
+    generate(args.path, args.symbols, args.years, args.seed)
+
+if __name__ == '__main__':
+    main()
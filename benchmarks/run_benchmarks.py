@@ -0,0 +1,543 @@
+"""
+StockHero 熱路徑的效能測試，結果以 JSON 輸出，可與前一次的結果比較找出效能退化
+
+用法:
+    python benchmarks/generate_dataset.py --path bench/StockHero.db
+    python benchmarks/run_benchmarks.py --db bench/StockHero.db --output bench/results.json
+    python benchmarks/run_benchmarks.py --db bench/StockHero.db --baseline bench/results.json
+    python benchmarks/run_benchmarks.py --db bench/StockHero.db --only screener_rule --memory
+"""
+import sys, os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import argparse
+import json
+import platform
+import shutil
+import statistics
+import subprocess
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+import duckdb
+from data.database.db_manager import DatabaseManager
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 已註冊的效能測試：名稱 -> 函數(ctx)，函數回傳要計時的 callable，或 (setup, run)
+BENCHMARKS = {}
+
+def benchmark(name: str):
+    """註冊效能測試"""
+    def decorator(func):
+        BENCHMARKS[name] = func
+        return func
+    return decorator
+
+class BenchContext:
+    """效能測試共用的資料庫連線與樣本資料"""
+    def __init__(self, db_path: str, workdir: str):
+        self.db_path = db_path
+        self.workdir = workdir
+        self.reader = DatabaseManager(db_path=db_path, bucket_name='', read_only=True)
+        self.reader.connect()
+        self._writer = None
+        with self.reader.cursor() as cur:
+            self.max_date = cur.execute("SELECT MAX(date) FROM stock_daily").fetchone()[0]
+            self.min_date = cur.execute("SELECT MIN(date) FROM stock_daily").fetchone()[0]
+            # 以資料最完整的股票作為個股頁面的樣本
+            self.stock_id = cur.execute("""
+                SELECT stock_id FROM stock_daily GROUP BY stock_id ORDER BY COUNT(*) DESC, stock_id LIMIT 1
+            """).fetchone()[0]
+
+    @property
+    def writer(self) -> DatabaseManager:
+        """寫入類測試使用資料庫副本，避免修改原始資料"""
+        if self._writer is None:
+            copy_path = os.path.join(self.workdir, 'StockHero.bench.db')
+            shutil.copy(self.db_path, copy_path)
+            self._writer = DatabaseManager(db_path=copy_path, bucket_name='')
+            self._writer.connect()
+        return self._writer
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+        self.reader.close()
+
+# --- 股票篩選器 ---
+
+@benchmark('screener_filter')
+def bench_screener_filter(ctx):
+    from app.components.stock_screener import fetch_industry_counts, fetch_screener_table
+
+    def run():
+        conditions = ['above_ma5', 'above_ma20']
+        fetch_industry_counts(ctx.reader, conditions)
+        fetch_screener_table(ctx.reader, conditions)
+    return run
+
+@benchmark('screener_all_stocks')
+def bench_screener_all_stocks(ctx):
+    from app.components.stock_screener import fetch_industry_counts, fetch_screener_table
+
+    def run():
+        fetch_industry_counts(ctx.reader, [])
+        fetch_screener_table(ctx.reader, [])
+    return run
+
+@benchmark('screener_rule')
+def bench_screener_rule(ctx):
+    def run():
+        ctx.reader.query_cache.clear()
+        ctx.reader.screen_by_rule('close > ma20 and volume > 2 * avg(volume, 20)')
+    return run
+
+@benchmark('screener_rule_60d')
+def bench_screener_rule_60d(ctx):
+    def run():
+        ctx.reader.query_cache.clear()
+        ctx.reader.screen_by_rule('close >= max(close, 60) and std(change_pct, 60) < 3')
+    return run
+
+@benchmark('screener_table_display')
+def bench_screener_table_display(ctx):
+    from streamlit.dataframe_util import convert_anything_to_arrow_bytes
+    from app.components.stock_screener import fetch_screener_table
+
+    def run():
+        # 包含 st.dataframe 轉為 Arrow IPC 的成本
+        convert_anything_to_arrow_bytes(fetch_screener_table(ctx.reader, []))
+    return run
+
+@benchmark('screener_rule_display')
+def bench_screener_rule_display(ctx):
+    from streamlit.dataframe_util import convert_anything_to_arrow_bytes
+    from app.components.stock_screener import build_rule_table
+
+    def run():
+        ctx.reader.query_cache.clear()
+        convert_anything_to_arrow_bytes(build_rule_table(ctx.reader.screen_by_rule('close > prev(close) * 0.9')))
+    return run
+
+@benchmark('backtest_conditions_all')
+def bench_backtest_conditions_all(ctx):
+    def run():
+        ctx.reader.query_cache.clear()
+        ctx.reader.backtest_conditions(['above_ma5', 'volume_increase'])
+    return run
+
+@benchmark('backtest_rule_all')
+def bench_backtest_rule_all(ctx):
+    def run():
+        ctx.reader.query_cache.clear()
+        ctx.reader.backtest_conditions([], 'close > ma20 and volume > 2 * avg(volume, 20)')
+    return run
+
+# --- 股票詳情 ---
+
+def _detail_queries(ctx, days: int, cached: bool):
+    start = max(ctx.min_date, ctx.max_date - timedelta(days=days))
+
+    def run():
+        if not cached:
+            ctx.reader.query_cache.clear()
+        ctx.reader.get_stock_summary(ctx.stock_id)
+        ctx.reader.get_stock_history(ctx.stock_id, start, ctx.max_date)
+    return run
+
+@benchmark('detail_query_90d')
+def bench_detail_query_90d(ctx):
+    return _detail_queries(ctx, 90, cached=False)
+
+@benchmark('detail_query_10y')
+def bench_detail_query_10y(ctx):
+    return _detail_queries(ctx, 3650, cached=False)
+
+@benchmark('detail_query_10y_cached')
+def bench_detail_query_10y_cached(ctx):
+    return _detail_queries(ctx, 3650, cached=True)
+
+def _detail_figure(ctx, days: int):
+    from app.components.stock_detail import build_price_figure
+    from utils.downsample import choose_resolution
+    start = max(ctx.min_date, ctx.max_date - timedelta(days=days))
+    result = ctx.reader.get_stock_history(ctx.stock_id, start, ctx.max_date).sort_values('date')
+    resolution = choose_resolution(len(result))
+    if resolution == 'day':
+        chart_df = result
+    else:
+        chart_df = ctx.reader.get_stock_history_resampled(ctx.stock_id, start, ctx.max_date, resolution)
+
+    def run():
+        # 包含序列化，反映實際送到瀏覽器的成本
+        build_price_figure(ctx.stock_id, result, chart_df, resolution).to_json()
+    return run
+
+@benchmark('detail_figure_90d')
+def bench_detail_figure_90d(ctx):
+    return _detail_figure(ctx, 90)
+
+@benchmark('detail_figure_10y')
+def bench_detail_figure_10y(ctx):
+    return _detail_figure(ctx, 3650)
+
+@benchmark('detail_table_10y')
+def bench_detail_table_10y(ctx):
+    from streamlit.dataframe_util import convert_anything_to_arrow_bytes
+    from app.components.stock_detail import build_history_table
+    start = max(ctx.min_date, ctx.max_date - timedelta(days=3650))
+
+    def run():
+        # 圖表快取命中時，頁面每次重新執行的資料路徑：查詢、最新一筆與第一頁的表格
+        ctx.reader.query_cache.clear()
+        history = ctx.reader.get_stock_history(ctx.stock_id, start, ctx.max_date, arrow=True)
+        history.slice(0, 1).to_pandas().iloc[0]
+        convert_anything_to_arrow_bytes(build_history_table(history, 1))
+    return run
+
+@benchmark('detail_figure_90d_cached')
+def bench_detail_figure_90d_cached(ctx):
+    import plotly.io as pio
+    from app.components.stock_detail import get_price_figure
+    start = max(ctx.min_date, ctx.max_date - timedelta(days=90))
+
+    def run():
+        # 圖表快取命中，包含 st.plotly_chart 每次執行時的 to_dict 與序列化
+        fig = get_price_figure(ctx.reader, ctx.stock_id, start, ctx.max_date)
+        pio.to_json(fig.to_dict(), validate=False)
+    return run
+
+@benchmark('detail_indicators_10y')
+def bench_detail_indicators_10y(ctx):
+    from app.components.stock_detail import INDICATOR_OPTIONS, build_price_figure
+    from utils.downsample import choose_resolution
+    start = max(ctx.min_date, ctx.max_date - timedelta(days=3650))
+    result = ctx.reader.get_stock_history(ctx.stock_id, start, ctx.max_date).sort_values('date')
+    resolution = choose_resolution(len(result))
+    chart_df = ctx.reader.get_stock_history_resampled(ctx.stock_id, start, ctx.max_date, resolution)
+    indicators = list(INDICATOR_OPTIONS.values())
+
+    def run():
+        # 查詢預先計算的指標並建立全部指標的圖表
+        ctx.reader.query_cache.clear()
+        indicator_df = ctx.reader.get_stock_indicators(ctx.stock_id, start, ctx.max_date)
+        build_price_figure(ctx.stock_id, result, chart_df, resolution, indicator_df, indicators).to_json()
+    return run
+
+# --- 股票比較 ---
+
+@benchmark('comparison_20_stocks_10y')
+def bench_comparison_20_stocks_10y(ctx):
+    from config.config import COMPARISON_MAX_STOCKS
+    stock_ids = list(ctx.reader.get_stock_names()['stock_id'].iloc[:COMPARISON_MAX_STOCKS])
+    start = max(ctx.min_date, ctx.max_date - timedelta(days=3650))
+
+    def run():
+        ctx.reader.query_cache.clear()
+        ctx.reader.get_stock_comparison(stock_ids, start, ctx.max_date)
+    return run
+
+# --- 首頁市場概況 ---
+
+@benchmark('market_overview_page')
+def bench_market_overview_page(ctx):
+    from app.components.market_overview import build_sector_figure, build_sector_table, build_leader_table
+
+    def run():
+        # 查詢快取未命中時首頁的資料路徑：讀取預先彙總的表並建立圖表與表格
+        ctx.reader.query_cache.clear()
+        overview = ctx.reader.get_market_overview()
+        build_sector_figure(overview.iloc[1:]).to_json()
+        build_sector_table(overview.iloc[1:])
+        build_leader_table(overview.iloc[0]['volume_leaders'])
+    return run
+
+@benchmark('market_overview_refresh')
+def bench_market_overview_refresh(ctx):
+    return lambda: ctx.writer.refresh_market_overview()
+
+# --- 股票搜尋 ---
+
+@benchmark('symbol_index_build')
+def bench_symbol_index_build(ctx):
+    def run():
+        ctx.reader.query_cache.clear()
+        ctx.reader.get_symbol_index()
+    return run
+
+@benchmark('symbol_search_suggestions')
+def bench_symbol_search_suggestions(ctx):
+    from config.config import SYMBOL_SUGGESTION_LIMIT
+    index = ctx.reader.get_symbol_index()
+    name = index.name(ctx.stock_id)
+    # 代碼前綴、名稱前綴、子字串與不相連的字各一次
+    queries = [ctx.stock_id[:2], name[:1], name[1:], name[0] + name[-1]]
+
+    def run():
+        for query in queries:
+            index.search(query, SYMBOL_SUGGESTION_LIMIT)
+    return run
+
+# --- 資料匯出 ---
+
+@benchmark('export_history_all_parquet')
+def bench_export_history_all_parquet(ctx):
+    path = os.path.join(ctx.workdir, 'export.parquet')
+
+    def run():
+        # 全部股票、全部期間，搭配 --memory 確認記憶體用量不隨資料量增加
+        ctx.reader.export_stock_history(None, ctx.min_date, ctx.max_date, 'parquet', path)
+    return run
+
+@benchmark('export_history_all_csv')
+def bench_export_history_all_csv(ctx):
+    path = os.path.join(ctx.workdir, 'export.csv')
+
+    def run():
+        ctx.reader.export_stock_history(None, ctx.min_date, ctx.max_date, 'csv', path)
+    return run
+
+# --- 法人動向 ---
+
+@benchmark('institutional_ranking')
+def bench_institutional_ranking(ctx):
+    latest_date = ctx.reader.get_institutional_latest_date()
+
+    def run():
+        ctx.reader.query_cache.clear()
+        ctx.reader.get_institutional_ranking(latest_date, 'foreign', 20, limit=50)
+    return run
+
+@benchmark('institutional_history_120d')
+def bench_institutional_history_120d(ctx):
+    def run():
+        ctx.reader.query_cache.clear()
+        ctx.reader.get_institutional_history(ctx.stock_id, ctx.max_date - timedelta(days=120), ctx.max_date)
+    return run
+
+# --- 資料更新 ---
+
+@benchmark('ma_full')
+def bench_ma_full(ctx):
+    return lambda: ctx.writer.update_moving_averages(full=True)
+
+@benchmark('ma_incremental')
+def bench_ma_incremental(ctx):
+    def setup():
+        # 清除最新一日的均線，模擬每日更新
+        ctx.writer.conn.execute("""
+            UPDATE stock_daily SET ma5 = NULL, ma10 = NULL, ma20 = NULL, ma60 = NULL
+            WHERE date = (SELECT MAX(date) FROM stock_daily)
+        """)
+    return setup, lambda: ctx.writer.update_moving_averages()
+
+@benchmark('indicators_full')
+def bench_indicators_full(ctx):
+    return lambda: ctx.writer.update_indicators(full=True)
+
+@benchmark('indicators_incremental')
+def bench_indicators_incremental(ctx):
+    def setup():
+        # 刪除最新一日的指標，模擬每日更新
+        ctx.writer.conn.execute("""
+            DELETE FROM stock_indicators WHERE date = (SELECT MAX(date) FROM stock_daily)
+        """)
+    return setup, lambda: ctx.writer.update_indicators()
+
+@benchmark('institutional_rolling_full')
+def bench_institutional_rolling_full(ctx):
+    return lambda: ctx.writer.update_institutional_rolling(full=True)
+
+@benchmark('institutional_upsert_day')
+def bench_institutional_upsert_day(ctx):
+    # 寫入最新一日的資料，包含接續計算累計值與連續買超天數
+    frame = ctx.writer.conn.execute("""
+        SELECT date, stock_id, stock_name, foreign_net, trust_net, dealer_net
+        FROM institutional_daily WHERE date = ?
+    """, [ctx.max_date]).fetchdf()
+    return lambda: ctx.writer.upsert_institutional_frame(frame)
+
+@benchmark('upsert_daily_data_day')
+def bench_upsert_daily_data_day(ctx):
+    records = ctx.writer.conn.execute(
+        "SELECT * FROM stock_daily WHERE date = ?", [ctx.max_date]
+    ).fetchall()
+    return lambda: ctx.writer.upsert_daily_data(records)
+
+@benchmark('upsert_daily_frame_year')
+def bench_upsert_daily_frame_year(ctx):
+    frame = ctx.writer.conn.execute(
+        "SELECT * FROM stock_daily WHERE date > ?", [ctx.max_date - timedelta(days=365)]
+    ).fetchdf()
+    return lambda: ctx.writer.upsert_daily_frame(frame)
+
+@benchmark('update_stock_conditions')
+def bench_update_stock_conditions(ctx):
+    stock_conditions = dict(ctx.writer.conn.execute(
+        "SELECT stock_id, CAST(conditions AS VARCHAR) FROM stock_info WHERE conditions IS NOT NULL"
+    ).fetchall())
+    return lambda: ctx.writer.update_stock_conditions(stock_conditions)
+
+@benchmark('evaluate_stock_conditions')
+def bench_evaluate_stock_conditions(ctx):
+    return lambda: ctx.writer.evaluate_stock_conditions()
+
+# --- 冷啟動 ---
+
+def _cold_start(code: str):
+    """在新的 Python 程序中執行程式碼，量測包含直譯器啟動與模組匯入的冷啟動時間"""
+    return lambda: subprocess.run([sys.executable, '-c', code], cwd=REPO_ROOT, check=True, capture_output=True)
+
+@benchmark('startup_main')
+def bench_startup_main(ctx):
+    # 登入頁：只執行 app/main.py，不開啟任何功能頁面
+    return _cold_start("import runpy; runpy.run_path('app/main.py', run_name='__main__')")
+
+@benchmark('startup_stock_detail')
+def bench_startup_stock_detail(ctx):
+    return _cold_start("import app.components.stock_detail")
+
+@benchmark('startup_stock_screener')
+def bench_startup_stock_screener(ctx):
+    return _cold_start("import app.components.stock_screener")
+
+def _read_rss_kib():
+    """目前與最高的常駐記憶體（KiB），只支援 Linux，其他平台回傳 None"""
+    try:
+        with open('/proc/self/status') as f:
+            status = dict(line.split(':', 1) for line in f)
+        return int(status['VmRSS'].split()[0]), int(status['VmHWM'].split()[0])
+    except (OSError, KeyError, ValueError):
+        return None
+
+def _reset_peak_rss() -> bool:
+    """將最高常駐記憶體重設為目前用量（Linux 的 clear_refs），不支援時回傳 False"""
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+def measure_memory(setup, run) -> dict:
+    """
+    另外執行一次並量測峰值記憶體（KiB）
+    peak_py_kib 為 tracemalloc 追蹤的 Python / NumPy / pandas 配置；DuckDB 與 Arrow 的原生緩衝區不經過 tracemalloc，
+    因此同時記錄執行期間常駐記憶體的增加量 peak_rss_kib（只支援 Linux，重複使用先前已配置的記憶體不會計入）
+    """
+    if setup is not None:
+        setup()
+    rss = _read_rss_kib() if _reset_peak_rss() else None
+    tracemalloc.start()
+    try:
+        run()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    after = _read_rss_kib()
+    return {
+        'peak_py_kib': round(peak / 1024),
+        'peak_rss_kib': max(after[1] - rss[0], 0) if rss and after else None,
+    }
+
+def run_benchmark(ctx, name: str, repeat: int, warmup: int, memory: bool = False) -> dict:
+    """執行單一效能測試，回傳各次耗時的統計（毫秒），memory 為 True 時另外量測峰值記憶體"""
+    prepared = BENCHMARKS[name](ctx)
+    setup, run = prepared if isinstance(prepared, tuple) else (None, prepared)
+    timings = []
+    for i in range(warmup + repeat):
+        if setup is not None:
+            setup()
+        started = time.perf_counter()
+        run()
+        elapsed = (time.perf_counter() - started) * 1000
+        if i >= warmup:
+            timings.append(elapsed)
+    stats = {
+        'runs': len(timings),
+        'min_ms': round(min(timings), 3),
+        'median_ms': round(statistics.median(timings), 3),
+        'mean_ms': round(statistics.fmean(timings), 3),
+        'max_ms': round(max(timings), 3),
+    }
+    if memory:
+        stats.update(measure_memory(setup, run))
+    return stats
+
+def compare_with_baseline(results: dict, baseline: dict, tolerance: float) -> list:
+    """找出中位數比基準慢超過 tolerance 比例的測試"""
+    regressions = []
+    for name, stats in results.items():
+        base = baseline.get('results', {}).get(name)
+        if not base or not base.get('median_ms'):
+            continue
+        ratio = stats['median_ms'] / base['median_ms']
+        stats['baseline_median_ms'] = base['median_ms']
+        stats['ratio'] = round(ratio, 3)
+        if ratio > 1 + tolerance:
+            regressions.append(name)
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description='StockHero 效能測試')
+    parser.add_argument('--db', default='bench/StockHero.db', help='generate_dataset.py 產生的資料庫')
+    parser.add_argument('--output', help='結果 JSON 的輸出路徑，未指定時輸出到 stdout')
+    parser.add_argument('--only', help='只執行指定的測試，以逗號分隔')
+    parser.add_argument('--repeat', type=int, default=5, help='每個測試的計時次數')
+    parser.add_argument('--warmup', type=int, default=1, help='每個測試的暖身次數（不計時）')
+    parser.add_argument('--baseline', help='作為比較基準的前一次結果 JSON')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='容許的變慢比例，超過時以非零狀態結束')
+    parser.add_argument('--memory', action='store_true', help='另外執行一次並量測峰值記憶體（tracemalloc 與常駐記憶體）')
+    args = parser.parse_args()
+
+    if not os.path.exists(args.db):
+        parser.error(f"找不到資料庫 {args.db}，請先執行 benchmarks/generate_dataset.py")
+    names = args.only.split(',') if args.only else list(BENCHMARKS)
+    unknown = [name for name in names if name not in BENCHMARKS]
+    if unknown:
+        parser.error(f"未知的測試: {', '.join(unknown)}")
+
+    workdir = tempfile.mkdtemp(prefix='stockhero-bench-')
+    ctx = BenchContext(args.db, workdir)
+    try:
+        with ctx.reader.cursor() as cur:
+            rows, symbols = cur.execute("SELECT COUNT(*), COUNT(DISTINCT stock_id) FROM stock_daily").fetchone()
+        results = {}
+        for name in names:
+            results[name] = run_benchmark(ctx, name, args.repeat, args.warmup, args.memory)
+            message = f"{name}: median {results[name]['median_ms']:.1f} ms"
+            if args.memory:
+                message += (f", peak {results[name]['peak_py_kib']} KiB (Python)"
+                            f" / {results[name]['peak_rss_kib']} KiB (RSS)")
+            print(message, file=sys.stderr)
+    finally:
+        ctx.close()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        'generated_at': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'duckdb': duckdb.__version__,
+        'dataset': {'path': args.db, 'daily_rows': rows, 'symbols': symbols},
+        'results': results,
+    }
+    regressions = []
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            regressions = compare_with_baseline(results, json.load(f), args.tolerance)
+        report['regressions'] = regressions
+
+    output = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output)
+    else:
+        print(output)
+
+    if regressions:
+        print(f"效能退化: {', '.join(regressions)}", file=sys.stderr)
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
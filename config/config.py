@@ -0,0 +1,54 @@
+import os
+
+# 資料庫連線池設定
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', '8'))       # 同時可借出的 cursor 數量
+DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', '30'))  # 等待可用 cursor 的秒數
+
+# GCS 資料庫快照設定
+DB_SNAPSHOT_TTL = float(os.getenv('DB_SNAPSHOT_TTL', '600'))  # 多久檢查一次 GCS 上是否有新版本（秒）
+DB_LOCAL_SNAPSHOT_TTL = float(os.getenv('DB_LOCAL_SNAPSHOT_TTL', '5'))  # 重新檢查本機發布快照的間隔秒數
+DB_SNAPSHOT_KEEP = int(os.getenv('DB_SNAPSHOT_KEEP', '2'))  # 本機發布快照保留的版本數
+
+# 查詢結果快取設定
+QUERY_CACHE_MAX_BYTES = int(os.getenv('QUERY_CACHE_MAX_BYTES', str(64 * 1024 * 1024)))  # 快取總容量上限（位元組）
+
+# 圖表設定
+CHART_MAX_POINTS = int(os.getenv('CHART_MAX_POINTS', '500'))  # 自動模式下圖表每條線的最大資料點數
+FIGURE_CACHE_MAX_BYTES = int(os.getenv('FIGURE_CACHE_MAX_BYTES', str(32 * 1024 * 1024)))  # 圖表快取總容量上限（以圖表 JSON 長度估計，位元組）
+FIGURE_PREWARM_LIMIT = int(os.getenv('FIGURE_PREWARM_LIMIT', '10'))  # 程序啟動與資料更新後預先建立圖表的股票數
+FIGURE_PREWARM_STOCKS = [s for s in os.getenv('FIGURE_PREWARM_STOCKS', '2330,2317,2454').split(',') if s]  # 查看次數不足時預先建立的股票
+
+# stock_daily 儲存方式：duckdb（整個資料庫檔案）或 parquet（依年月分區的 Parquet，只下載需要的分區）
+STORAGE_MODE = os.getenv('STORAGE_MODE', 'duckdb')
+PARQUET_CACHE_DIR = os.getenv('PARQUET_CACHE_DIR', 'parquet_cache')  # Parquet 分區的本地快取目錄
+PARQUET_READER_BLOB = os.getenv('PARQUET_READER_BLOB', 'StockHero.reader.db')  # parquet 模式讀取端下載的資料庫快照（不含 stock_daily）
+
+# 效能監控設定
+SLOW_QUERY_MS = float(os.getenv('SLOW_QUERY_MS', '500'))  # 超過此毫秒數的查詢會記錄為慢查詢
+SLOW_QUERY_EXPLAIN_INTERVAL = float(os.getenv('SLOW_QUERY_EXPLAIN_INTERVAL', '300'))  # 同一查詢重複記錄慢查詢的最短間隔（秒）
+SLOW_QUERY_EXPLAIN_SAMPLE = float(os.getenv('SLOW_QUERY_EXPLAIN_SAMPLE', '0'))  # 慢查詢以 EXPLAIN ANALYZE 重新執行的比例（0 為關閉，1 為每次）
+METRICS_LOG_INTERVAL = float(os.getenv('METRICS_LOG_INTERVAL', '60'))  # 輸出延遲統計的間隔（秒）
+
+# 歷史回測設定
+BACKTEST_CHUNK_DAYS = int(os.getenv('BACKTEST_CHUNK_DAYS', '366'))  # 每次查詢的日期區間（日曆天），限制單次處理的資料量
+
+# 技術指標設定
+INDICATOR_BATCH_STOCKS = int(os.getenv('INDICATOR_BATCH_STOCKS', '200'))  # 每批計算的股票數，限制記憶體用量
+
+# 多檔股票比較設定
+COMPARISON_MAX_STOCKS = int(os.getenv('COMPARISON_MAX_STOCKS', '20'))  # 一次比較的股票數上限
+COMPARISON_CORRELATION_WINDOW = int(os.getenv('COMPARISON_CORRELATION_WINDOW', '60'))  # 滾動相關係數的交易日數
+
+# 股票搜尋設定
+SYMBOL_SUGGESTION_LIMIT = int(os.getenv('SYMBOL_SUGGESTION_LIMIT', '10'))  # 搜尋建議的筆數
+
+# 首頁市場概況設定
+MARKET_VOLUME_LEADERS = int(os.getenv('MARKET_VOLUME_LEADERS', '10'))  # 成交量排行的筆數，於寫入資料時計算
+
+# 資料匯出設定
+EXPORT_CHUNK_STOCKS = int(os.getenv('EXPORT_CHUNK_STOCKS', '200'))  # 匯出每日資料時每次查詢的股票數，排序只在段內進行
+EXPORT_BATCH_ROWS = int(os.getenv('EXPORT_BATCH_ROWS', '100000'))  # 每個 record batch 的筆數，限制匯出時的記憶體用量
+EXPORT_BUFFER_BYTES = int(os.getenv('EXPORT_BUFFER_BYTES', str(1024 * 1024)))  # 寫入匯出檔案的緩衝區大小
+EXPORT_PREFIX = os.getenv('EXPORT_PREFIX', 'exports')  # 匯出檔案在 GCS（EXPORT_BUCKET）上的路徑前綴
+EXPORT_TTL = float(os.getenv('EXPORT_TTL', '3600'))  # 下載網址的有效秒數，超過後檔案會被刪除
+EXPORT_CLEANUP_INTERVAL = float(os.getenv('EXPORT_CLEANUP_INTERVAL', '600'))  # 背景清理過期匯出檔案的間隔秒數
@@ -1,6 +1,7 @@
 import logging
-import google.cloud.logging
-from google.cloud.logging.handlers import CloudLoggingHandler
+import logging.handlers
+import atexit
+import queue
 import os
 
 def setup_logging():
@@ -22,15 +23,21 @@ def setup_logging():
     formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 
     if is_cloud_run:
-        # Cloud Run 環境：使用 Cloud Logging
+        # Cloud Run 環境：使用 Cloud Logging（只在雲端匯入，縮短本地啟動時間）
+        import google.cloud.logging
+        from google.cloud.logging.handlers import CloudLoggingHandler
         client = google.cloud.logging.Client()
-        cloud_handler = CloudLoggingHandler(client, name="stockhero_logs")
-        cloud_handler.setFormatter(formatter)
-        logger.addHandler(cloud_handler)
+        handler = CloudLoggingHandler(client, name="stockhero_logs")
     else:
         # 本地環境：輸出到控制台
-        console_handler = logging.StreamHandler()
-        console_handler.setFormatter(formatter)
-        logger.addHandler(console_handler)
+        handler = logging.StreamHandler()
+    handler.setFormatter(formatter)
 
-    return logger
\ No newline at end of file
+    # 記錄只放入佇列，由背景執行緒寫出，避免 I/O 增加請求延遲
+    log_queue = queue.SimpleQueue()
+    listener = logging.handlers.QueueListener(log_queue, handler, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+    logger.addHandler(logging.handlers.QueueHandler(log_queue))
+
+    return logger
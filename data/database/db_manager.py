@@ -1,36 +1,326 @@
 import os
+import re
+import json
+import time
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 import duckdb
-from google.cloud import storage
-from datetime import datetime
+import pandas as pd
+import pyarrow as pa
+from datetime import datetime, timedelta
 from .models import StockDB
+from .snapshot import SnapshotCache, LocalSnapshot
+from .query_cache import QueryCache, estimate_size
+from .parquet_store import ParquetPartitionStore
+from .screener_rules import compile_rule
+from . import indicators
+from . import export
+from config.config import (DB_POOL_SIZE, DB_POOL_TIMEOUT, STORAGE_MODE, SLOW_QUERY_MS, SLOW_QUERY_EXPLAIN_INTERVAL,
+                           SLOW_QUERY_EXPLAIN_SAMPLE, BACKTEST_CHUNK_DAYS, INDICATOR_BATCH_STOCKS, COMPARISON_MAX_STOCKS,
+                           COMPARISON_CORRELATION_WINDOW, EXPORT_BATCH_ROWS, EXPORT_CHUNK_STOCKS,
+                           MARKET_VOLUME_LEADERS, PARQUET_READER_BLOB)
 from config.logger import setup_logging
+from utils.instrumentation import metrics, TimedCursor
+from utils import comparison
+from utils.symbol_index import SymbolIndex
 
 # 設置 logger
 logger = setup_logging()
 
+# 已完成建表的資料庫路徑，同一程序內只需執行一次 DDL
+_schema_initialized = set()
+_schema_lock = threading.Lock()
+
+
+class SchemaVersionError(RuntimeError):
+    """資料庫結構版本比程式需要的舊，需由寫入端更新後重新發布"""
+
+
 class DatabaseManager:
-    def __init__(self, db_path: str, bucket_name: str):
+    def __init__(self, db_path: str, bucket_name: str, pool_size: int = DB_POOL_SIZE,
+                 snapshot: SnapshotCache = None, parquet_store: ParquetPartitionStore = None,
+                 read_only: bool = False):
         self.db_path = db_path
         self.bucket_name = bucket_name
         self.conn = None
         self.db_modified = False
         self.cloud = False
+        self.pool_size = pool_size
+        # 頁面只讀取資料，唯讀連線不會鎖住檔案，可由多個程序同時開啟
+        self.read_only = read_only
+        # 有 snapshot 時改從本地快照讀取，並在背景更新
+        self.snapshot = snapshot
+        self._pool_slots = threading.BoundedSemaphore(pool_size)
+        self._pool_lock = threading.Lock()
+        self._idle_cursors = []
+        self._open_path = None
+        self._open_version = None
+        # 每個連線借出中的 cursor 數量，以及已被新快照取代、等待關閉的連線
+        self._borrowed = {}
+        self._retired = {}
+        # 頁面查詢結果的快取，以資料版本區分，載入新快照後自動失效
+        self.query_cache = QueryCache()
+        # 有 parquet_store 時，每日歷史資料改從 Parquet 分區讀取
+        self.parquet_store = parquet_store
+        # 查詢統計（結果大小估計、慢查詢的 EXPLAIN ANALYZE）在背景執行，避免拖慢原本的請求
+        self._metrics_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='query-metrics')
+        self._slow_logged_at = {}
+        # 切換到新快照後在背景執行的函數（例如預先建立頁面快取）
+        self._snapshot_listeners = []
+        self._listener_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='snapshot-listener')
+        # 結構版本過舊或無法開啟而未切換的快照路徑
+        self._rejected_path = None
+        # 目前開啟的資料庫結構過舊時的轉換說明，切換到新版本後清除
+        self.schema_error = None
         
     def connect(self):
         """建立資料庫連接"""
+        if self.snapshot is not None:
+            self.snapshot.ensure_local()
+            self._open(*self.snapshot.current(), allow_outdated=True)
+            return
+
         if not os.path.exists(self.db_path):
             self.cloud = True
+            from google.cloud import storage
             self.storage_client = storage.Client()
             self._download_db_from_gcs()
             
-        self.conn = duckdb.connect(self.db_path)
-        # 建立資料表
-        self.conn.execute(StockDB.CREATE_STOCK_DAILY_TABLE)
-        self.conn.execute(StockDB.CREATE_STOCK_INFO_TABLE)
+        self._open(self.db_path, allow_outdated=True)
+
+    def _open(self, path: str, version: str = None, allow_outdated: bool = False):
+        """
+        開啟資料庫檔案並設為目前的連線
+        Args:
+            allow_outdated: 讀取端結構過舊時仍開啟並記錄 schema_error（第一次連線沒有其他版本可用），
+                            否則拋出 SchemaVersionError
+        """
+        if self.read_only:
+            # 讀取端不執行 DDL，結構過舊時回報，由寫入端（staging_db_manager）更新
+            conn = duckdb.connect(path, read_only=True)
+            try:
+                self._check_schema(conn, path)
+                self.schema_error = None
+            except SchemaVersionError as e:
+                if not allow_outdated:
+                    conn.close()
+                    raise
+                self.schema_error = str(e)
+                logger.error(self.schema_error)
+            except Exception:
+                conn.close()
+                raise
+            self.conn = conn
+        else:
+            self.conn = duckdb.connect(path)
+        self._open_path = path
+        self._open_version = version
+        if not self.read_only:
+            self._ensure_schema(path)
+
+    @staticmethod
+    def _check_schema(conn, path: str):
+        """檢查資料庫結構版本，低於 StockDB.SCHEMA_VERSION 時拋出 SchemaVersionError"""
+        try:
+            found = conn.execute(StockDB.GET_SCHEMA_VERSION).fetchone()[0]
+        except duckdb.CatalogException:
+            found = None
+        if found is None:
+            found = StockDB.BASELINE_SCHEMA_VERSION
+        if found < StockDB.SCHEMA_VERSION:
+            raise SchemaVersionError(
+                f"資料庫 {path} 的結構版本為 {found}，目前程式需要版本 {StockDB.SCHEMA_VERSION}。"
+                f"請以寫入端開啟並發布一次完成轉換（with staging_db_manager(): pass），發布後頁面會自動切換到新版本"
+            )
+
+    @property
+    def snapshot_version(self) -> str:
+        """目前連線所讀取的資料版本，可作為快取鍵的一部分"""
+        if self._open_version is not None:
+            return self._open_version
+        try:
+            return str(os.stat(self._open_path or self.db_path).st_mtime_ns)
+        except OSError:
+            return None
+
+    def _sync_snapshot(self):
+        """快照過期時觸發背景更新；新快照已就緒時切換連線"""
+        if self.snapshot is None:
+            return
+        if self.snapshot.is_stale():
+            self.snapshot.refresh_async()
+        if self.snapshot.path in (self._open_path, self._rejected_path):
+            return
+
+        with self._pool_lock:
+            path, version = self.snapshot.current()
+            if path in (self._open_path, self._rejected_path):
+                return
+            old_conn, old_path = self.conn, self._open_path
+            try:
+                self._open(path, version)
+            except (SchemaVersionError, duckdb.Error, OSError) as e:
+                # 結構過舊、已被發布端清除或檔案損毀時繼續使用目前的連線，同一個檔案不再重試
+                self._rejected_path = path
+                logger.error(f"略過新快照 {path}: {str(e)}")
+                return
+            for cur in self._idle_cursors:
+                cur.close()
+            self._idle_cursors.clear()
+            self._retired[id(old_conn)] = (old_conn, old_path)
+            self._close_retired(old_conn)
+            listeners = list(self._snapshot_listeners)
+        logger.info(f"Switched to database snapshot {self._open_version}")
+        for callback in listeners:
+            self._listener_executor.submit(self._run_snapshot_listener, callback)
+
+    def check_schema(self) -> str:
+        """回傳目前資料庫結構過舊時的轉換說明，沒有問題時回傳 None；會先切換到已就緒的新快照"""
+        self._sync_snapshot()
+        return self.schema_error
+
+    def add_snapshot_listener(self, callback, run_now: bool = False):
+        """
+        註冊切換到新快照後要在背景執行的函數，callback 以 DatabaseManager 為參數，重複註冊會被忽略
+        Args:
+            run_now: 第一次註冊時也立即在背景執行一次，程序啟動後不需等到下一次切換快照
+        """
+        with self._pool_lock:
+            if callback in self._snapshot_listeners:
+                return
+            self._snapshot_listeners.append(callback)
+        if run_now:
+            self._listener_executor.submit(self._run_snapshot_listener, callback)
+
+    def _run_snapshot_listener(self, callback):
+        try:
+            callback(self)
+        except Exception as e:
+            logger.error(f"快照更新後的背景工作失敗: {str(e)}")
+
+    def _close_retired(self, conn):
+        """舊快照的 cursor 都歸還後，關閉連線並刪除舊檔案（需持有 _pool_lock）"""
+        if self._borrowed.get(id(conn), 0) > 0 or id(conn) not in self._retired:
+            return
+        _, path = self._retired.pop(id(conn))
+        self._borrowed.pop(id(conn), None)
+        conn.close()
+        if path and path != self._open_path and self.snapshot.delete_retired:
+            try:
+                os.remove(path)
+                if os.path.exists(f"{path}.wal"):
+                    os.remove(f"{path}.wal")
+            except OSError as e:
+                logger.warning(f"刪除舊快照失敗 {path}: {str(e)}")
+
+    def _ensure_schema(self, path: str = None):
+        """建立資料表並記錄結構版本（寫入端），同一個資料庫檔案在程序內只執行一次"""
+        db_key = os.path.abspath(path or self.db_path)
+        with _schema_lock:
+            if db_key in _schema_initialized:
+                return
+            self.conn.execute(StockDB.CREATE_STOCK_DAILY_TABLE)
+            self.conn.execute(StockDB.CREATE_STOCK_INFO_TABLE)
+            for statement in StockDB.ADD_CONDITION_COLUMNS:
+                self.conn.execute(statement)
+            self.conn.execute(StockDB.BACKFILL_CONDITION_COLUMNS)
+            self.conn.execute(StockDB.CREATE_STOCK_SUMMARY_TABLE)
+            self.conn.execute(StockDB.CREATE_INSTITUTIONAL_DAILY_TABLE)
+            self.conn.execute(StockDB.CREATE_STOCK_INDICATORS_TABLE)
+            self.conn.execute(StockDB.CREATE_MARKET_OVERVIEW_TABLE)
+            # 舊版資料庫第一次開啟時建立股票摘要與市場概況
+            if self.conn.execute("SELECT COUNT(*) FROM stock_summary").fetchone()[0] == 0:
+                self.refresh_stock_summary()
+            elif self.conn.execute("SELECT COUNT(*) FROM market_overview").fetchone()[0] == 0:
+                self.refresh_market_overview()
+            self.conn.execute(StockDB.CREATE_SCHEMA_INFO_TABLE)
+            self.conn.execute(StockDB.SET_SCHEMA_VERSION,
+                              [StockDB.SCHEMA_VERSION, datetime.now(), StockDB.SCHEMA_VERSION])
+            _schema_initialized.add(db_key)
+
+    @contextmanager
+    def cursor(self, name: str = 'query'):
+        """
+        從連線池借出一個 cursor，離開 with 區塊時自動歸還
+        DuckDB 的 cursor 是同一資料庫的獨立連線，可安全地在不同執行緒使用
+        Args:
+            name: 查詢名稱，用於效能統計
+        """
+        self._sync_snapshot()
+        if not self._pool_slots.acquire(timeout=DB_POOL_TIMEOUT):
+            raise TimeoutError(f"等待資料庫連線逾時（連線池大小 {self.pool_size}）")
+        cur = None
+        try:
+            with self._pool_lock:
+                owner = self.conn
+                if self._idle_cursors:
+                    cur = self._idle_cursors.pop()
+                else:
+                    cur = owner.cursor()
+                self._borrowed[id(owner)] = self._borrowed.get(id(owner), 0) + 1
+            yield TimedCursor(cur, name, self._record_query)
+        finally:
+            if cur is not None:
+                with self._pool_lock:
+                    self._borrowed[id(owner)] -= 1
+                    if owner is self.conn:
+                        self._idle_cursors.append(cur)
+                    else:
+                        # 借出期間已切換到新快照，舊 cursor 直接關閉
+                        cur.close()
+                        self._close_retired(owner)
+            self._pool_slots.release()
     
+    def _record_query(self, name: str, sql: str, params, seconds: float, rows: int, result):
+        """TimedCursor 的回呼，查詢統計交由背景執行緒處理"""
+        self._metrics_executor.submit(self._record_query_metrics, name, sql, params, seconds, rows, result)
+
+    def _record_query_metrics(self, name: str, sql: str, params, seconds: float, rows: int, result):
+        """記錄查詢的耗時、筆數與大小，超過門檻時輸出慢查詢 log"""
+        nbytes = estimate_size(result)
+        metrics.record('query', name, seconds, rows, nbytes)
+        if seconds * 1000 < SLOW_QUERY_MS or name == 'explain_analyze':
+            return
+        now = time.monotonic()
+        if now - self._slow_logged_at.get(name, -SLOW_QUERY_EXPLAIN_INTERVAL) < SLOW_QUERY_EXPLAIN_INTERVAL:
+            return
+        self._slow_logged_at[name] = now
+        # EXPLAIN ANALYZE 會重新執行整個查詢並佔用一個 cursor，只依 SLOW_QUERY_EXPLAIN_SAMPLE 的比例取樣
+        explain = random.random() < SLOW_QUERY_EXPLAIN_SAMPLE
+        self._log_slow_query(name, sql, params, seconds, rows, nbytes, explain)
+
+    def _log_slow_query(self, name: str, sql: str, params, seconds: float, rows: int, nbytes: int, explain: bool):
+        """輸出慢查詢的結構化 log，explain 為 True 時以 EXPLAIN ANALYZE 重新執行並附上執行計畫"""
+        plan = None
+        if explain:
+            try:
+                with self.cursor('explain_analyze') as cur:
+                    plan = '\n'.join(row[1] for row in cur.execute(f"EXPLAIN ANALYZE {sql}", params).fetchall())
+            except Exception as e:
+                plan = f"EXPLAIN ANALYZE 失敗: {str(e)}"
+        logger.warning(
+            f"Slow query {name}: {seconds * 1000:.0f} ms, {rows} rows" + (f"\n{plan}" if plan else ''),
+            extra={'json_fields': {
+                'event': 'slow_query', 'name': name, 'latency_ms': seconds * 1000,
+                'rows': rows, 'bytes': nbytes, 'sql': sql, 'params': [str(p) for p in params or []],
+                'plan': plan,
+            }}
+        )
+
     def close(self):
         """關閉資料庫連接"""
+        self._metrics_executor.shutdown(wait=False, cancel_futures=True)
+        self._listener_executor.shutdown(wait=False, cancel_futures=True)
         if self.conn:
+            with self._pool_lock:
+                for cur in self._idle_cursors:
+                    cur.close()
+                self._idle_cursors.clear()
+                for conn, _ in self._retired.values():
+                    conn.close()
+                self._retired.clear()
             self.conn.close()
             if self.db_modified and self.cloud:
                 self._upload_db_to_gcs()
@@ -51,19 +341,596 @@ class DatabaseManager:
         os.remove(self.db_path)
         logger.info(f"Removed local database file: {self.db_path}")
     
+    @staticmethod
+    def _condition_flags(conditions: str) -> list:
+        """將 conditions JSON 字串轉為各條件欄位的布林值"""
+        if conditions is None:
+            return [None] * len(StockDB.CONDITION_COLUMNS)
+        parsed = json.loads(conditions) if isinstance(conditions, str) else conditions
+        return [bool(parsed.get(column, False)) for column in StockDB.CONDITION_COLUMNS]
+
+    def cached_query(self, sql: str, params: list = None, name: str = 'query', arrow: bool = False):
+        """
+        執行查詢並以 (SQL, 參數, 資料版本) 快取結果，回傳值為共用物件，不可直接修改
+        Args:
+            arrow: True 時回傳 pyarrow Table，由 DuckDB 直接輸出欄位緩衝區，不經過 pandas 轉換；
+                   之後的選欄、切片與改名都不複製資料，可直接交給 st.dataframe
+        """
+        params = list(params or [])
+        self._sync_snapshot()
+
+        def _load():
+            with self.cursor(name) as cur:
+                cur.execute(sql, params)
+                return cur.fetch_arrow_table() if arrow else cur.fetchdf()
+
+        key = (sql, *params, 'arrow') if arrow else (sql, *params)
+        return self.query_cache.get_or_load(self.snapshot_version, key, _load)
+
+    def get_stock_summary(self, stock_id: str):
+        """以主鍵取得股票摘要（交易日範圍、最新行情與基本資料），沒有資料時回傳 None"""
+        def _load():
+            with self.cursor('stock_summary') as cur:
+                row = cur.execute(StockDB.GET_STOCK_SUMMARY, [stock_id]).fetchone()
+                if row is None:
+                    return None
+                return dict(zip([column[0] for column in cur.description], row))
+
+        self._sync_snapshot()
+        return self.query_cache.get_or_load(self.snapshot_version, ('summary', stock_id), _load)
+
+    def _daily_source(self, start_date, end_date) -> str:
+        """
+        查詢每日資料時使用的來源：預設為 stock_daily 資料表，
+        Parquet 模式下只下載日期區間涵蓋的年月分區並以 read_parquet 查詢
+        """
+        if self.parquet_store is None:
+            return 'stock_daily'
+        paths = self.parquet_store.ensure_partitions(start_date, end_date)
+        if not paths:
+            return StockDB.EMPTY_DAILY_SOURCE
+        files = ', '.join(f"'{path}'" for path in paths)
+        return f"read_parquet([{files}], hive_partitioning = false)"
+
+    def get_stock_history(self, stock_id: str, start_date, end_date, arrow: bool = False):
+        """取得股票在日期區間內的每日資料（依日期降序），arrow 為 True 時回傳 pyarrow Table"""
+        return self.cached_query(
+            StockDB.GET_STOCK_HISTORY.format(source=self._daily_source(start_date, end_date)),
+            [stock_id, start_date, end_date],
+            name='stock_history',
+            arrow=arrow
+        )
+
+    def get_stock_history_resampled(self, stock_id: str, start_date, end_date, resolution: str):
+        """取得彙總為週 K（week）或月 K（month）的資料（依日期升序）"""
+        if resolution not in ('week', 'month'):
+            raise ValueError(f"不支援的 K 線週期: {resolution}")
+        return self.cached_query(
+            StockDB.GET_STOCK_HISTORY_RESAMPLED.format(source=self._daily_source(start_date, end_date)),
+            [stock_id, start_date, end_date, resolution],
+            name='stock_history_resampled'
+        )
+
+    def get_stock_names(self):
+        """取得所有股票的代碼與名稱（依代碼排序）"""
+        return self.cached_query(StockDB.GET_STOCK_NAMES, name='stock_names')
+
+    def get_market_overview(self):
+        """最新交易日的市場概況，第一列為全市場（industry 為 NULL），其餘為各產業"""
+        return self.cached_query(StockDB.GET_MARKET_OVERVIEW, name='market_overview')
+
+    def get_symbol_index(self) -> SymbolIndex:
+        """股票代碼、名稱與產業別的搜尋索引，每個資料版本建立一次，由所有 session 共用"""
+        def _load():
+            with self.cursor('symbol_index') as cur:
+                rows = cur.execute(StockDB.GET_SYMBOLS).fetchall()
+            index = SymbolIndex(*zip(*rows)) if rows else SymbolIndex([], [], [])
+            logger.info(f"Built symbol index of {len(index)} stocks")
+            return index
+
+        self._sync_snapshot()
+        return self.query_cache.get_or_load(self.snapshot_version, ('symbol_index',), _load)
+
+    def get_stock_comparison(self, stock_ids: list, start_date, end_date, window: int = COMPARISON_CORRELATION_WINDOW):
+        """
+        比較多檔股票：以一次查詢取得所有股票的收盤價，轉為 日期 × 股票 的矩陣後計算報酬與相關係數
+        結果以 (股票, 日期區間, 視窗) 快取，回傳值為共用物件，不可直接修改
+        Args:
+            stock_ids: 股票代碼，第一檔為滾動相關係數的比較基準
+            window: 滾動相關係數的交易日數
+        Returns:
+            dict，dates 為交易日，stock_ids 為矩陣的欄位順序，其餘為 shape (交易日數, 股票數) 的矩陣：
+            closes（收盤價，沒有交易為 NaN）、normalized（累積報酬 %）、rolling_correlation（與基準股票），
+            以及 correlation（股票數 × 股票數的日報酬相關係數）
+        """
+        stock_ids = list(dict.fromkeys(stock_ids))
+        if not stock_ids:
+            raise ValueError("至少需要一檔股票")
+        if len(stock_ids) > COMPARISON_MAX_STOCKS:
+            raise ValueError(f"一次最多比較 {COMPARISON_MAX_STOCKS} 檔股票")
+
+        def _load():
+            sql = StockDB.GET_STOCKS_CLOSE.format(source=self._daily_source(start_date, end_date))
+            with self.cursor('stock_comparison') as cur:
+                data = cur.execute(sql, [stock_ids, start_date, end_date]).fetchnumpy()
+            dates, closes = comparison.pivot_closes(data['date'], data['stock_id'], data['closing_price'], stock_ids)
+            returns = comparison.daily_returns(closes)
+            return {
+                'dates': dates,
+                'stock_ids': tuple(stock_ids),
+                'closes': closes,
+                'normalized': comparison.normalized_returns(closes),
+                'correlation': comparison.correlation_matrix(returns),
+                'rolling_correlation': comparison.rolling_correlation(returns, 0, window),
+            }
+
+        self._sync_snapshot()
+        return self.query_cache.get_or_load(
+            self.snapshot_version,
+            ('comparison', tuple(stock_ids), start_date, end_date, window),
+            _load
+        )
+
+    def export_stock_history(self, stock_ids: list, start_date, end_date, fmt: str, path: str) -> int:
+        """
+        以 record batch 串流匯出每日資料到檔案，不建立 DataFrame
+        依股票代碼分段查詢（每段 EXPORT_CHUNK_STOCKS 檔），每段各自排序，記憶體用量不隨股票數與期間增加
+        Args:
+            stock_ids: 股票代碼，None 為全部股票
+            fmt: 'csv' 或 'parquet'（zstd 壓縮）
+            path: 輸出檔案的路徑
+        Returns:
+            匯出的筆數
+        """
+        if stock_ids is None:
+            stock_ids = list(self.get_stock_names()['stock_id'])
+        stock_ids = sorted(set(stock_ids))
+        sql = StockDB.EXPORT_STOCK_HISTORY.format(source=self._daily_source(start_date, end_date))
+
+        def _readers(cur):
+            # 至少執行一次查詢，沒有股票時也能以查詢的 schema 寫出欄位名稱
+            for i in range(0, max(len(stock_ids), 1), EXPORT_CHUNK_STOCKS):
+                cur.execute(sql, [stock_ids[i:i + EXPORT_CHUNK_STOCKS], start_date, end_date])
+                yield cur.fetch_record_batch(EXPORT_BATCH_ROWS)
+
+        with self.cursor('export_stock_history') as cur:
+            rows = export.write_file(_readers(cur), fmt, path)
+        logger.info(f"Exported {rows} daily rows of {len(stock_ids)} stocks as {fmt}")
+        return rows
+
+    def get_stock_info(self, stock_id: str):
+        """取得股票基本資料"""
+        return self.cached_query(StockDB.GET_STOCK_INFO, [stock_id], name='stock_info')
+
     def upsert_stock_info(self, stock_id: str, stock_name: str, industry: str, follow: bool, market_type: str, source: str, conditions: str = None):
         """寫入股票基本資料"""
         now = datetime.now()
         self.conn.execute(
             StockDB.UPSERT_STOCK_INFO,
-            [stock_id, stock_name, industry, follow, market_type, source, now, now, conditions]
+            [stock_id, stock_name, industry, follow, market_type, source, now, now, conditions,
+             *self._condition_flags(conditions)]
         )
+        self.conn.execute(StockDB.UPDATE_STOCK_SUMMARY_INFO, [stock_name, industry, market_type, stock_id])
+        self.db_modified = True
+
+    def upsert_daily_data(self, records: list) -> dict:
+        """寫入每日股票資料（欄位順序同 StockDB.DAILY_COLUMN_TYPES 的 tuple 列表）"""
+        if not records:
+            return {'inserted': 0, 'replaced': 0}
+        return self.upsert_daily_frame(pd.DataFrame(records, columns=list(StockDB.DAILY_COLUMN_TYPES)))
+
+    def upsert_daily_frame(self, data) -> dict:
+        """
+        以單一 SQL 批次寫入每日股票資料
+        Args:
+            data: pandas DataFrame 或 pyarrow Table，欄位名稱同 stock_daily，
+                  均線欄位可省略（取代既有資料時保留原本的均線）
+        Returns:
+            {'inserted': 新增筆數, 'replaced': 取代既有資料的筆數}
+        """
+        columns = list(data.column_names) if hasattr(data, 'column_names') else list(data.columns)
+        missing = [column for column in StockDB.DAILY_COLUMN_TYPES
+                   if column not in columns and column not in StockDB.DAILY_OPTIONAL_COLUMNS]
+        if missing:
+            raise ValueError(f"缺少必要欄位: {', '.join(missing)}")
+
+        staging = 'daily_staging'
+        # DataFrame / Arrow Table 以註冊方式直接掃描，不需複製資料
+        self.conn.register(staging, data)
+        try:
+            self._validate_daily_staging(staging, columns)
+            # 只寫入資料提供的欄位：INSERT OR REPLACE 只會更新列出的欄位，
+            # 省略均線時被取代的資料保留原本的均線，新增的資料則為 NULL 等待 update_moving_averages 計算
+            present = [column for column in StockDB.DAILY_COLUMN_TYPES if column in columns]
+            select_list = ', '.join(
+                f"CAST({column} AS {StockDB.DAILY_COLUMN_TYPES[column]}) AS {column}" for column in present
+            )
+            self.conn.execute("BEGIN TRANSACTION")
+            try:
+                total = self.conn.execute(f"SELECT COUNT(*) FROM {staging}").fetchone()[0]
+                stock_ids = [row[0] for row in self.conn.execute(
+                    f"SELECT DISTINCT CAST(stock_id AS VARCHAR) FROM {staging}"
+                ).fetchall()]
+                replaced = self.conn.execute(StockDB.COUNT_EXISTING_DAILY.format(staging=staging)).fetchone()[0]
+                self.conn.execute(f"""
+                    INSERT OR REPLACE INTO stock_daily ({', '.join(present)})
+                    SELECT {select_list} FROM {staging}
+                """)
+                self.refresh_stock_summary(stock_ids)
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+        finally:
+            self.conn.unregister(staging)
+
         self.db_modified = True
+        logger.info(f"Upserted daily data: {total - replaced} inserted, {replaced} replaced")
+        return {'inserted': total - replaced, 'replaced': replaced}
+
+    def _validate_daily_staging(self, staging: str, columns: list, column_types: dict = StockDB.DAILY_COLUMN_TYPES):
+        """檢查暫存資料的型別、主鍵空值與重複，有問題時拋出 ValueError"""
+        present = [column for column in column_types if column in columns]
+        checks = [
+            f"COUNT(*) FILTER (WHERE {column} IS NOT NULL AND TRY_CAST({column} AS {column_types[column]}) IS NULL)"
+            for column in present
+        ]
+        # 型別檢查先單獨執行，無法轉型的值不會在後面的 CAST 拋出 ConversionException
+        row = self.conn.execute(f"SELECT {', '.join(checks)} FROM {staging}").fetchone()
+        invalid = [column for column, count in zip(present, row) if count]
+        if invalid:
+            raise ValueError(f"欄位型別不符: {', '.join(invalid)}")
+        null_keys, duplicates = self.conn.execute(f"""
+            SELECT
+                COUNT(*) FILTER (WHERE date IS NULL OR stock_id IS NULL),
+                COUNT(*) - COUNT(DISTINCT (TRY_CAST(date AS DATE), TRY_CAST(stock_id AS VARCHAR)))
+            FROM {staging}
+        """).fetchone()
+        if null_keys:
+            raise ValueError(f"有 {null_keys} 筆資料缺少 date 或 stock_id")
+        if duplicates:
+            raise ValueError(f"有 {duplicates} 筆資料的 (date, stock_id) 重複")
 
-    def upsert_daily_data(self, records: list):
-        """寫入每日股票資料"""
-        self.conn.executemany(StockDB.UPSERT_DAILY_DATA, records)
+    def update_moving_averages(self, full: bool = False) -> int:
+        """
+        以單一 SQL 批次計算所有股票的 ma5/ma10/ma20/ma60
+        Args:
+            full: 是否重算全部歷史；預設只計算還沒有均線的新交易日，補寫舊日期的資料後需重算全部
+        Returns:
+            更新的資料筆數
+        """
+        self.conn.execute(StockDB.CREATE_MOVING_AVERAGE_STAGING, [full])
+        try:
+            updated = self.conn.execute(StockDB.UPDATE_MOVING_AVERAGES_FROM_STAGING).fetchone()[0]
+            stock_ids = None if full else [row[0] for row in self.conn.execute(
+                "SELECT DISTINCT stock_id FROM ma_staging"
+            ).fetchall()]
+            if stock_ids is None or stock_ids:
+                self.refresh_stock_summary(stock_ids)
+        finally:
+            self.conn.execute("DROP TABLE IF EXISTS ma_staging")
         self.db_modified = True
+        logger.info(f"Updated moving averages for {updated} rows")
+        return updated
+
+    def update_indicators(self, full: bool = False, batch_size: int = INDICATOR_BATCH_STOCKS) -> int:
+        """
+        批次計算所有股票的 RSI、MACD、KD 與布林通道，寫入 stock_indicators
+        每次取 batch_size 檔股票以向量化的方式計算，記憶體用量不隨股票數增加
+        Args:
+            full: 是否重算全部歷史；預設只計算每檔股票最後一筆指標之後的交易日，
+                  只讀取滾動視窗需要的前幾筆資料，遞迴指標以已儲存的狀態接續
+            batch_size: 每批計算的股票數
+        Returns:
+            寫入的資料筆數
+        """
+        stock_ids = [row[0] for row in self.conn.execute(StockDB.GET_INDICATOR_PENDING_STOCKS, [full]).fetchall()]
+        if full:
+            # 先清空再分批寫入，中途失敗時尚未寫入的股票會在下一次增量計算時補上
+            self.conn.execute(StockDB.DELETE_STOCK_INDICATORS)
+        input_sql = StockDB.GET_INDICATOR_INPUT.format(
+            lookback=indicators.LOOKBACK,
+            state_columns=', '.join(f"i.{column}" for column in indicators.STATE_COLUMNS)
+        )
+        columns = ', '.join(['stock_id', 'date', *indicators.INDICATOR_COLUMNS])
+
+        written = 0
+        for i in range(0, len(stock_ids), batch_size):
+            batch = stock_ids[i:i + batch_size]
+            frame = self.conn.execute(input_sql, [full, batch, batch]).fetchdf()
+            result = indicators.compute_indicators(frame)
+            self.conn.register('indicator_result', result)
+            try:
+                self.conn.execute(f"INSERT OR REPLACE INTO stock_indicators ({columns}) SELECT {columns} FROM indicator_result")
+            finally:
+                self.conn.unregister('indicator_result')
+            written += len(result)
+
+        self.db_modified = True
+        logger.info(f"Updated indicators for {len(stock_ids)} stocks, {written} rows")
+        return written
+
+    def get_stock_indicators(self, stock_id: str, start_date, end_date):
+        """取得股票在日期區間內預先計算的技術指標（依日期升序）"""
+        return self.cached_query(
+            StockDB.GET_STOCK_INDICATORS,
+            [stock_id, start_date, end_date],
+            name='stock_indicators'
+        )
+
+    def refresh_stock_summary(self, stock_ids: list = None):
+        """
+        重新計算股票摘要表 stock_summary
+        Args:
+            stock_ids: 要更新的股票代碼，None 表示全部股票
+        """
+        if stock_ids is None:
+            self.conn.execute(StockDB.DELETE_STALE_STOCK_SUMMARY)
+            self.conn.execute(StockDB.REFRESH_STOCK_SUMMARY.format(where=''))
+        else:
+            self.conn.execute(
+                StockDB.REFRESH_STOCK_SUMMARY.format(where=StockDB.STOCK_SUMMARY_FILTER),
+                [stock_ids]
+            )
+        self.refresh_market_overview()
+        self.db_modified = True
+
+    def refresh_market_overview(self):
+        """
+        重新計算最新交易日的市場概況 market_overview（漲跌家數、站上均線比例、產業漲跌幅與成交量排行）
+        寫入每日資料或均線後隨股票摘要一起更新，首頁只需讀取彙總後的結果
+        """
+        self.conn.execute(StockDB.DELETE_MARKET_OVERVIEW)
+        self.conn.execute(StockDB.REFRESH_MARKET_OVERVIEW.format(leaders=MARKET_VOLUME_LEADERS))
+        self.db_modified = True
+
+    def export_daily_partitions(self, months: list = None) -> list:
+        """
+        將 stock_daily 匯出為 GCS 上依年月分區的 Parquet，供 Parquet 模式的讀取端使用，
+        接著發布不含 stock_daily 的讀取端快照，讀取端只需下載這個較小的檔案與查詢用到的分區
+        Args:
+            months: 要匯出的 (年, 月) 列表，None 表示全部；每日更新只需匯出當月
+        """
+        store = self.parquet_store or ParquetPartitionStore(self.bucket_name)
+        exported = store.export(self.conn, months)
+        path = self._write_reader_snapshot()
+        try:
+            store.upload_reader_snapshot(path)
+        finally:
+            os.remove(path)
+        return exported
+
+    def _write_reader_snapshot(self) -> str:
+        """將 stock_daily 以外的資料表複製到另一個資料庫檔案，回傳檔案路徑"""
+        root, _ = os.path.splitext(self.db_path)
+        path = f"{root}.reader.db"
+        for stale in (path, f"{path}.wal"):
+            if os.path.exists(stale):
+                os.remove(stale)
+        tables = [row[0] for row in self.conn.execute(StockDB.GET_READER_SNAPSHOT_TABLES).fetchall()]
+        self.conn.execute(f"ATTACH '{path}' AS reader_snapshot")
+        try:
+            for table in tables:
+                self.conn.execute(f"CREATE TABLE reader_snapshot.{table} AS SELECT * FROM {table}")
+        finally:
+            self.conn.execute("DETACH reader_snapshot")
+        logger.info(f"Wrote reader snapshot with {len(tables)} tables")
+        return path
+
+    def upsert_institutional_frame(self, data) -> dict:
+        """
+        以單一 SQL 批次寫入三大法人買賣超，寫入後接續計算累計買賣超與連續買超天數
+        Args:
+            data: pandas DataFrame 或 pyarrow Table，欄位為 date、stock_id、foreign_net、trust_net、dealer_net（stock_name 可省略）
+        Returns:
+            {'inserted': 新增筆數, 'replaced': 取代既有資料的筆數}
+        """
+        columns = list(data.column_names) if hasattr(data, 'column_names') else list(data.columns)
+        missing = [column for column in StockDB.INSTITUTIONAL_COLUMN_TYPES
+                   if column not in columns and column not in StockDB.INSTITUTIONAL_OPTIONAL_COLUMNS]
+        if missing:
+            raise ValueError(f"缺少必要欄位: {', '.join(missing)}")
+
+        staging = 'institutional_input'
+        self.conn.register(staging, data)
+        try:
+            self._validate_daily_staging(staging, columns, StockDB.INSTITUTIONAL_COLUMN_TYPES)
+            select_list = ', '.join(
+                f"CAST({column} AS {column_type}) AS {column}" if column in columns
+                else f"CAST(NULL AS {column_type}) AS {column}"
+                for column, column_type in StockDB.INSTITUTIONAL_COLUMN_TYPES.items()
+            )
+            self.conn.execute("BEGIN TRANSACTION")
+            try:
+                total = self.conn.execute(f"SELECT COUNT(*) FROM {staging}").fetchone()[0]
+                replaced = self.conn.execute(
+                    StockDB.COUNT_EXISTING_INSTITUTIONAL.format(staging=staging)
+                ).fetchone()[0]
+                # 計算欄位寫入 NULL，代表需要重新計算（INSERT OR REPLACE 只會更新列出的欄位）
+                derived = StockDB.INSTITUTIONAL_DERIVED_COLUMNS
+                self.conn.execute(f"""
+                    INSERT OR REPLACE INTO institutional_daily
+                        ({', '.join(StockDB.INSTITUTIONAL_COLUMN_TYPES)}, total_net, {', '.join(derived)})
+                    SELECT *, COALESCE(foreign_net, 0) + COALESCE(trust_net, 0) + COALESCE(dealer_net, 0),
+                           {', '.join('NULL' for _ in derived)}
+                    FROM (SELECT {select_list} FROM {staging})
+                """)
+                # 同一個交易內計算累計值，每次寫入最多只觸發一次自動 checkpoint
+                updated = self._update_institutional_rolling(full=False)
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+        finally:
+            self.conn.unregister(staging)
+
+        self.db_modified = True
+        logger.info(f"Upserted institutional data: {total - replaced} inserted, {replaced} replaced, "
+                    f"{updated} rolling rows updated")
+        return {'inserted': total - replaced, 'replaced': replaced}
+
+    def update_institutional_rolling(self, full: bool = False) -> int:
+        """
+        以視窗函數批次計算 5/20/60 日累計買賣超與連續買超天數
+        Args:
+            full: 是否重算全部歷史；預設只從每檔股票第一筆尚未計算的日期開始，補寫舊日期時也會自動重算其後的資料
+        Returns:
+            更新的資料筆數
+        """
+        self.conn.execute("BEGIN TRANSACTION")
+        try:
+            updated = self._update_institutional_rolling(full)
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+        self.db_modified = True
+        logger.info(f"Updated institutional rolling totals for {updated} rows")
+        return updated
+
+    def _update_institutional_rolling(self, full: bool) -> int:
+        """在呼叫端的交易中計算累計值並寫回 institutional_daily"""
+        self.conn.execute(StockDB.CREATE_INSTITUTIONAL_ROLLING_STAGING, [full])
+        try:
+            return self.conn.execute(StockDB.UPDATE_INSTITUTIONAL_FROM_STAGING).fetchone()[0]
+        finally:
+            self.conn.execute("DROP TABLE IF EXISTS institutional_staging")
+
+    def get_institutional_latest_date(self):
+        """三大法人資料的最新交易日，沒有資料時回傳 None"""
+        latest = self.cached_query(StockDB.GET_INSTITUTIONAL_LATEST_DATE, name='institutional_latest_date').iloc[0, 0]
+        return None if pd.isna(latest) else latest.date()
+
+    def get_institutional_history(self, stock_id: str, start_date, end_date):
+        """取得股票在日期區間內的三大法人買賣超與預先計算的累計值（依日期升序）"""
+        return self.cached_query(
+            StockDB.GET_INSTITUTIONAL_HISTORY,
+            [stock_id, start_date, end_date],
+            name='institutional_history'
+        )
+
+    def get_institutional_ranking(self, date, investor: str = 'total', window: int = None,
+                                  ascending: bool = False, limit: int = 50):
+        """
+        取得單一交易日全市場的法人買賣超排行
+        Args:
+            date: 交易日
+            investor: 法人類別（foreign / trust / dealer / total）
+            window: 累計天數（5 / 20 / 60），None 為當日買賣超
+            ascending: True 為賣超排行
+            limit: 取回筆數
+        """
+        if investor not in StockDB.INSTITUTIONAL_INVESTORS:
+            raise ValueError(f"不支援的法人類別: {investor}")
+        if window is not None and window not in StockDB.INSTITUTIONAL_WINDOWS:
+            raise ValueError(f"不支援的累計天數: {window}")
+        column = f"{investor}_net" if window is None else f"{investor}_net_{window}"
+        sql = StockDB.GET_INSTITUTIONAL_RANKING.format(
+            column=column,
+            streak=f"{investor}_buy_streak",
+            order='ASC' if ascending else 'DESC',
+            source=self._daily_source(date, date)
+        )
+        return self.cached_query(sql, [date, limit], name='institutional_ranking')
+
+    def get_latest_trading_date(self):
+        """最新交易日，沒有資料時回傳 None"""
+        latest = self.cached_query(StockDB.GET_LATEST_TRADING_DATE, name='latest_trading_date').iloc[0, 0]
+        return None if pd.isna(latest) else latest.date()
+
+    def screen_by_rule(self, rule: str):
+        """
+        以自訂規則篩選最新交易日的全部股票，例如 close > ma20 and volume > 2 * avg(volume, 20)
+        規則編譯為單一 SQL，只讀取規則需要的最近交易日
+        Args:
+            rule: 規則文字，語法見 screener_rules
+        Returns:
+            符合規則的股票（stock_id、stock_name、industry、closing_price、change_percent、trade_volume）的 pyarrow Table
+        Raises:
+            RuleError: 規則語法錯誤
+        """
+        compiled = compile_rule(rule)
+        latest_date = self.get_latest_trading_date()
+        if latest_date is None:
+            return pa.table({column: [] for column in ['stock_id', 'stock_name', 'industry',
+                                                       'closing_price', 'change_percent', 'trade_volume']})
+        start_date = latest_date - timedelta(days=compiled.lookback_days)
+        sql = StockDB.SCREEN_BY_RULE.format(
+            expression=compiled.expression,
+            source=self._daily_source(start_date, latest_date)
+        )
+        return self.cached_query(sql, [start_date, latest_date, latest_date], name='screen_by_rule', arrow=True)
+
+    def get_trading_date_range(self):
+        """資料的 (第一個交易日, 最新交易日)，沒有資料時回傳 (None, None)"""
+        first, last = self.cached_query(StockDB.GET_TRADING_DATE_RANGE, name='trading_date_range').iloc[0]
+        return tuple(None if pd.isna(value) else value.date() for value in (first, last))
+
+    def backtest_conditions(self, conditions: list, rule: str = None, start_date=None, end_date=None):
+        """
+        回測篩選條件：在每個交易日計算條件，統計符合條件的股票與全市場在未來 1/5/20 個交易日的報酬
+        以 BACKTEST_CHUNK_DAYS 為單位分段查詢，每段只回傳依年度彙總的結果，記憶體用量不隨回測期間增加
+        Args:
+            conditions: StockDB.CONDITION_RULES 的 key，同時符合才算訊號
+            rule: 額外的自訂規則（screener_rules 語法），可省略
+            start_date: 回測起始日，None 為第一個交易日
+            end_date: 回測結束日，None 為最新交易日
+        Returns:
+            依年度彙總的 DataFrame（year、signals、signal_days，以及各持有天數的 {signal,market}_{count,sum,hits}_{天數}）
+        Raises:
+            RuleError: 自訂規則語法錯誤
+        """
+        unknown = [condition for condition in conditions if condition not in StockDB.CONDITION_RULES]
+        if unknown:
+            raise ValueError(f"未知的篩選條件: {', '.join(unknown)}")
+        compiled = compile_rule(rule) if rule else None
+        if not conditions and compiled is None:
+            raise ValueError("至少需要一個條件或自訂規則")
+
+        first_date, last_date = self.get_trading_date_range()
+        start_date = max(start_date or first_date, first_date) if first_date else None
+        end_date = min(end_date or last_date, last_date) if last_date else None
+        signal = ' AND '.join([
+            *(f"({StockDB.CONDITION_RULES[condition]})" for condition in conditions),
+            *([compiled.expression] if compiled else []),
+        ])
+        prev_columns = ''.join(
+            StockDB.BACKTEST_PREV_COLUMN.format(column=column)
+            for column in StockDB.CONDITION_PREV_COLUMNS
+            if re.search(rf"\bprev_{column}\b", signal)
+        )
+        # 往前多取計算前一日欄位與自訂規則需要的資料，往後多取計算未來報酬需要的資料
+        lookback_days = compiled.lookback_days if compiled else 15
+        forward_days = max(StockDB.BACKTEST_HORIZONS) * 2 + 15
+
+        def _load():
+            frames = []
+            chunk_start = start_date
+            while chunk_start is not None and chunk_start <= end_date:
+                chunk_end = min(chunk_start + timedelta(days=BACKTEST_CHUNK_DAYS - 1), end_date)
+                read_start = chunk_start - timedelta(days=lookback_days)
+                read_end = chunk_end + timedelta(days=forward_days)
+                sql = StockDB.BACKTEST_SIGNALS.format(
+                    source=self._daily_source(read_start, read_end),
+                    signal=signal,
+                    prev_columns=prev_columns
+                )
+                with self.cursor('backtest_chunk') as cur:
+                    frames.append(cur.execute(sql, [read_start, read_end, chunk_start, chunk_end]).fetchdf())
+                chunk_start = chunk_end + timedelta(days=1)
+            if not frames:
+                return pd.DataFrame(columns=['year', 'signals', 'signal_days'])
+            # 同一年度可能跨兩段查詢，各欄位都是加總與筆數，可直接相加
+            return (pd.concat(frames, ignore_index=True)
+                    .groupby('year', as_index=False).sum()
+                    .sort_values('year', ignore_index=True))
+
+        self._sync_snapshot()
+        return self.query_cache.get_or_load(
+            self.snapshot_version,
+            ('backtest', tuple(conditions), compiled.text if compiled else None, start_date, end_date),
+            _load
+        )
 
     def get_followed_stocks(self):
         """獲取所有追蹤的股票清單"""
@@ -71,9 +938,93 @@ class DatabaseManager:
 
     def update_stock_conditions(self, stock_conditions: dict):
         """批次更新股票的篩選判斷結果"""
-        for stock_id, conditions in stock_conditions.items():
-            self.conn.execute(
-                StockDB.UPDATE_STOCK_CONDITIONS,
-                [conditions, datetime.now(), stock_id]
-            )
-        self.db_modified = True
\ No newline at end of file
+        if not stock_conditions:
+            return
+        staging = pd.DataFrame(
+            [[stock_id, conditions, *self._condition_flags(conditions)]
+             for stock_id, conditions in stock_conditions.items()],
+            columns=['stock_id', 'conditions', *StockDB.CONDITION_COLUMNS]
+        )
+        self._update_conditions_from(staging)
+
+    def evaluate_stock_conditions(self) -> int:
+        """
+        依 StockDB.CONDITION_RULES 一次計算所有追蹤股票的篩選條件並寫回 stock_info
+        最新交易日沒有資料的追蹤股票，條件全部重設為 FALSE
+        Returns:
+            更新的股票數量
+        """
+        self.conn.execute(StockDB.EVALUATE_STOCK_CONDITIONS)
+        try:
+            updated = self.conn.execute(StockDB.UPDATE_CONDITIONS_FROM_STAGING, [datetime.now()]).fetchone()[0]
+        finally:
+            self.conn.execute("DROP TABLE IF EXISTS condition_staging")
+        self.db_modified = True
+        logger.info(f"Evaluated conditions for {updated} stocks")
+        return updated
+
+    def _update_conditions_from(self, data):
+        """將 (stock_id, conditions, 各條件欄位) 的資料寫入暫存表後，以單一 UPDATE 寫回 stock_info"""
+        self.conn.register('condition_input', data)
+        try:
+            self.conn.execute("""
+                CREATE OR REPLACE TEMP TABLE condition_staging AS
+                SELECT * REPLACE (CAST(conditions AS JSON) AS conditions)
+                FROM condition_input
+            """)
+            self.conn.execute(StockDB.UPDATE_CONDITIONS_FROM_STAGING, [datetime.now()])
+        finally:
+            self.conn.unregister('condition_input')
+            self.conn.execute("DROP TABLE IF EXISTS condition_staging")
+        self.db_modified = True
+
+
+# 程序內共用的 DatabaseManager，所有 Streamlit session 共用同一個資料庫連線
+_shared_manager = None
+_shared_manager_lock = threading.Lock()
+
+def get_db_manager() -> DatabaseManager:
+    """取得程序內共用的 DatabaseManager，第一次呼叫時才建立連線"""
+    global _shared_manager
+    if _shared_manager is None:
+        with _shared_manager_lock:
+            if _shared_manager is None:
+                db_path = os.getenv('DB_PATH', 'StockHero.db')
+                bucket_name = os.getenv('BUCKET_NAME', 'ian-line-bot-files')
+                # 有寫入端發布的本機快照時讀取最新版本；本地沒有資料庫檔案時，使用 GCS 快照快取並在背景更新
+                # Parquet 模式下的 GCS 快照不含 stock_daily，每日資料只下載查詢需要的年月分區
+                parquet = STORAGE_MODE == 'parquet'
+                snapshot = None
+                if LocalSnapshot.exists(db_path):
+                    snapshot = LocalSnapshot(db_path)
+                elif not os.path.exists(db_path):
+                    snapshot = SnapshotCache(db_path, bucket_name,
+                                             blob_name=PARQUET_READER_BLOB if parquet else 'StockHero.db')
+                parquet_store = ParquetPartitionStore(bucket_name) if parquet else None
+                manager = DatabaseManager(db_path, bucket_name, snapshot=snapshot,
+                                          parquet_store=parquet_store, read_only=True)
+                manager.connect()
+                # 搜尋索引由所有頁面共用，切換到新快照後先在背景建立
+                manager.add_snapshot_listener(DatabaseManager.get_symbol_index)
+                _shared_manager = manager
+    return _shared_manager
+
+
+@contextmanager
+def staging_db_manager(db_path: str = None, bucket_name: str = ''):
+    """
+    寫入端使用：複製目前發布的版本到 staging 檔案並在上面更新資料，
+    離開 with 區塊時 CHECKPOINT 後以 rename 發布為新版本；發生例外時捨棄 staging 檔案，讀取端不受影響
+    """
+    publisher = LocalSnapshot(db_path or os.getenv('DB_PATH', 'StockHero.db'))
+    manager = DatabaseManager(publisher.prepare_staging(), bucket_name)
+    manager.connect()
+    try:
+        yield manager
+        manager.conn.execute("CHECKPOINT")
+    except Exception:
+        manager.close()
+        os.remove(publisher.staging_path)
+        raise
+    manager.close()
+    publisher.publish()
@@ -0,0 +1,68 @@
+import os
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+import pyarrow.parquet as pq
+from config.config import EXPORT_BUFFER_BYTES
+
+# 匯出格式：格式 -> (MIME type, 副檔名)
+EXPORT_FORMATS = {
+    'csv': ('text/csv', 'csv'),
+    'parquet': ('application/vnd.apache.parquet', 'parquet'),
+}
+
+# Parquet 的壓縮方式
+PARQUET_COMPRESSION = 'zstd'
+
+
+def _open_writer(schema: pa.Schema, fmt: str, sink):
+    if fmt == 'csv':
+        return pa_csv.CSVWriter(sink, schema)
+    return pq.ParquetWriter(sink, schema, compression=PARQUET_COMPRESSION)
+
+
+def write_batches(readers, fmt: str, sink) -> int:
+    """
+    逐批將 record batch 寫入 sink，同一時間只保留一個 batch 與寫入端的緩衝區
+    Parquet 每個 batch 寫成一個 row group，不會累積整個結果
+    Args:
+        readers: RecordBatchReader 的序列（例如分段查詢的結果），欄位必須相同，以第一個的 schema 建立檔案
+        fmt: EXPORT_FORMATS 的 key
+        sink: 可寫入的檔案物件
+    Returns:
+        寫入的筆數
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"不支援的匯出格式: {fmt}")
+
+    writer = None
+    rows = 0
+    try:
+        for reader in readers:
+            if writer is None:
+                writer = _open_writer(reader.schema, fmt, sink)
+            for batch in reader:
+                writer.write_batch(batch)
+                rows += batch.num_rows
+    finally:
+        if writer is not None:
+            writer.close()
+    return rows
+
+
+def write_file(readers, fmt: str, path: str) -> int:
+    """
+    將 record batch 寫入檔案，經過 EXPORT_BUFFER_BYTES 大小的緩衝區
+    先寫入 .part 檔，完成後才改名，下載端不會讀到寫到一半的檔案
+    Returns:
+        寫入的筆數
+    """
+    part_path = f"{path}.part"
+    try:
+        with pa.output_stream(part_path, buffer_size=EXPORT_BUFFER_BYTES) as sink:
+            rows = write_batches(readers, fmt, sink)
+        os.replace(part_path, path)
+    except Exception:
+        if os.path.exists(part_path):
+            os.remove(part_path)
+        raise
+    return rows
@@ -0,0 +1,131 @@
+import os
+import time
+import uuid
+import threading
+from datetime import datetime, timedelta, timezone
+from config.config import EXPORT_PREFIX, EXPORT_TTL, EXPORT_CLEANUP_INTERVAL
+from config.logger import setup_logging
+
+# 設置 logger
+logger = setup_logging()
+
+class ExportStore:
+    """
+    匯出檔案的 GCS 儲存
+    檔案先以串流寫入本機暫存檔，上傳後立即刪除；下載使用有期限的簽名網址，
+    只有通過登入的工作階段能取得網址，且不依賴處理請求的 Cloud Run 執行個體
+    過期的檔案由背景執行緒定期刪除，不需等到下一次匯出
+    """
+    def __init__(self, bucket_name: str, prefix: str = EXPORT_PREFIX, ttl: float = EXPORT_TTL,
+                 storage_client=None):
+        self.bucket_name = bucket_name
+        self.prefix = prefix
+        self.ttl = ttl
+        self._storage_client = storage_client
+        self._cleanup_thread = None
+        self._lock = threading.Lock()
+
+    @property
+    def storage_client(self):
+        """延遲建立 GCS client，測試時可傳入假的 client"""
+        if self._storage_client is None:
+            from google.cloud import storage
+            self._storage_client = storage.Client()
+        return self._storage_client
+
+    def new_blob_name(self, file_name: str) -> str:
+        """每次匯出放在隨機名稱的目錄下，不會與其他使用者的檔案衝突"""
+        return f"{self.prefix}/{uuid.uuid4().hex}/{file_name}"
+
+    def upload(self, path: str, file_name: str, content_type: str) -> dict:
+        """
+        上傳匯出檔案並產生簽名網址
+        Returns:
+            {'blob': GCS 物件名稱, 'url': 下載網址, 'expires_at': 網址失效的 epoch 秒數}
+        """
+        bucket = self.storage_client.bucket(self.bucket_name)
+        blob = bucket.blob(self.new_blob_name(file_name))
+        # 瀏覽器以附件下載，並使用原本的檔名
+        blob.content_disposition = f'attachment; filename="{file_name}"'
+        blob.upload_from_filename(path, content_type=content_type, timeout=300)
+        expires_at = time.time() + self.ttl
+        url = blob.generate_signed_url(
+            version='v4',
+            expiration=timedelta(seconds=self.ttl),
+            method='GET',
+            **self._signing_credentials()
+        )
+        logger.info(f"Uploaded export {blob.name}")
+        return {'blob': blob.name, 'url': url, 'expires_at': expires_at}
+
+    def _signing_credentials(self) -> dict:
+        """Cloud Run 的預設憑證沒有私鑰，改以 access token 透過 IAM signBlob 簽名"""
+        credentials = getattr(self.storage_client, '_credentials', None)
+        if credentials is None or not hasattr(credentials, 'service_account_email'):
+            return {}
+        from google.auth.credentials import Signing
+        if isinstance(credentials, Signing):
+            return {}
+        if not credentials.valid:
+            from google.auth.transport.requests import Request
+            credentials.refresh(Request())
+        return {'service_account_email': credentials.service_account_email, 'access_token': credentials.token}
+
+    def cleanup(self) -> int:
+        """刪除超過保留時間的匯出檔案，回傳刪除的數量"""
+        cutoff = datetime.now(timezone.utc) - timedelta(seconds=self.ttl)
+        bucket = self.storage_client.bucket(self.bucket_name)
+        removed = 0
+        for blob in bucket.list_blobs(prefix=f"{self.prefix}/"):
+            if blob.time_created is None or blob.time_created >= cutoff:
+                continue
+            try:
+                blob.delete()
+                removed += 1
+            except Exception as e:
+                # 其他執行個體同時在清理
+                logger.warning(f"刪除匯出檔案失敗 {blob.name}: {str(e)}")
+        if removed:
+            logger.info(f"Removed {removed} expired exports")
+        return removed
+
+    def start_cleanup(self, interval: float = EXPORT_CLEANUP_INTERVAL):
+        """啟動定期清理的背景執行緒，重複呼叫不會啟動第二個"""
+        with self._lock:
+            if self._cleanup_thread is not None:
+                return
+            self._cleanup_thread = threading.Thread(
+                target=self._cleanup_loop, args=(interval,), name='export-cleanup', daemon=True
+            )
+            self._cleanup_thread.start()
+
+    def _cleanup_loop(self, interval: float):
+        while True:
+            try:
+                self.cleanup()
+            except Exception as e:
+                logger.error(f"清理匯出檔案失敗: {str(e)}")
+            time.sleep(interval)
+
+
+# 程序內共用的 ExportStore
+_shared_store = None
+_shared_store_lock = threading.Lock()
+
+def get_export_store():
+    """
+    取得程序內共用的 ExportStore，第一次呼叫時啟動定期清理
+    沒有設定 EXPORT_BUCKET（例如本機開發）時回傳 None，也不啟動清理
+    不沿用資料庫的 BUCKET_NAME，避免清理執行緒刪到其他用途的物件
+    """
+    global _shared_store
+    bucket_name = os.getenv('EXPORT_BUCKET', '').strip()
+    if not bucket_name:
+        return None
+    if _shared_store is None:
+        with _shared_store_lock:
+            if _shared_store is None:
+                store = ExportStore(bucket_name)
+                store.start_cleanup()
+                _shared_store = store
+    return _shared_store
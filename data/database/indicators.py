@@ -0,0 +1,97 @@
+import pandas as pd
+
+# 指標參數
+RSI_PERIOD = 14
+MACD_FAST = 12
+MACD_SLOW = 26
+MACD_SIGNAL = 9
+KD_PERIOD = 9
+BOLLINGER_PERIOD = 20
+BOLLINGER_WIDTH = 2
+
+# 滾動視窗（布林通道、RSV）需要的前幾筆資料；遞迴指標（EMA、RSI、KD）只需要前一筆的狀態
+LOOKBACK = max(BOLLINGER_PERIOD, KD_PERIOD) - 1
+
+# 遞迴指標的狀態欄位，增量計算時以最後一筆已計算的值接續
+STATE_COLUMNS = ['ema_fast', 'ema_slow', 'macd_signal', 'avg_gain', 'avg_loss', 'k', 'd']
+
+# 寫入 stock_indicators 的欄位（stock_id、date 以外）
+INDICATOR_COLUMNS = [
+    'rsi', 'macd', 'macd_signal', 'macd_hist', 'k', 'd',
+    'bb_upper', 'bb_middle', 'bb_lower',
+    'ema_fast', 'ema_slow', 'avg_gain', 'avg_loss',
+]
+
+# 顯示用的指標四捨五入的位數；狀態欄位保留完整精度，增量計算才會與全部重算一致
+DISPLAY_DECIMALS = 4
+
+
+def _ewm(values: pd.Series, groups: pd.Series, alpha: float) -> pd.Series:
+    """各股票分別計算 y = (1 - alpha) * y_prev + alpha * x，從第一個非 NaN 的值開始"""
+    return (
+        values.groupby(groups, sort=False)
+        .ewm(alpha=alpha, adjust=False, ignore_na=True)
+        .mean()
+        .droplevel(0)
+    )
+
+
+def _seeded(values: pd.Series, state: pd.Series, is_new: pd.Series, is_seed: pd.Series) -> pd.Series:
+    """遞迴指標的輸入：新資料為原始值，接續點為已儲存的狀態，其餘歷史資料為 NaN（不參與遞迴）"""
+    return values.where(is_new, state.where(is_seed))
+
+
+def compute_indicators(frame: pd.DataFrame) -> pd.DataFrame:
+    """
+    以向量化的方式計算一批股票的 RSI、MACD、KD 與布林通道
+    Args:
+        frame: 依 (stock_id, date) 排序的每日資料，欄位為 stock_id、date、closing_price、highest_price、lowest_price、
+               is_new（是否需要計算）與 STATE_COLUMNS（已計算資料的狀態，只有每檔股票最後一筆已計算的資料會使用）
+    Returns:
+        is_new 的資料列，欄位為 stock_id、date 與 INDICATOR_COLUMNS
+    """
+    frame = frame.reset_index(drop=True)
+    groups = frame['stock_id']
+    grouped = frame.groupby(groups, sort=False)
+    close = frame['closing_price']
+    is_new = frame['is_new'].astype(bool)
+    # 每檔股票最後一筆已計算的資料，遞迴指標從這裡接續
+    is_seed = ~is_new & is_new.groupby(groups, sort=False).shift(-1, fill_value=False)
+
+    def seeded(values, state_column):
+        return _seeded(values, frame[state_column], is_new, is_seed)
+
+    result = pd.DataFrame({'stock_id': groups, 'date': frame['date']})
+
+    # RSI（Wilder 平滑）
+    change = grouped['closing_price'].diff()
+    result['avg_gain'] = _ewm(seeded(change.clip(lower=0), 'avg_gain'), groups, 1 / RSI_PERIOD)
+    result['avg_loss'] = _ewm(seeded((-change).clip(lower=0), 'avg_loss'), groups, 1 / RSI_PERIOD)
+    result['rsi'] = (100 - 100 / (1 + result['avg_gain'] / result['avg_loss'])).where(
+        result['avg_loss'] > 0, 100.0
+    ).where(result['avg_gain'].notna())
+
+    # MACD
+    result['ema_fast'] = _ewm(seeded(close, 'ema_fast'), groups, 2 / (MACD_FAST + 1))
+    result['ema_slow'] = _ewm(seeded(close, 'ema_slow'), groups, 2 / (MACD_SLOW + 1))
+    result['macd'] = result['ema_fast'] - result['ema_slow']
+    result['macd_signal'] = _ewm(seeded(result['macd'], 'macd_signal'), groups, 2 / (MACD_SIGNAL + 1))
+    result['macd_hist'] = result['macd'] - result['macd_signal']
+
+    # KD：RSV 為收盤價在最近 KD_PERIOD 日高低區間的位置，K、D 為前一值 2/3 加上當日值 1/3
+    lowest = grouped['lowest_price'].rolling(KD_PERIOD).min().droplevel(0)
+    highest = grouped['highest_price'].rolling(KD_PERIOD).max().droplevel(0)
+    rsv = ((close - lowest) / (highest - lowest) * 100).where(highest > lowest, 50.0).where(lowest.notna())
+    result['k'] = _ewm(seeded(rsv, 'k'), groups, 1 / 3)
+    result['d'] = _ewm(seeded(result['k'], 'd'), groups, 1 / 3)
+
+    # 布林通道
+    middle = grouped['closing_price'].rolling(BOLLINGER_PERIOD).mean().droplevel(0)
+    std = grouped['closing_price'].rolling(BOLLINGER_PERIOD).std(ddof=0).droplevel(0)
+    result['bb_middle'] = middle
+    result['bb_upper'] = middle + BOLLINGER_WIDTH * std
+    result['bb_lower'] = middle - BOLLINGER_WIDTH * std
+
+    display_columns = [column for column in INDICATOR_COLUMNS if column not in STATE_COLUMNS]
+    result[display_columns] = result[display_columns].round(DISPLAY_DECIMALS)
+    return result.loc[is_new, ['stock_id', 'date', *INDICATOR_COLUMNS]]
@@ -1,5 +1,71 @@
+import itertools
 
 class StockDB:
+    # stock_daily 欄位與型別，批次寫入時依此驗證並轉型
+    DAILY_COLUMN_TYPES = {
+        'date': 'DATE',
+        'stock_id': 'VARCHAR',
+        'stock_name': 'VARCHAR',
+        'trade_volume': 'BIGINT',
+        'trade_value': 'BIGINT',
+        'opening_price': 'DOUBLE',
+        'highest_price': 'DOUBLE',
+        'lowest_price': 'DOUBLE',
+        'closing_price': 'DOUBLE',
+        'price_change': 'DOUBLE',
+        'change_percent': 'DOUBLE',
+        'transaction_count': 'INT',
+        'ma5': 'DOUBLE',
+        'ma10': 'DOUBLE',
+        'ma20': 'DOUBLE',
+        'ma60': 'DOUBLE',
+    }
+    # 批次寫入時可省略的欄位（均線由 update_moving_averages 計算）
+    DAILY_OPTIONAL_COLUMNS = ['ma5', 'ma10', 'ma20', 'ma60']
+
+    # 篩選條件的判斷式，以最新交易日的 stock_daily 欄位計算，前一交易日的欄位以 prev_ 開頭
+    # 新增條件只需在此加入一行，欄位、JSON 與批次計算的 SQL 都由此產生
+    CONDITION_RULES = {
+        'volume_increase': 'trade_volume > 2 * prev_trade_volume',
+        'above_ma5': 'closing_price > ma5',
+        'above_ma10': 'closing_price > ma10',
+        'above_ma20': 'closing_price > ma20',
+        'above_ma60': 'closing_price > ma60',
+    }
+
+    # 篩選條件，與 conditions JSON 的 key 相同，並各自存成 stock_info 的 BOOLEAN 欄位以便在 SQL 中篩選
+    CONDITION_COLUMNS = list(CONDITION_RULES)
+
+    # 判斷式可使用的前一交易日欄位
+    CONDITION_PREV_COLUMNS = [
+        column for column in DAILY_COLUMN_TYPES
+        if column not in ('date', 'stock_id', 'stock_name')
+    ]
+
+    # 由條件欄位組出 conditions JSON 的 SQL 運算式
+    CONDITIONS_JSON = f"""json_object({', '.join(f"'{column}', {column}" for column in CONDITION_COLUMNS)})"""
+
+    # 資料庫結構的版本，新增或修改資料表時加 1
+    # 寫入端建表後記錄版本，讀取端開啟時只檢查版本，不執行 DDL
+    SCHEMA_VERSION = 5
+    # 加入 schema_info 之前寫入的資料庫沒有版本紀錄，視為此版本
+    BASELINE_SCHEMA_VERSION = 1
+
+    CREATE_SCHEMA_INFO_TABLE = """
+        CREATE TABLE IF NOT EXISTS schema_info (
+            version INT,
+            updated_at TIMESTAMP
+        )
+    """
+
+    GET_SCHEMA_VERSION = "SELECT MAX(version) FROM schema_info"
+
+    SET_SCHEMA_VERSION = """
+        INSERT INTO schema_info
+        SELECT ?, ?
+        WHERE NOT EXISTS (SELECT 1 FROM schema_info WHERE version >= ?)
+    """
+
     # 定義建立資料表的 SQL
     CREATE_STOCK_DAILY_TABLE = """
         CREATE TABLE IF NOT EXISTS stock_daily (
@@ -33,15 +99,61 @@ class StockDB:
             source VARCHAR,
             created_at TIMESTAMP,
             updated_at TIMESTAMP,
-            conditions JSON -- Ex:{"volume_increase": true, "above_ma5": true, "above_ma10": false, "above_ma20": true, "above_ma60": false}
+            conditions JSON, -- Ex:{"volume_increase": true, "above_ma5": true, "above_ma10": false, "above_ma20": true, "above_ma60": false}
+            volume_increase BOOLEAN,     -- 成交量大於前日兩倍
+            above_ma5 BOOLEAN,           -- 站上 5 日線
+            above_ma10 BOOLEAN,          -- 站上 10 日線
+            above_ma20 BOOLEAN,          -- 站上 20 日線
+            above_ma60 BOOLEAN           -- 站上 60 日線
         )
     """
+
+    # 每檔股票的摘要，於每次寫入資料後更新，個股頁面只需一次主鍵查詢
+    CREATE_STOCK_SUMMARY_TABLE = """
+        CREATE TABLE IF NOT EXISTS stock_summary (
+            stock_id VARCHAR PRIMARY KEY,
+            stock_name VARCHAR,
+            industry VARCHAR,
+            market_type VARCHAR,
+            first_date DATE,              -- 第一個交易日
+            last_date DATE,               -- 最後一個交易日
+            row_count INT,                -- 交易日數
+            opening_price DOUBLE,         -- 以下為最後一個交易日的行情
+            highest_price DOUBLE,
+            lowest_price DOUBLE,
+            closing_price DOUBLE,
+            price_change DOUBLE,
+            change_percent DOUBLE,
+            trade_volume BIGINT,
+            transaction_count INT,
+            ma5 DOUBLE,
+            ma10 DOUBLE,
+            ma20 DOUBLE,
+            ma60 DOUBLE,
+            updated_at TIMESTAMP
+        )
+    """
+
+    # 舊版資料庫沒有條件欄位，補上欄位後再從 conditions JSON 回填
+    ADD_CONDITION_COLUMNS = [
+        f"ALTER TABLE stock_info ADD COLUMN IF NOT EXISTS {column} BOOLEAN"
+        for column in CONDITION_COLUMNS
+    ]
+
+    BACKFILL_CONDITION_COLUMNS = f"""
+        UPDATE stock_info
+        SET {', '.join(f"{column} = COALESCE(TRY_CAST(json_extract(conditions, '$.{column}') AS BOOLEAN), FALSE)"
+                       for column in CONDITION_COLUMNS)}
+        WHERE conditions IS NOT NULL
+        AND {CONDITION_COLUMNS[0]} IS NULL
+    """
     
     # 定義常用的 SQL 查詢語句
-    UPSERT_STOCK_INFO = """
+    UPSERT_STOCK_INFO = f"""
         INSERT OR REPLACE INTO stock_info
-        (stock_id, stock_name, industry, follow, market_type, source, created_at, updated_at, conditions)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        (stock_id, stock_name, industry, follow, market_type, source, created_at, updated_at, conditions,
+         {', '.join(CONDITION_COLUMNS)})
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, {', '.join('?' for _ in CONDITION_COLUMNS)})
     """
     
     UPSERT_DAILY_DATA = """
@@ -53,6 +165,14 @@ class StockDB:
         VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
     """
 
+    # 批次寫入前計算暫存資料中已存在於 stock_daily 的筆數（即會被取代的筆數）
+    COUNT_EXISTING_DAILY = """
+        SELECT COUNT(*)
+        FROM {staging} s
+        JOIN stock_daily d
+        ON d.date = CAST(s.date AS DATE) AND d.stock_id = CAST(s.stock_id AS VARCHAR)
+    """
+
     GET_FOLLOWED_STOCKS = """
         SELECT stock_id, stock_name 
         FROM stock_info 
@@ -80,6 +200,238 @@ class StockDB:
         WHERE stock_id = ? AND date = ?
     """
 
+    # 批次計算所有股票的均線；第一個參數為 TRUE 時重算全部歷史，
+    # 否則只計算每檔股票最後一筆已有均線之後的交易日，並往前多取 59 筆作為 60 日均線的計算窗口
+    # 視窗函數只讀取待計算股票的這一段資料，每日更新的成本不隨歷史長度增加；
+    # 收盤價不足 5 筆的股票還算不出任何均線，不列入待計算，避免每次都重算
+    # 結果先寫入暫存表 ma_staging，直接以含視窗函數的子查詢 UPDATE 會慢一個數量級
+    CREATE_MOVING_AVERAGE_STAGING = """
+        CREATE OR REPLACE TEMP TABLE ma_staging AS
+        WITH last_ma AS (
+            SELECT stock_id,
+                   CASE WHEN ? THEN NULL
+                        ELSE MAX(date) FILTER (WHERE ma5 IS NOT NULL) END AS last_date,
+                   MAX(date) AS max_date
+            FROM stock_daily
+            GROUP BY stock_id
+            HAVING COUNT(closing_price) >= 5
+        ),
+        pending AS (
+            SELECT stock_id, last_date
+            FROM last_ma
+            WHERE last_date IS NULL OR max_date > last_date
+        ),
+        window_start AS (
+            -- last_date（含）之前最後 59 筆的第一個日期，以 top-N 彙總取得，不需排序全部歷史
+            SELECT d.stock_id, list_min(MAX(d.date, 59)) AS start_date
+            FROM stock_daily d
+            JOIN pending p ON d.stock_id = p.stock_id
+            WHERE d.date <= p.last_date
+            GROUP BY d.stock_id
+        ),
+        prices AS (
+            -- 以 DECIMAL 加總，避免浮點數加總順序不同導致重算結果在四捨五入邊界不一致
+            SELECT d.stock_id, d.date, CAST(d.closing_price AS DECIMAL(18, 4)) AS price, p.last_date
+            FROM stock_daily d
+            JOIN pending p ON d.stock_id = p.stock_id
+            LEFT JOIN window_start w ON d.stock_id = w.stock_id
+            WHERE w.start_date IS NULL OR d.date >= w.start_date
+        )
+        -- 計算窗口的資料只用於視窗函數，暫存表只保留需要寫回的交易日
+        SELECT *
+        FROM (
+            SELECT stock_id, date, last_date,
+                   CASE WHEN COUNT(price) OVER w5 = 5 THEN ROUND(SUM(price) OVER w5 / 5, 2) END AS ma5,
+                   CASE WHEN COUNT(price) OVER w10 = 10 THEN ROUND(SUM(price) OVER w10 / 10, 2) END AS ma10,
+                   CASE WHEN COUNT(price) OVER w20 = 20 THEN ROUND(SUM(price) OVER w20 / 20, 2) END AS ma20,
+                   CASE WHEN COUNT(price) OVER w60 = 60 THEN ROUND(SUM(price) OVER w60 / 60, 2) END AS ma60
+            FROM prices
+            WINDOW w5 AS (PARTITION BY stock_id ORDER BY date ROWS BETWEEN 4 PRECEDING AND CURRENT ROW),
+                   w10 AS (PARTITION BY stock_id ORDER BY date ROWS BETWEEN 9 PRECEDING AND CURRENT ROW),
+                   w20 AS (PARTITION BY stock_id ORDER BY date ROWS BETWEEN 19 PRECEDING AND CURRENT ROW),
+                   w60 AS (PARTITION BY stock_id ORDER BY date ROWS BETWEEN 59 PRECEDING AND CURRENT ROW)
+        )
+        WHERE last_date IS NULL OR date > last_date
+    """
+
+    UPDATE_MOVING_AVERAGES_FROM_STAGING = """
+        UPDATE stock_daily
+        SET ma5 = ma.ma5, ma10 = ma.ma10, ma20 = ma.ma20, ma60 = ma.ma60
+        FROM ma_staging ma
+        WHERE stock_daily.stock_id = ma.stock_id
+        AND stock_daily.date = ma.date
+        AND (ma.last_date IS NULL OR ma.date > ma.last_date)
+    """
+
+    # 重新計算股票摘要；{where} 為空字串時更新全部股票，或代入 STOCK_SUMMARY_FILTER 只更新指定股票
+    REFRESH_STOCK_SUMMARY = """
+        INSERT OR REPLACE INTO stock_summary
+        WITH agg AS (
+            SELECT stock_id, MIN(date) AS first_date, MAX(date) AS last_date, COUNT(*) AS row_count
+            FROM stock_daily
+            {where}
+            GROUP BY stock_id
+        )
+        SELECT agg.stock_id,
+               COALESCE(i.stock_name, d.stock_name),
+               i.industry,
+               i.market_type,
+               agg.first_date, agg.last_date, agg.row_count,
+               d.opening_price, d.highest_price, d.lowest_price, d.closing_price,
+               d.price_change, d.change_percent, d.trade_volume, d.transaction_count,
+               d.ma5, d.ma10, d.ma20, d.ma60,
+               now()
+        FROM agg
+        JOIN stock_daily d ON d.stock_id = agg.stock_id AND d.date = agg.last_date
+        LEFT JOIN stock_info i ON i.stock_id = agg.stock_id
+    """
+
+    STOCK_SUMMARY_FILTER = "WHERE stock_id IN (SELECT UNNEST(?::VARCHAR[]))"
+
+    # 移除已沒有每日資料的股票摘要
+    DELETE_STALE_STOCK_SUMMARY = """
+        DELETE FROM stock_summary
+        WHERE stock_id NOT IN (SELECT DISTINCT stock_id FROM stock_daily)
+    """
+
+    # 最新交易日的市場概況，於每次更新股票摘要時重新計算，首頁只需讀取這張小表
+    # industry 為 NULL 的一列是全市場，其餘每個產業一列；沒有基本資料的股票歸入「未分類」
+    CREATE_MARKET_OVERVIEW_TABLE = """
+        CREATE TABLE IF NOT EXISTS market_overview (
+            date DATE,
+            industry VARCHAR,
+            stock_count INT,
+            advances INT,                 -- 上漲家數
+            declines INT,                 -- 下跌家數
+            unchanged INT,                -- 平盤家數
+            above_ma5 INT,                -- 站上均線的家數
+            above_ma10 INT,
+            above_ma20 INT,
+            above_ma60 INT,
+            ma5_count INT,                -- 有均線資料的家數（站上均線比例的分母）
+            ma10_count INT,
+            ma20_count INT,
+            ma60_count INT,
+            avg_change_percent DOUBLE,    -- 平均漲跌幅（%）
+            trade_volume BIGINT,
+            trade_value BIGINT,
+            -- 成交量最大的股票，依成交量降序
+            volume_leaders STRUCT(stock_id VARCHAR, stock_name VARCHAR, closing_price DOUBLE,
+                                  change_percent DOUBLE, trade_volume BIGINT)[],
+            updated_at TIMESTAMP
+        )
+    """
+
+    DELETE_MARKET_OVERVIEW = "DELETE FROM market_overview"
+
+    # 以單一彙總計算最新交易日的全市場與各產業概況，{leaders} 為成交量排行的筆數
+    REFRESH_MARKET_OVERVIEW = """
+        INSERT INTO market_overview
+        WITH latest AS (
+            SELECT d.*, COALESCE(i.industry, '未分類') AS sector, COALESCE(i.stock_name, d.stock_name) AS name
+            FROM stock_daily d
+            LEFT JOIN stock_info i ON i.stock_id = d.stock_id
+            WHERE d.date = (SELECT MAX(date) FROM stock_daily)
+        )
+        SELECT
+            MAX(date),
+            CASE WHEN GROUPING(sector) = 1 THEN NULL ELSE sector END,
+            COUNT(*),
+            COUNT(*) FILTER (WHERE price_change > 0),
+            COUNT(*) FILTER (WHERE price_change < 0),
+            COUNT(*) FILTER (WHERE price_change = 0),
+            COUNT(*) FILTER (WHERE closing_price > ma5),
+            COUNT(*) FILTER (WHERE closing_price > ma10),
+            COUNT(*) FILTER (WHERE closing_price > ma20),
+            COUNT(*) FILTER (WHERE closing_price > ma60),
+            COUNT(ma5), COUNT(ma10), COUNT(ma20), COUNT(ma60),
+            AVG(change_percent),
+            SUM(trade_volume),
+            SUM(trade_value),
+            list(
+                {{'stock_id': stock_id, 'stock_name': name, 'closing_price': closing_price,
+                  'change_percent': change_percent, 'trade_volume': trade_volume}}
+                ORDER BY trade_volume DESC NULLS LAST, stock_id
+            )[1:{leaders}],
+            now()
+        FROM latest
+        GROUP BY GROUPING SETS ((), (sector))
+        -- 沒有每日資料時不寫入全市場的空白列
+        HAVING COUNT(*) > 0
+    """
+
+    # 全市場的一列排在最前面，產業依平均漲跌幅降序
+    GET_MARKET_OVERVIEW = """
+        SELECT *
+        FROM market_overview
+        ORDER BY industry IS NOT NULL, avg_change_percent DESC
+    """
+
+    UPDATE_STOCK_SUMMARY_INFO = """
+        UPDATE stock_summary
+        SET stock_name = ?, industry = ?, market_type = ?
+        WHERE stock_id = ?
+    """
+
+    GET_STOCK_SUMMARY = """
+        SELECT *
+        FROM stock_summary
+        WHERE stock_id = ?
+    """
+
+    # Parquet 模式下日期區間內沒有任何分區時的每日資料來源（讀取端快照沒有 stock_daily）
+    EMPTY_DAILY_SOURCE = f"""(SELECT {', '.join(f"CAST(NULL AS {column_type}) AS {column}"
+                                                for column, column_type in DAILY_COLUMN_TYPES.items())} WHERE FALSE)"""
+
+    # Parquet 模式讀取端快照包含的資料表：stock_daily 以外的所有資料表
+    GET_READER_SNAPSHOT_TABLES = """
+        SELECT table_name
+        FROM duckdb_tables()
+        WHERE database_name = current_database()
+        AND schema_name = 'main'
+        AND NOT temporary
+        AND table_name <> 'stock_daily'
+        ORDER BY table_name
+    """
+
+    # {source} 為 stock_daily 或 Parquet 分區的 read_parquet(...)
+    GET_STOCK_HISTORY = """
+        SELECT *
+        FROM {source}
+        WHERE stock_id = ?
+        AND date BETWEEN ? AND ?
+        ORDER BY date DESC
+    """
+
+    # 將每日資料彙總為週 K / 月 K，第一個參數為 date_trunc 的週期（week / month），
+    # 日期取該週期第一個交易日，漲跌幅以前一週期收盤價計算
+    GET_STOCK_HISTORY_RESAMPLED = """
+        SELECT *,
+               (closing_price - COALESCE(LAG(closing_price) OVER (ORDER BY date), opening_price))
+               / COALESCE(LAG(closing_price) OVER (ORDER BY date), opening_price) * 100 AS change_percent
+        FROM (
+            SELECT MIN(date) AS date,
+                   arg_min(opening_price, date) AS opening_price,
+                   MAX(highest_price) AS highest_price,
+                   MIN(lowest_price) AS lowest_price,
+                   arg_max(closing_price, date) AS closing_price,
+                   SUM(trade_volume) AS trade_volume,
+                   SUM(trade_value) AS trade_value,
+                   SUM(transaction_count) AS transaction_count
+            FROM {source}
+            WHERE stock_id = ?
+            AND date BETWEEN ? AND ?
+            GROUP BY date_trunc(?, date)
+        )
+        ORDER BY date
+    """
+
+    GET_STOCK_INFO = """
+        SELECT *
+        FROM stock_info
+        WHERE stock_id = ?
+    """
+
     GET_LATEST_TWO_DAYS_DATA = """
         SELECT date, stock_id, trade_volume, closing_price, ma5, ma10, ma20, ma60
         FROM stock_daily
@@ -97,9 +449,376 @@ class StockDB:
         ORDER BY stock_id, date DESC
     """
 
-    UPDATE_STOCK_CONDITIONS = """
-        UPDATE stock_info 
-        SET conditions = ?, 
+    # 計算所有追蹤股票在最新交易日的篩選條件，結果寫入暫存表 condition_staging
+    # 最新交易日沒有資料（停牌、資料缺漏）的追蹤股票條件全部為 FALSE，不沿用上一次的判斷結果
+    EVALUATE_STOCK_CONDITIONS = f"""
+        CREATE OR REPLACE TEMP TABLE condition_staging AS
+        WITH recent AS (
+            SELECT d.*,
+                   {', '.join(f"LAG({column}) OVER (PARTITION BY stock_id ORDER BY date) AS prev_{column}"
+                              for column in CONDITION_PREV_COLUMNS)}
+            FROM stock_daily d
+            WHERE date IN (
+                SELECT DISTINCT date
+                FROM stock_daily
+                ORDER BY date DESC
+                LIMIT 2
+            )
+            AND stock_id IN (
+                SELECT stock_id
+                FROM stock_info
+                WHERE follow = TRUE
+            )
+        ),
+        latest AS (
+            SELECT stock_id,
+                   {', '.join(f"{rule} AS {column}" for column, rule in CONDITION_RULES.items())}
+            FROM recent
+            WHERE date = (SELECT MAX(date) FROM stock_daily)
+        )
+        SELECT *, {CONDITIONS_JSON} AS conditions
+        FROM (
+            SELECT i.stock_id,
+                   {', '.join(f"COALESCE(l.{column}, FALSE) AS {column}" for column in CONDITION_COLUMNS)}
+            FROM stock_info i
+            LEFT JOIN latest l ON i.stock_id = l.stock_id
+            WHERE i.follow = TRUE
+        )
+    """
+
+    # 以暫存表 condition_staging（stock_id、conditions 與各條件欄位）一次更新所有股票
+    UPDATE_CONDITIONS_FROM_STAGING = f"""
+        UPDATE stock_info
+        SET conditions = s.conditions,
+            {''.join(f"{column} = s.{column}, " for column in CONDITION_COLUMNS)}
             updated_at = ?
+        FROM condition_staging s
+        WHERE stock_info.stock_id = s.stock_id
+    """
+
+    # --- 三大法人買賣超 ---
+
+    # institutional_daily 寫入時的欄位與型別，三大法人合計由寫入時計算
+    INSTITUTIONAL_COLUMN_TYPES = {
+        'date': 'DATE',
+        'stock_id': 'VARCHAR',
+        'stock_name': 'VARCHAR',
+        'foreign_net': 'BIGINT',
+        'trust_net': 'BIGINT',
+        'dealer_net': 'BIGINT',
+    }
+    INSTITUTIONAL_OPTIONAL_COLUMNS = ['stock_name']
+
+    # 法人類別（欄位前綴）與累計天數，累計買賣超欄位為 {法人}_net_{天數}，連續買超天數為 {法人}_buy_streak
+    INSTITUTIONAL_INVESTORS = {
+        'foreign': '外資',
+        'trust': '投信',
+        'dealer': '自營商',
+        'total': '三大法人',
+    }
+    INSTITUTIONAL_WINDOWS = [5, 20, 60]
+    INSTITUTIONAL_ROLLING = list(itertools.product(INSTITUTIONAL_INVESTORS, INSTITUTIONAL_WINDOWS))
+    INSTITUTIONAL_DERIVED_COLUMNS = (
+        [f"{investor}_net_{window}" for investor, window in INSTITUTIONAL_ROLLING]
+        + [f"{investor}_buy_streak" for investor in INSTITUTIONAL_INVESTORS]
+    )
+
+    CREATE_INSTITUTIONAL_DAILY_TABLE = f"""
+        CREATE TABLE IF NOT EXISTS institutional_daily (
+            date DATE,
+            stock_id VARCHAR,
+            stock_name VARCHAR,
+            foreign_net BIGINT,           -- 外資買賣超股數
+            trust_net BIGINT,             -- 投信買賣超股數
+            dealer_net BIGINT,            -- 自營商買賣超股數
+            total_net BIGINT,             -- 三大法人合計買賣超股數
+            -- 以下由 update_institutional_rolling 計算：N 日累計買賣超與連續買超天數（當日未買超為 0）
+            {''.join(f"{investor}_net_{window} BIGINT, " for investor, window in INSTITUTIONAL_ROLLING)}
+            {''.join(f"{investor}_buy_streak INT, " for investor in INSTITUTIONAL_INVESTORS)}
+            PRIMARY KEY (date, stock_id)
+        )
+    """
+
+    COUNT_EXISTING_INSTITUTIONAL = """
+        SELECT COUNT(*)
+        FROM {staging} s
+        JOIN institutional_daily d
+        ON d.date = CAST(s.date AS DATE) AND d.stock_id = CAST(s.stock_id AS VARCHAR)
+    """
+
+    # 連續買超天數：當日買超時，為目前序號減去最近一次中斷的序號；
+    # 未買超的交易日在自己的序號中斷，前一筆已計算的資料（序號 0）視為在 0 - 連續買超天數 中斷
+    INSTITUTIONAL_STREAK_EXPRESSIONS = [
+        f"""CASE WHEN {investor}_net > 0
+                 THEN rn - COALESCE(MAX({investor}_break) OVER running, 0)
+                 ELSE 0 END AS {investor}_buy_streak"""
+        for investor in INSTITUTIONAL_INVESTORS
+    ]
+
+    # 計算累計買賣超與連續買超天數，結果寫入暫存表 institutional_staging
+    # 參數為是否重算全部歷史；預設從每檔股票第一筆尚未計算（total_buy_streak 為 NULL）的日期開始編號（1, 2, ...），
+    # 之前最多 59 筆已計算的資料依日期倒序編為 0, -1, ...，只用來補足累計視窗與接續連續買超天數
+    CREATE_INSTITUTIONAL_ROLLING_STAGING = f"""
+        CREATE OR REPLACE TEMP TABLE institutional_staging AS
+        WITH pending AS (
+            SELECT stock_id, MIN(date) AS first_date
+            FROM institutional_daily
+            WHERE ? OR total_buy_streak IS NULL
+            GROUP BY stock_id
+        ),
+        windowed AS (
+            SELECT d.stock_id, d.date,
+                   {''.join(f"d.{investor}_net, " for investor in INSTITUTIONAL_INVESTORS)}
+                   1 - ROW_NUMBER() OVER (PARTITION BY d.stock_id ORDER BY d.date DESC) AS rn,
+                   {', '.join(f"CASE WHEN rn = 0 THEN -COALESCE(d.{investor}_buy_streak, 0) END AS {investor}_break"
+                              for investor in INSTITUTIONAL_INVESTORS)}
+            FROM institutional_daily d
+            JOIN pending p ON d.stock_id = p.stock_id
+            WHERE d.date < p.first_date
+            QUALIFY rn > -{max(INSTITUTIONAL_WINDOWS) - 1}
+            UNION ALL
+            SELECT d.stock_id, d.date,
+                   {''.join(f"d.{investor}_net, " for investor in INSTITUTIONAL_INVESTORS)}
+                   ROW_NUMBER() OVER (PARTITION BY d.stock_id ORDER BY d.date) AS rn,
+                   {', '.join(f"CASE WHEN NOT COALESCE(d.{investor}_net > 0, FALSE) THEN rn END AS {investor}_break"
+                              for investor in INSTITUTIONAL_INVESTORS)}
+            FROM institutional_daily d
+            JOIN pending p ON d.stock_id = p.stock_id
+            WHERE d.date >= p.first_date
+        )
+        SELECT stock_id, date,
+               {''.join(f"SUM({investor}_net) OVER w{window} AS {investor}_net_{window}, "
+                        for investor, window in INSTITUTIONAL_ROLLING)}
+               {', '.join(INSTITUTIONAL_STREAK_EXPRESSIONS)}
+        FROM windowed
+        WINDOW {''.join(f"w{window} AS (PARTITION BY stock_id ORDER BY rn ROWS BETWEEN {window - 1} PRECEDING AND CURRENT ROW), "
+                        for window in INSTITUTIONAL_WINDOWS)}
+               running AS (PARTITION BY stock_id ORDER BY rn ROWS BETWEEN UNBOUNDED PRECEDING AND CURRENT ROW)
+        QUALIFY rn > 0
+    """
+
+    UPDATE_INSTITUTIONAL_FROM_STAGING = f"""
+        UPDATE institutional_daily
+        SET {', '.join(f"{column} = s.{column}" for column in INSTITUTIONAL_DERIVED_COLUMNS)}
+        FROM institutional_staging s
+        WHERE institutional_daily.stock_id = s.stock_id
+        AND institutional_daily.date = s.date
+    """
+
+    GET_INSTITUTIONAL_LATEST_DATE = """
+        SELECT MAX(date) FROM institutional_daily
+    """
+
+    GET_INSTITUTIONAL_HISTORY = """
+        SELECT *
+        FROM institutional_daily
+        WHERE stock_id = ?
+        AND date BETWEEN ? AND ?
+        ORDER BY date
+    """
+
+    # 單一交易日的全市場排行，{column} 為買賣超欄位（經 INSTITUTIONAL 常數驗證），{order} 為 DESC 或 ASC，
+    # {source} 為每日資料來源
+    GET_INSTITUTIONAL_RANKING = """
+        SELECT d.stock_id,
+               COALESCE(i.stock_name, d.stock_name) AS stock_name,
+               i.industry,
+               d.{column} AS net,
+               d.{streak} AS buy_streak,
+               s.closing_price,
+               s.change_percent
+        FROM institutional_daily d
+        LEFT JOIN stock_info i ON d.stock_id = i.stock_id
+        LEFT JOIN {source} s ON d.stock_id = s.stock_id AND d.date = s.date
+        WHERE d.date = ?
+        AND d.{column} IS NOT NULL
+        ORDER BY d.{column} {order}, d.stock_id
+        LIMIT ?
+    """
+
+    # --- 自訂篩選規則 ---
+
+    # 最新交易日（以股票摘要計算，不需掃描 stock_daily）
+    GET_LATEST_TRADING_DATE = """
+        SELECT MAX(last_date)
+        FROM stock_summary
+    """
+
+    # 以自訂規則篩選最新交易日的股票，{source} 為每日資料來源，{expression} 為 screener_rules 編譯的判斷式
+    # 參數為計算視窗的起始日、最新交易日（兩次）；只讀取規則需要的最近交易日，視窗計算後再取最新交易日
+    SCREEN_BY_RULE = """
+        SELECT e.stock_id,
+               COALESCE(i.stock_name, e.stock_name) AS stock_name,
+               i.industry,
+               e.closing_price,
+               e.change_percent,
+               e.trade_volume
+        FROM (
+            SELECT stock_id, stock_name, date, closing_price, change_percent, trade_volume,
+                   {expression} AS matched
+            FROM {source}
+            WHERE date BETWEEN ? AND ?
+        ) e
+        LEFT JOIN stock_info i ON e.stock_id = i.stock_id
+        WHERE e.date = ?
+        AND e.matched
+        ORDER BY i.industry, e.stock_id
+    """
+
+    # --- 歷史回測 ---
+
+    # 回測的持有天數（交易日），報酬以 n 個交易日後的收盤價計算
+    BACKTEST_HORIZONS = [1, 5, 20]
+
+    # 回測資料的日期範圍
+    GET_TRADING_DATE_RANGE = """
+        SELECT MIN(first_date), MAX(last_date)
+        FROM stock_summary
+    """
+
+    # 依年度彙總一段日期區間的訊號與全市場的未來報酬，{signal} 為條件組成的判斷式（可使用視窗函數），
+    # {prev_columns} 為判斷式用到的前一交易日欄位（由 BACKTEST_PREV_COLUMN 組成，只計算需要的欄位）
+    # 參數為讀取的起訖日（前後多取計算前一日與未來報酬需要的資料）與統計的起訖日；
+    # 回傳加總與筆數而非平均，各區間的結果可直接相加
+    BACKTEST_PREV_COLUMN = ", LAG({column}) OVER w AS prev_{column}"
+
+    BACKTEST_SIGNALS = f"""
+        WITH daily AS (
+            SELECT *{{prev_columns}},
+                   {', '.join(f"LEAD(closing_price, {horizon}) OVER w / NULLIF(closing_price, 0) - 1 AS return_{horizon}"
+                              for horizon in BACKTEST_HORIZONS)}
+            FROM {{source}}
+            WHERE date BETWEEN ? AND ?
+            WINDOW w AS (PARTITION BY stock_id ORDER BY date)
+        ),
+        evaluated AS (
+            SELECT date,
+                   COALESCE({{signal}}, FALSE) AS signal,
+                   {', '.join(f"return_{horizon}" for horizon in BACKTEST_HORIZONS)}
+            FROM daily
+        )
+        SELECT year(date) AS year,
+               COUNT(*) FILTER (WHERE signal) AS signals,
+               COUNT(DISTINCT date) FILTER (WHERE signal) AS signal_days,
+               {', '.join(
+                   f"COUNT(return_{horizon}) FILTER (WHERE signal) AS signal_count_{horizon}, "
+                   f"SUM(return_{horizon}) FILTER (WHERE signal) AS signal_sum_{horizon}, "
+                   f"COUNT(*) FILTER (WHERE signal AND return_{horizon} > 0) AS signal_hits_{horizon}, "
+                   f"COUNT(return_{horizon}) AS market_count_{horizon}, "
+                   f"SUM(return_{horizon}) AS market_sum_{horizon}, "
+                   f"COUNT(*) FILTER (WHERE return_{horizon} > 0) AS market_hits_{horizon}"
+                   for horizon in BACKTEST_HORIZONS
+               )}
+        FROM evaluated
+        WHERE date BETWEEN ? AND ?
+        GROUP BY year
+    """
+
+    # --- 技術指標 ---
+
+    # 每檔股票每個交易日的技術指標，由 update_indicators 批次計算
+    # ema_fast、ema_slow、avg_gain、avg_loss 為遞迴指標的狀態，增量計算時以最後一筆的值接續
+    CREATE_STOCK_INDICATORS_TABLE = """
+        CREATE TABLE IF NOT EXISTS stock_indicators (
+            stock_id VARCHAR,
+            date DATE,
+            rsi DOUBLE,                   -- RSI(14)
+            macd DOUBLE,                  -- MACD(12, 26)
+            macd_signal DOUBLE,           -- MACD 訊號線(9)
+            macd_hist DOUBLE,             -- MACD 柱狀體
+            k DOUBLE,                     -- KD(9) 的 K 值
+            d DOUBLE,                     -- KD(9) 的 D 值
+            bb_upper DOUBLE,              -- 布林通道(20, 2) 上軌
+            bb_middle DOUBLE,             -- 布林通道中軌
+            bb_lower DOUBLE,              -- 布林通道下軌
+            ema_fast DOUBLE,              -- 12 日 EMA
+            ema_slow DOUBLE,              -- 26 日 EMA
+            avg_gain DOUBLE,              -- RSI 的平均漲幅
+            avg_loss DOUBLE,              -- RSI 的平均跌幅
+            PRIMARY KEY (stock_id, date)
+        )
+    """
+
+    # 需要計算指標的股票：參數為 TRUE 時為全部股票，否則為每日資料比指標新的股票
+    GET_INDICATOR_PENDING_STOCKS = """
+        SELECT d.stock_id
+        FROM (SELECT stock_id, MAX(date) AS last_date FROM stock_daily GROUP BY stock_id) d
+        LEFT JOIN (SELECT stock_id, MAX(date) AS last_date FROM stock_indicators GROUP BY stock_id) i
+        ON d.stock_id = i.stock_id
+        WHERE ? OR i.last_date IS NULL OR d.last_date > i.last_date
+        ORDER BY d.stock_id
+    """
+
+    # 一批股票計算指標需要的資料，依 (stock_id, date) 排序；參數為是否重算全部歷史與股票代碼列表（兩次）
+    # 增量計算時另取最後 {lookback} 筆已計算的資料（is_new 為 FALSE）補足滾動視窗，並帶出遞迴指標的狀態
+    GET_INDICATOR_INPUT = """
+        WITH last AS (
+            SELECT stock_id, MAX(date) AS last_date
+            FROM stock_indicators
+            WHERE NOT ?
+            AND stock_id IN (SELECT UNNEST(?::VARCHAR[]))
+            GROUP BY stock_id
+        ),
+        history AS (
+            SELECT d.stock_id, d.date, d.closing_price, d.highest_price, d.lowest_price, FALSE AS is_new
+            FROM stock_daily d
+            JOIN last l ON d.stock_id = l.stock_id
+            WHERE d.date <= l.last_date
+            QUALIFY ROW_NUMBER() OVER (PARTITION BY d.stock_id ORDER BY d.date DESC) <= {lookback}
+        ),
+        fresh AS (
+            SELECT d.stock_id, d.date, d.closing_price, d.highest_price, d.lowest_price, TRUE AS is_new
+            FROM stock_daily d
+            LEFT JOIN last l ON d.stock_id = l.stock_id
+            WHERE d.stock_id IN (SELECT UNNEST(?::VARCHAR[]))
+            AND (l.last_date IS NULL OR d.date > l.last_date)
+        )
+        SELECT r.*, {state_columns}
+        FROM (SELECT * FROM history UNION ALL SELECT * FROM fresh) r
+        LEFT JOIN stock_indicators i ON r.stock_id = i.stock_id AND r.date = i.date
+        ORDER BY r.stock_id, r.date
+    """
+
+    DELETE_STOCK_INDICATORS = """
+        DELETE FROM stock_indicators
+    """
+
+    GET_STOCK_INDICATORS = """
+        SELECT *
+        FROM stock_indicators
         WHERE stock_id = ?
-    """
\ No newline at end of file
+        AND date BETWEEN ? AND ?
+        ORDER BY date
+    """
+
+    # 多檔股票比較：一次取得所有股票的收盤價，第一個參數為股票代碼的列表
+    GET_STOCKS_CLOSE = """
+        SELECT date, stock_id, closing_price
+        FROM {source}
+        WHERE stock_id IN (SELECT UNNEST(?::VARCHAR[]))
+        AND date BETWEEN ? AND ?
+        AND closing_price IS NOT NULL
+    """
+
+    # 比較頁面的股票選項
+    GET_STOCK_NAMES = """
+        SELECT stock_id, stock_name
+        FROM stock_summary
+        ORDER BY stock_id
+    """
+
+    # 股票搜尋索引的資料，名稱與產業別來自 stock_info，只包含有交易資料的股票
+    GET_SYMBOLS = """
+        SELECT stock_id, stock_name, industry
+        FROM stock_summary
+        ORDER BY stock_id
+    """
+
+    # 匯出每日資料，第一個參數為股票代碼的列表，依股票分段查詢，每段的結果已排序
+    EXPORT_STOCK_HISTORY = """
+        SELECT *
+        FROM {source}
+        WHERE stock_id IN (SELECT UNNEST(?::VARCHAR[]))
+        AND date BETWEEN ? AND ?
+        ORDER BY stock_id, date
+    """
@@ -0,0 +1,212 @@
+import os
+import json
+import time
+import uuid
+import threading
+from datetime import date
+from config.config import PARQUET_CACHE_DIR, PARQUET_READER_BLOB, DB_SNAPSHOT_TTL
+from config.logger import setup_logging
+
+# 設置 logger
+logger = setup_logging()
+
+def months_between(start_date, end_date) -> list:
+    """列出日期區間涵蓋的 (年, 月)"""
+    months = []
+    year, month = start_date.year, start_date.month
+    while (year, month) <= (end_date.year, end_date.month):
+        months.append((year, month))
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return months
+
+class ParquetPartitionStore:
+    """
+    stock_daily 的 Hive 分區 Parquet 儲存（stock_daily/year=YYYY/month=MM/data.parquet）
+    查詢時只下載日期區間需要的分區並快取在本地，以 GCS generation 判斷分區是否已更新
+    """
+    def __init__(self, bucket_name: str, prefix: str = 'stock_daily', cache_dir: str = PARQUET_CACHE_DIR,
+                 ttl: float = DB_SNAPSHOT_TTL, storage_client=None):
+        self.bucket_name = bucket_name
+        self.prefix = prefix
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+        self._storage_client = storage_client
+        # _lock 只保護本地分區的紀錄，下載在鎖外進行，不同 session 查詢不同月份時不會互相等待
+        self._lock = threading.Lock()
+        self._index_path = os.path.join(cache_dir, f"{prefix}.index.json")
+        self._index = self._load_index()
+        # 下載中的分區（本地路徑 -> threading.Event），同一分區同時只下載一次，其他查詢等待完成
+        self._downloading = {}
+        # GCS 上各分區的最新 generation，每隔 ttl 秒以一次 list 更新
+        self._list_lock = threading.Lock()
+        self._remote = {}
+        self._listed_at = None
+
+    @property
+    def storage_client(self):
+        """延遲建立 GCS client，測試時可傳入假的 client"""
+        if self._storage_client is None:
+            from google.cloud import storage
+            self._storage_client = storage.Client()
+        return self._storage_client
+
+    @staticmethod
+    def partition_key(year: int, month: int) -> str:
+        return f"year={year}/month={month:02d}"
+
+    def blob_name(self, year: int, month: int) -> str:
+        return f"{self.prefix}/{self.partition_key(year, month)}/data.parquet"
+
+    def local_path(self, year: int, month: int, generation: str) -> str:
+        """本地快取路徑帶有 generation，分區更新後路徑（以及查詢快取鍵）隨之改變"""
+        return os.path.join(self.cache_dir, self.prefix, self.partition_key(year, month), f"data.{generation}.parquet")
+
+    def _load_index(self) -> dict:
+        """本地快取中各分區的 generation"""
+        try:
+            with open(self._index_path, encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_index(self):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp_path = f"{self._index_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self._index, f)
+        os.replace(tmp_path, self._index_path)
+
+    def _list_remote(self) -> dict:
+        """列出 GCS 上所有分區的 generation，結果保留 ttl 秒"""
+        with self._list_lock:
+            if self._listed_at is not None and time.monotonic() - self._listed_at <= self.ttl:
+                return self._remote
+            bucket = self.storage_client.bucket(self.bucket_name)
+            remote = {}
+            for blob in bucket.list_blobs(prefix=f"{self.prefix}/"):
+                key = blob.name[len(self.prefix) + 1:].rsplit('/', 1)[0]
+                remote[key] = str(blob.generation)
+            self._remote = remote
+            self._listed_at = time.monotonic()
+            return remote
+
+    def ensure_partitions(self, start_date, end_date) -> list:
+        """
+        確保日期區間需要的分區都已在本地快取，只下載缺少或已更新的分區
+        Returns:
+            本地 Parquet 檔案路徑列表（沒有資料的月份不會出現）
+        """
+        remote = self._list_remote()
+        paths, owned, waiting = [], [], []
+        with self._lock:
+            for year, month in months_between(start_date, end_date):
+                generation = remote.get(self.partition_key(year, month))
+                if generation is None:
+                    continue
+                local_path = self.local_path(year, month, generation)
+                paths.append(local_path)
+                if os.path.exists(local_path):
+                    continue
+                event = self._downloading.get(local_path)
+                if event is None:
+                    event = self._downloading[local_path] = threading.Event()
+                    owned.append((year, month, generation, local_path, event))
+                else:
+                    waiting.append((local_path, event))
+
+        try:
+            for year, month, generation, local_path, _ in owned:
+                self._download(year, month, local_path)
+                self._record(year, month, generation)
+        finally:
+            # 下載失敗時也要釋放，等待中的查詢會回報錯誤，下一次查詢重新下載
+            with self._lock:
+                for *_, local_path, _ in owned:
+                    self._downloading.pop(local_path, None)
+            for *_, event in owned:
+                event.set()
+
+        for local_path, event in waiting:
+            event.wait()
+            if not os.path.exists(local_path):
+                raise FileNotFoundError(f"分區下載失敗: {local_path}")
+        return paths
+
+    def _record(self, year: int, month: int, generation: str):
+        """記錄已下載的分區並刪除被取代的舊版本"""
+        key = self.partition_key(year, month)
+        with self._lock:
+            previous = self._index.get(key)
+            self._index[key] = generation
+            self._save_index()
+        if previous != generation:
+            self._remove_old(year, month, previous)
+
+    def _download(self, year: int, month: int, local_path: str):
+        """下載分區到暫存檔後再 rename，避免查詢讀到下載一半的檔案；暫存檔名各自不同，多個程序共用快取目錄也不衝突"""
+        os.makedirs(os.path.dirname(local_path), exist_ok=True)
+        tmp_path = f"{local_path}.{uuid.uuid4().hex}.download"
+        blob = self.storage_client.bucket(self.bucket_name).blob(self.blob_name(year, month))
+        try:
+            blob.download_to_filename(tmp_path)
+            os.replace(tmp_path, local_path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        logger.info(f"Downloaded partition {self.partition_key(year, month)}")
+
+    def _remove_old(self, year: int, month: int, generation: str):
+        """刪除被取代的舊分區檔案，已開啟的查詢仍可讀完"""
+        if generation is None:
+            return
+        try:
+            os.remove(self.local_path(year, month, generation))
+        except OSError:
+            pass
+
+    def export(self, conn, months: list = None) -> list:
+        """
+        將 stock_daily 依年月寫成 Parquet 分區並上傳到 GCS（zstd 壓縮，依 stock_id、date 排序以利 row group 跳過）
+        Args:
+            conn: 來源資料庫連線
+            months: 要匯出的 (年, 月) 列表，None 表示全部
+        Returns:
+            匯出的 (年, 月) 列表
+        """
+        if months is None:
+            months = conn.execute("""
+                SELECT DISTINCT year(date), month(date)
+                FROM stock_daily
+                ORDER BY 1, 2
+            """).fetchall()
+
+        bucket = self.storage_client.bucket(self.bucket_name)
+        for year, month in months:
+            start = date(year, month, 1)
+            end = date(year + 1, 1, 1) if month == 12 else date(year, month + 1, 1)
+            tmp_path = os.path.join(self.cache_dir, f"{self.prefix}.{year}{month:02d}.export.parquet")
+            os.makedirs(self.cache_dir, exist_ok=True)
+            conn.execute(f"""
+                COPY (
+                    SELECT *
+                    FROM stock_daily
+                    WHERE date >= DATE '{start.isoformat()}' AND date < DATE '{end.isoformat()}'
+                    ORDER BY stock_id, date
+                ) TO '{tmp_path}' (FORMAT PARQUET, COMPRESSION ZSTD)
+            """)
+            try:
+                bucket.blob(self.blob_name(year, month)).upload_from_filename(tmp_path, timeout=300)
+            finally:
+                os.remove(tmp_path)
+        with self._list_lock:
+            # 強制下次查詢重新列出 GCS 上的分區
+            self._listed_at = None
+        logger.info(f"Exported {len(months)} stock_daily partitions")
+        return months
+
+    def upload_reader_snapshot(self, path: str, blob_name: str = PARQUET_READER_BLOB):
+        """上傳讀取端的資料庫快照（不含 stock_daily），需在分區匯出之後，讀取端切換時需要的分區都已存在"""
+        blob = self.storage_client.bucket(self.bucket_name).blob(blob_name)
+        blob.upload_from_filename(path, timeout=300)
+        logger.info(f"Uploaded reader snapshot {blob_name}")
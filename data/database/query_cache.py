@@ -0,0 +1,103 @@
+import sys
+import threading
+from collections import OrderedDict
+from config.config import QUERY_CACHE_MAX_BYTES
+
+# 估計字串欄位大小時取樣的筆數
+SIZE_SAMPLE_ROWS = 100
+
+def estimate_size(value) -> int:
+    """估計快取值佔用的位元組數"""
+    if hasattr(value, 'memory_usage'):
+        # pandas DataFrame，字串欄位以前幾筆的平均大小推估，避免逐筆計算
+        size = int(value.memory_usage(index=True, deep=False).sum())
+        for column in value.columns[value.dtypes == object]:
+            sample = value[column].iloc[:SIZE_SAMPLE_ROWS]
+            if len(sample):
+                size += int(sum(sys.getsizeof(item) for item in sample) / len(sample) * len(value))
+        return size
+    if hasattr(value, 'nbytes'):
+        # pyarrow Table / numpy array
+        return int(value.nbytes)
+    if isinstance(value, (tuple, list)):
+        return sys.getsizeof(value) + sum(estimate_size(item) for item in value)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(estimate_size(k) + estimate_size(v) for k, v in value.items())
+    return sys.getsizeof(value)
+
+class QueryCache:
+    """
+    查詢結果的 LRU 快取，以位元組總量為上限
+    快取綁定資料版本，版本改變（載入新快照）時整個快取失效
+    快取的值會被多個 session 共用，取用後不可直接修改
+    """
+    def __init__(self, max_bytes: int = QUERY_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._version = None
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _reset_if_stale(self, version):
+        """資料版本改變時清空快取（需持有 _lock）"""
+        if version != self._version:
+            self._entries.clear()
+            self.total_bytes = 0
+            self._version = version
+
+    def get_or_load(self, version, key, loader, sizer=estimate_size):
+        """
+        取得快取值，沒有時呼叫 loader 載入並存入快取
+        Args:
+            version: 資料版本
+            key: 快取鍵
+            loader: 沒有快取時用來載入資料的函數
+            sizer: 估計快取值位元組數的函數，estimate_size 無法估計的物件（例如圖表）可自行提供
+        """
+        with self._lock:
+            self._reset_if_stale(version)
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+
+        value = loader()
+        size = sizer(value)
+        with self._lock:
+            # 載入期間資料版本已改變，或單筆資料超過上限時不存入快取
+            if version != self._version or size > self.max_bytes:
+                return value
+            if key in self._entries:
+                self.total_bytes -= self._entries.pop(key)[1]
+            self._entries[key] = (value, size)
+            self.total_bytes += size
+            while self.total_bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self.total_bytes -= evicted_size
+                self.evictions += 1
+        return value
+
+    def clear(self):
+        """清空快取"""
+        with self._lock:
+            self._entries.clear()
+            self.total_bytes = 0
+
+    def stats(self) -> dict:
+        """快取命中統計與目前用量"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self.total_bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+            }
@@ -0,0 +1,339 @@
+import re
+import functools
+from .models import StockDB
+
+# 規則中可使用的欄位名稱，另外也接受 stock_daily 的原始欄位名稱
+FIELD_ALIASES = {
+    'open': 'opening_price',
+    'high': 'highest_price',
+    'low': 'lowest_price',
+    'close': 'closing_price',
+    'volume': 'trade_volume',
+    'value': 'trade_value',
+    'change': 'price_change',
+    'change_pct': 'change_percent',
+    'transactions': 'transaction_count',
+}
+FIELDS = {
+    **{column: column for column in StockDB.CONDITION_PREV_COLUMNS},
+    **FIELD_ALIASES,
+}
+
+# 以最近 n 個交易日（含當日）計算的函數，例如 avg(volume, 20)
+WINDOW_FUNCTIONS = {
+    'avg': 'AVG',
+    'sum': 'SUM',
+    'min': 'MIN',
+    'max': 'MAX',
+    'std': 'STDDEV_SAMP',
+}
+
+# 函數可使用的最大交易日數
+MAX_LOOKBACK = 250
+
+# 快取的規則數量
+RULE_CACHE_SIZE = 256
+
+COMPARISON_OPERATORS = {'>': '>', '>=': '>=', '<': '<', '<=': '<=', '==': '=', '=': '=', '!=': '<>'}
+
+TOKEN_PATTERN = re.compile(r"""
+    \s*(?:
+        (?P<number>\d+(?:\.\d*)?|\.\d+)
+      | (?P<name>[A-Za-z_][A-Za-z0-9_]*)
+      | (?P<op>>=|<=|==|!=|[-+*/()<>=,])
+    )
+""", re.VERBOSE)
+
+
+class RuleError(ValueError):
+    """規則語法或欄位錯誤，position 為錯誤位置（從 0 開始的字元索引）"""
+    def __init__(self, message: str, position: int):
+        super().__init__(f"第 {position + 1} 個字元：{message}")
+        self.position = position
+
+
+class CompiledRule:
+    """
+    編譯後的篩選規則
+    Attributes:
+        text: 規則原文
+        expression: 以 stock_daily 欄位表示的 SQL 布林運算式（包含視窗函數）
+        lookback: 計算最新交易日的結果需要的交易日數（含當日）
+        fields: 規則使用的 stock_daily 欄位
+    """
+    def __init__(self, text: str, expression: str, lookback: int, fields: frozenset):
+        self.text = text
+        self.expression = expression
+        self.lookback = lookback
+        self.fields = fields
+
+    @property
+    def lookback_days(self) -> int:
+        """涵蓋 lookback 個交易日的日曆天數，多預留連假與停牌的天數"""
+        return self.lookback * 2 + 15
+
+    def __repr__(self):
+        return f"CompiledRule({self.text!r})"
+
+
+class _Node:
+    """語法樹節點編譯的結果：SQL 片段、型別（number / bool）、需要的交易日數與是否包含視窗函數"""
+    __slots__ = ('sql', 'kind', 'lookback', 'windowed')
+
+    def __init__(self, sql: str, kind: str, lookback: int = 1, windowed: bool = False):
+        self.sql = sql
+        self.kind = kind
+        self.lookback = lookback
+        self.windowed = windowed
+
+
+def _tokenize(text: str) -> list:
+    """將規則切成 (種類, 值, 位置) 的列表，最後一個 token 為 ('end', None, 長度)"""
+    tokens = []
+    position = 0
+    length = len(text.rstrip())
+    while position < length:
+        match = TOKEN_PATTERN.match(text, position)
+        if match is None or match.lastgroup is None:
+            start = len(text) - len(text[position:].lstrip())
+            raise RuleError(f"無法辨識的字元 '{text[start]}'", start)
+        kind = match.lastgroup
+        tokens.append((kind, match.group(kind), match.start(kind)))
+        position = match.end()
+    tokens.append(('end', None, length))
+    return tokens
+
+
+class _Parser:
+    """
+    遞迴下降解析規則並直接產生 SQL
+        or_expr    := and_expr ('or' and_expr)*
+        and_expr   := not_expr ('and' not_expr)*
+        not_expr   := 'not' not_expr | comparison
+        comparison := arith (比較運算子 arith)?
+        arith      := term (('+' | '-') term)*
+        term       := unary (('*' | '/') unary)*
+        unary      := '-' unary | primary
+        primary    := 數字 | 欄位 | 函數 '(' 參數 ')' | '(' or_expr ')'
+    """
+    def __init__(self, text: str):
+        self.tokens = _tokenize(text)
+        self.index = 0
+        self.fields = set()
+
+    @property
+    def current(self):
+        return self.tokens[self.index]
+
+    def _keyword(self, word: str) -> bool:
+        kind, value, _ = self.current
+        return kind == 'name' and value.lower() == word
+
+    def _op(self, *ops) -> bool:
+        kind, value, _ = self.current
+        return kind == 'op' and value in ops
+
+    def _advance(self):
+        token = self.current
+        self.index += 1
+        return token
+
+    def _expect_op(self, op: str):
+        if not self._op(op):
+            _, value, position = self.current
+            raise RuleError(f"預期 '{op}'，但遇到 {self._describe(value)}", position)
+        return self._advance()
+
+    @staticmethod
+    def _describe(value) -> str:
+        return '規則結尾' if value is None else f"'{value}'"
+
+    @staticmethod
+    def _require(node: _Node, kind: str, position: int):
+        if node.kind != kind:
+            expected = '條件（比較運算）' if kind == 'bool' else '數值'
+            raise RuleError(f"此處需要{expected}", position)
+
+    def parse(self) -> _Node:
+        node = self._or()
+        kind, value, position = self.current
+        if kind != 'end':
+            raise RuleError(f"多餘的內容 {self._describe(value)}", position)
+        return node
+
+    def _logical(self, word: str, operand) -> _Node:
+        position = self.current[2]
+        node = operand()
+        if not self._keyword(word):
+            return node
+        self._require(node, 'bool', position)
+        parts = [node]
+        while self._keyword(word):
+            self._advance()
+            position = self.current[2]
+            right = operand()
+            self._require(right, 'bool', position)
+            parts.append(right)
+        return _Node(
+            '(' + f' {word.upper()} '.join(part.sql for part in parts) + ')',
+            'bool',
+            max(part.lookback for part in parts),
+            any(part.windowed for part in parts)
+        )
+
+    def _or(self) -> _Node:
+        return self._logical('or', self._and)
+
+    def _and(self) -> _Node:
+        return self._logical('and', self._not)
+
+    def _not(self) -> _Node:
+        if self._keyword('not'):
+            self._advance()
+            position = self.current[2]
+            node = self._not()
+            self._require(node, 'bool', position)
+            return _Node(f"(NOT {node.sql})", 'bool', node.lookback, node.windowed)
+        return self._comparison()
+
+    def _comparison(self) -> _Node:
+        position = self.current[2]
+        left = self._arith()
+        kind, value, op_position = self.current
+        if kind != 'op' or value not in COMPARISON_OPERATORS:
+            return left
+        self._advance()
+        self._require(left, 'number', position)
+        right_position = self.current[2]
+        right = self._arith()
+        self._require(right, 'number', right_position)
+        if self._op(*COMPARISON_OPERATORS):
+            raise RuleError("比較運算不可連續使用，請以 and 連接", self.current[2])
+        return _Node(
+            f"({left.sql} {COMPARISON_OPERATORS[value]} {right.sql})",
+            'bool',
+            max(left.lookback, right.lookback),
+            left.windowed or right.windowed
+        )
+
+    def _binary(self, ops, operand) -> _Node:
+        position = self.current[2]
+        node = operand()
+        while self._op(*ops):
+            _, op, _ = self._advance()
+            self._require(node, 'number', position)
+            position = self.current[2]
+            right = operand()
+            self._require(right, 'number', position)
+            # 除以 0 時結果為 NULL，該股票視為不符合
+            right_sql = f"NULLIF({right.sql}, 0)" if op == '/' else right.sql
+            node = _Node(
+                f"({node.sql} {op} {right_sql})",
+                'number',
+                max(node.lookback, right.lookback),
+                node.windowed or right.windowed
+            )
+        return node
+
+    def _arith(self) -> _Node:
+        return self._binary(('+', '-'), self._term)
+
+    def _term(self) -> _Node:
+        return self._binary(('*', '/'), self._unary)
+
+    def _unary(self) -> _Node:
+        if self._op('-'):
+            self._advance()
+            position = self.current[2]
+            node = self._unary()
+            self._require(node, 'number', position)
+            return _Node(f"(-{node.sql})", 'number', node.lookback, node.windowed)
+        return self._primary()
+
+    def _primary(self) -> _Node:
+        kind, value, position = self.current
+        if kind == 'number':
+            self._advance()
+            return _Node(value, 'number')
+        if kind == 'op' and value == '(':
+            self._advance()
+            node = self._or()
+            self._expect_op(')')
+            return node
+        if kind == 'name':
+            self._advance()
+            name = value.lower()
+            if self._op('('):
+                return self._function(name, position)
+            if name in ('and', 'or', 'not'):
+                raise RuleError(f"'{value}' 前缺少條件", position)
+            if name not in FIELDS:
+                raise RuleError(f"未知的欄位 '{value}'", position)
+            column = FIELDS[name]
+            self.fields.add(column)
+            return _Node(column, 'number')
+        raise RuleError(f"此處需要數值或欄位，但遇到 {self._describe(value)}", position)
+
+    def _window_size(self, name: str, default: int = None) -> int:
+        """解析函數的交易日數參數，必須是 1 到 MAX_LOOKBACK 的整數"""
+        if default is not None and self._op(')'):
+            return default
+        self._expect_op(',')
+        kind, value, position = self.current
+        if kind != 'number' or not value.isdigit() or not 1 <= int(value) <= MAX_LOOKBACK:
+            raise RuleError(f"{name} 的天數必須是 1 到 {MAX_LOOKBACK} 的整數", position)
+        self._advance()
+        return int(value)
+
+    def _function(self, name: str, position: int) -> _Node:
+        if name not in WINDOW_FUNCTIONS and name not in ('prev', 'abs'):
+            raise RuleError(f"未知的函數 '{name}'", position)
+        self._expect_op('(')
+        argument_position = self.current[2]
+        argument = self._arith()
+        self._require(argument, 'number', argument_position)
+
+        if name == 'abs':
+            self._expect_op(')')
+            return _Node(f"ABS({argument.sql})", 'number', argument.lookback, argument.windowed)
+
+        if argument.windowed:
+            raise RuleError(f"{name} 的參數不可再包含 {', '.join([*WINDOW_FUNCTIONS, 'prev'])}", argument_position)
+        days = self._window_size(name, default=1 if name == 'prev' else None)
+        self._expect_op(')')
+
+        if name == 'prev':
+            # 前 n 個交易日的值
+            return _Node(
+                f"LAG({argument.sql}, {days}) OVER (PARTITION BY stock_id ORDER BY date)",
+                'number', days + 1, True
+            )
+        # 最近 n 個交易日（含當日），資料不足 n 日時為 NULL
+        frame = f"OVER (PARTITION BY stock_id ORDER BY date ROWS BETWEEN {days - 1} PRECEDING AND CURRENT ROW)"
+        return _Node(
+            f"CASE WHEN COUNT({argument.sql}) {frame} = {days} "
+            f"THEN {WINDOW_FUNCTIONS[name]}({argument.sql}) {frame} END",
+            'number', days, True
+        )
+
+
+@functools.lru_cache(maxsize=RULE_CACHE_SIZE)
+def _compile(text: str) -> CompiledRule:
+    parser = _Parser(text)
+    node = parser.parse()
+    if node.kind != 'bool':
+        raise RuleError("規則必須是條件，例如 close > ma20", 0)
+    return CompiledRule(text, node.sql, node.lookback, frozenset(parser.fields))
+
+
+def compile_rule(text: str) -> CompiledRule:
+    """
+    解析並編譯篩選規則，例如 close > ma20 and volume > 2 * avg(volume, 20)
+    相同的規則文字只編譯一次
+    Raises:
+        RuleError: 規則語法錯誤、使用未知的欄位或函數
+    """
+    text = text.strip()
+    if not text:
+        raise RuleError("規則不可為空白", 0)
+    return _compile(text)
@@ -0,0 +1,248 @@
+import os
+import json
+import glob
+import time
+import shutil
+import threading
+from config.config import DB_SNAPSHOT_TTL, DB_LOCAL_SNAPSHOT_TTL, DB_SNAPSHOT_KEEP
+from config.logger import setup_logging
+
+# 設置 logger
+logger = setup_logging()
+
+class SnapshotCache:
+    """
+    GCS 資料庫快照的本地快取
+    每個版本存成獨立檔案（StockHero.<generation>.db），並以 metadata 檔記錄目前使用的版本，
+    背景更新完成後才切換指標，讀取端在切換前持續使用舊快照
+    """
+    # metadata 檔案的副檔名
+    META_SUFFIX = '.snapshot.json'
+    # 讀取端切換後是否自行刪除舊版本檔案
+    delete_retired = True
+
+    def __init__(self, db_path: str, bucket_name: str, blob_name: str = 'StockHero.db',
+                 ttl: float = DB_SNAPSHOT_TTL, storage_client=None):
+        self.db_path = db_path
+        self.bucket_name = bucket_name
+        self.blob_name = blob_name
+        self.ttl = ttl
+        self.meta_path = f"{db_path}{self.META_SUFFIX}"
+        self._storage_client = storage_client
+        self._meta = self._load_meta()
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        self._refresh_thread = None
+
+    @property
+    def storage_client(self):
+        """延遲建立 GCS client，測試時可傳入假的 client"""
+        if self._storage_client is None:
+            from google.cloud import storage
+            self._storage_client = storage.Client()
+        return self._storage_client
+
+    @property
+    def path(self):
+        """目前快照的本地檔案路徑"""
+        return self._meta.get('path')
+
+    @property
+    def version(self):
+        """目前快照的版本（GCS generation，沒有時使用 MD5）"""
+        return self._meta.get('generation') or self._meta.get('md5_hash')
+
+    def current(self):
+        """一次取得目前快照的 (路徑, 版本)，避免背景更新時讀到不一致的組合"""
+        meta = self._meta
+        return meta.get('path'), meta.get('generation') or meta.get('md5_hash')
+
+    def _load_meta(self) -> dict:
+        """讀取本地快照的 metadata，檔案不存在或損毀時視為沒有快照"""
+        try:
+            with open(self.meta_path, encoding='utf-8') as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        if not meta.get('path') or not os.path.exists(meta['path']):
+            return {}
+        return meta
+
+    def _write_meta(self, meta: dict):
+        """先寫入暫存檔再 rename，確保 metadata 的更新是原子操作"""
+        tmp_path = f"{self.meta_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, self.meta_path)
+        self._meta = meta
+
+    def _snapshot_path(self, version: str) -> str:
+        root, ext = os.path.splitext(self.db_path)
+        return f"{root}.{version}{ext or '.db'}"
+
+    def is_stale(self) -> bool:
+        """距離上次檢查是否已超過 TTL"""
+        return time.monotonic() - self._checked_at > self.ttl
+
+    def ensure_local(self):
+        """確保本地有可用的快照；只有完全沒有快照時才會同步下載"""
+        if not self.path:
+            self.refresh()
+        return self.path
+
+    def refresh(self) -> bool:
+        """
+        檢查 GCS 上的版本，有新版本時下載並切換
+        Returns:
+            是否切換到新的快照
+        """
+        with self._lock:
+            bucket = self.storage_client.bucket(self.bucket_name)
+            blob = bucket.get_blob(self.blob_name)
+            if blob is None:
+                raise FileNotFoundError(f"gs://{self.bucket_name}/{self.blob_name} 不存在")
+
+            generation = str(blob.generation) if blob.generation is not None else None
+            self._checked_at = time.monotonic()
+            if (generation, blob.md5_hash) == (self._meta.get('generation'), self._meta.get('md5_hash')):
+                return False
+
+            version = generation or blob.md5_hash.replace('/', '_').replace('+', '-').rstrip('=')
+            target_path = self._snapshot_path(version)
+            tmp_path = f"{target_path}.download"
+            started = time.monotonic()
+            blob.download_to_filename(tmp_path)
+            os.replace(tmp_path, target_path)
+            self._write_meta({
+                'path': target_path,
+                'generation': generation,
+                'md5_hash': blob.md5_hash,
+                'downloaded_at': time.time(),
+            })
+            logger.info(f"Downloaded database snapshot {version} from GCS in {time.monotonic() - started:.1f}s")
+            return True
+
+    def refresh_async(self):
+        """在背景執行緒檢查並更新快照，同一時間只會有一個更新在進行"""
+        if self._refresh_thread is not None and self._refresh_thread.is_alive():
+            return
+        # 先更新檢查時間，避免每個請求都觸發背景更新
+        self._checked_at = time.monotonic()
+
+        def _run():
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.error(f"更新資料庫快照失敗: {str(e)}")
+
+        self._refresh_thread = threading.Thread(target=_run, name='snapshot-refresh', daemon=True)
+        self._refresh_thread.start()
+
+
+class LocalSnapshot(SnapshotCache):
+    """
+    由同一台機器上的寫入端發布的資料庫快照
+    寫入端在 staging 檔案上更新資料，完成後以 rename 發布為新版本（StockHero.<generation>.db）並更新 metadata；
+    讀取端以唯讀連線開啟目前版本，每隔 ttl 秒重新讀取 metadata，下一次查詢時切換到新版本
+    """
+    META_SUFFIX = '.published.json'
+    # 其他程序可能仍在讀取舊版本，舊檔案由寫入端發布時清理
+    delete_retired = False
+
+    def __init__(self, db_path: str, ttl: float = DB_LOCAL_SNAPSHOT_TTL, keep: int = DB_SNAPSHOT_KEEP):
+        super().__init__(db_path, bucket_name=None, ttl=ttl)
+        self.keep = keep
+
+    @classmethod
+    def exists(cls, db_path: str) -> bool:
+        """是否已有寫入端發布過的快照"""
+        return os.path.exists(f"{db_path}{cls.META_SUFFIX}")
+
+    @property
+    def staging_path(self) -> str:
+        """寫入端更新資料使用的 staging 檔案"""
+        root, ext = os.path.splitext(self.db_path)
+        return f"{root}.staging{ext or '.db'}"
+
+    def ensure_local(self):
+        if not self.path:
+            self.refresh()
+        if not self.path:
+            raise FileNotFoundError(f"{self.meta_path} 沒有可用的快照")
+        return self.path
+
+    def refresh(self) -> bool:
+        """
+        重新讀取 metadata，寫入端已發布新版本時切換
+        Returns:
+            是否切換到新的快照
+        """
+        with self._lock:
+            self._checked_at = time.monotonic()
+            meta = self._load_meta()
+            if not meta or meta.get('generation') == self._meta.get('generation'):
+                return False
+            self._meta = meta
+            logger.info(f"Found published database snapshot {meta['generation']}")
+            return True
+
+    def refresh_async(self):
+        """讀取本地 metadata 的成本很低，直接同步檢查，新版本在這次查詢就會生效"""
+        try:
+            self.refresh()
+        except Exception as e:
+            logger.error(f"讀取資料庫快照 metadata 失敗: {str(e)}")
+
+    def prepare_staging(self) -> str:
+        """
+        以目前發布的版本（沒有時為 db_path）複製出 staging 檔案
+        Returns:
+            staging 檔案路徑
+        """
+        staging_path = self.staging_path
+        for path in (staging_path, f"{staging_path}.wal"):
+            if os.path.exists(path):
+                os.remove(path)
+        source = self._load_meta().get('path')
+        if source is None and os.path.exists(self.db_path):
+            source = self.db_path
+        if source is not None:
+            shutil.copyfile(source, staging_path)
+        else:
+            # 先建立空的資料庫檔案，避免 DatabaseManager 嘗試從 GCS 下載
+            import duckdb
+            duckdb.connect(staging_path).close()
+        return staging_path
+
+    def publish(self) -> str:
+        """
+        將 staging 檔案發布為新版本，呼叫前需先 CHECKPOINT 並關閉寫入連線
+        Returns:
+            新版本的檔案路徑
+        """
+        with self._lock:
+            generation = str(time.time_ns())
+            target_path = self._snapshot_path(generation)
+            os.replace(self.staging_path, target_path)
+            self._write_meta({
+                'path': target_path,
+                'generation': generation,
+                'published_at': time.time(),
+            })
+            self._prune()
+        logger.info(f"Published database snapshot {generation}")
+        return target_path
+
+    def _prune(self):
+        """只保留最近 keep 個版本，尚未切換的讀取端仍可讀完目前查詢（需持有 _lock）"""
+        root, ext = os.path.splitext(self.db_path)
+        versions = []
+        for path in glob.glob(f"{glob.escape(root)}.*{ext or '.db'}"):
+            generation = path[len(root) + 1:len(path) - len(ext or '.db')]
+            if generation.isdigit():
+                versions.append((int(generation), path))
+        for _, path in sorted(versions)[:-self.keep]:
+            try:
+                os.remove(path)
+            except OSError as e:
+                logger.warning(f"刪除舊快照失敗 {path}: {str(e)}")
@@ -0,0 +1,57 @@
+import os
+import sys
+from datetime import date
+import duckdb
+import numpy as np
+import pandas as pd
+import pytest
+
+# 測試直接匯入專案模組（data、utils、config），與 Streamlit 執行時相同以專案根目錄為起點
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data.database.db_manager import DatabaseManager
+from benchmarks.generate_dataset import trading_days, simulate_symbol, simulate_institutional
+
+TEST_STOCK_IDS = ['1101', '1102', '2330', '2454']
+
+
+@pytest.fixture
+def new_writer(tmp_path):
+    """建立空白資料庫上的寫入端 DatabaseManager，測試結束時關閉"""
+    managers = []
+
+    def _new_writer(name: str = 'StockHero') -> DatabaseManager:
+        path = str(tmp_path / f"{name}.db")
+        # 先建立空檔案，避免 DatabaseManager 嘗試從 GCS 下載
+        duckdb.connect(path).close()
+        db = DatabaseManager(path, '')
+        db.connect()
+        managers.append(db)
+        return db
+
+    yield _new_writer
+    for db in managers:
+        db.close()
+
+
+@pytest.fixture(scope='session')
+def daily_frame() -> pd.DataFrame:
+    """數檔股票約一年半的模擬每日行情，依 (stock_id, date) 排序"""
+    rng = np.random.default_rng(7)
+    days = trading_days(1, date(2024, 6, 28))
+    return pd.concat(
+        [simulate_symbol(rng, stock_id, f"測試{stock_id}", days) for stock_id in TEST_STOCK_IDS],
+        ignore_index=True
+    )
+
+
+@pytest.fixture(scope='session')
+def institutional_frame(daily_frame) -> pd.DataFrame:
+    return simulate_institutional(np.random.default_rng(11), daily_frame)
+
+
+def split_by_date(frame: pd.DataFrame, *cuts: str) -> list:
+    """依日期切成數段，模擬每天（或每次）只寫入新資料"""
+    bounds = [pd.Timestamp.min, *map(pd.Timestamp, cuts), pd.Timestamp.max]
+    dates = pd.to_datetime(frame['date'])
+    return [frame[(dates >= start) & (dates < end)] for start, end in zip(bounds, bounds[1:])]
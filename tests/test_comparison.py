@@ -0,0 +1,67 @@
+import numpy as np
+import pandas as pd
+import pytest
+from utils import comparison
+
+
+@pytest.fixture
+def returns():
+    """三檔相關的股票與一檔較晚上市、中間停牌的股票"""
+    rng = np.random.default_rng(3)
+    market = rng.normal(0, 0.01, 300)
+    matrix = np.column_stack([
+        market + rng.normal(0, 0.005, 300),
+        -market + rng.normal(0, 0.01, 300),
+        rng.normal(0, 0.01, 300),
+        market + rng.normal(0, 0.02, 300),
+    ])
+    matrix[0] = np.nan
+    matrix[:40, 3] = np.nan
+    matrix[100:110, 2] = np.nan
+    return matrix
+
+
+def test_pivot_closes_aligns_dates_and_symbols():
+    dates = ['2024-01-03', '2024-01-02', '2024-01-02', '2024-01-04']
+    stock_ids = ['2330', '2330', '1101', '1101']
+    unique_dates, matrix = comparison.pivot_closes(dates, stock_ids, [11, 10, 50, 52], ['2330', '1101'])
+
+    assert list(unique_dates.astype(str)) == ['2024-01-02', '2024-01-03', '2024-01-04']
+    np.testing.assert_array_equal(matrix, [[10, 50], [11, np.nan], [np.nan, 52]])
+
+
+def test_forward_fill_matches_pandas():
+    matrix = np.array([[np.nan, 1.0], [2.0, np.nan], [np.nan, np.nan], [3.0, 4.0]])
+    np.testing.assert_array_equal(comparison.forward_fill(matrix), pd.DataFrame(matrix).ffill().to_numpy())
+
+
+def test_normalized_and_daily_returns():
+    matrix = np.array([[np.nan, 100.0], [50.0, np.nan], [55.0, 110.0]])
+
+    np.testing.assert_allclose(comparison.normalized_returns(matrix), [[np.nan, 0], [0, 0], [10, 10]])
+    # 上市前為 NaN，停牌日沿用前一日收盤價，報酬為 0
+    np.testing.assert_allclose(comparison.daily_returns(matrix), [[np.nan, np.nan], [np.nan, 0], [0.1, 0.1]])
+
+
+def test_correlation_matrix_matches_pairwise_pandas(returns):
+    expected = pd.DataFrame(returns).corr().to_numpy()
+    np.testing.assert_allclose(comparison.correlation_matrix(returns), expected, atol=1e-9)
+
+
+def test_correlation_matrix_needs_two_common_days():
+    returns = np.array([[0.01, np.nan], [0.02, 0.01], [np.nan, 0.03]])
+    correlation = comparison.correlation_matrix(returns)
+
+    assert np.isnan(correlation[0, 1]) and np.isnan(correlation[1, 0])
+    assert correlation[0, 0] == pytest.approx(1)
+
+
+@pytest.mark.parametrize('base', [0, 3])
+def test_rolling_correlation_matches_pandas(returns, base):
+    window = 20
+    frame = pd.DataFrame(returns)
+    expected = np.column_stack([
+        frame[column].rolling(window).corr(frame[base]).to_numpy() for column in frame
+    ])
+    # 視窗內有任一缺值時為 NaN，與 pandas 的 min_periods=window 相同
+    np.testing.assert_allclose(comparison.rolling_correlation(returns, base, window), expected, atol=1e-7)
@@ -0,0 +1,33 @@
+import pandas as pd
+import pytest
+
+
+def test_invalid_date_raises_value_error(new_writer, daily_frame):
+    db = new_writer()
+    frame = daily_frame.head(3).astype({'date': object})
+    frame.loc[frame.index[0], 'date'] = 'not-a-date'
+
+    with pytest.raises(ValueError, match='欄位型別不符: date'):
+        db.upsert_daily_frame(frame)
+
+
+def test_duplicate_keys_raise_value_error(new_writer, daily_frame):
+    db = new_writer()
+
+    with pytest.raises(ValueError, match='重複'):
+        db.upsert_daily_frame(pd.concat([daily_frame.head(2), daily_frame.head(1)]))
+
+
+def test_replacing_rows_without_ma_keeps_moving_averages(new_writer, daily_frame):
+    db = new_writer()
+    db.upsert_daily_frame(daily_frame)
+    db.update_moving_averages(full=True)
+    ma_sql = "SELECT stock_id, date, ma5, ma10, ma20, ma60 FROM stock_daily ORDER BY stock_id, date"
+    expected = db.conn.execute(ma_sql).fetchdf()
+
+    # 重新寫入最後一個月（例如修正成交筆數），資料不含均線欄位
+    recent = daily_frame[pd.to_datetime(daily_frame['date']) >= '2024-06-01']
+    result = db.upsert_daily_frame(recent)
+
+    assert result == {'inserted': 0, 'replaced': len(recent)}
+    pd.testing.assert_frame_equal(db.conn.execute(ma_sql).fetchdf(), expected)
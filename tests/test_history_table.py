@@ -0,0 +1,31 @@
+import pyarrow as pa
+from app.components.stock_detail import HISTORY_COLUMNS, HISTORY_PAGE_SIZE, build_history_table
+
+
+def history_table(daily_frame):
+    """與 get_stock_history(arrow=True) 相同，依日期降序"""
+    frame = daily_frame[daily_frame['stock_id'] == '2330'].sort_values('date', ascending=False)
+    for column in ('ma5', 'ma10', 'ma20', 'ma60'):
+        frame = frame.assign(**{column: frame['closing_price']})
+    return pa.Table.from_pandas(frame, preserve_index=False)
+
+
+def test_default_order_pages_by_date(daily_frame):
+    history = history_table(daily_frame)
+    page = build_history_table(history, 2)
+
+    assert page.column_names == list(HISTORY_COLUMNS.values())
+    assert page.num_rows == HISTORY_PAGE_SIZE
+    assert page['日期'][0] == history['date'][HISTORY_PAGE_SIZE]
+
+
+def test_sort_applies_to_whole_history_before_paging(daily_frame):
+    history = history_table(daily_frame)
+    closes = sorted(history['closing_price'].to_pylist(), reverse=True)
+
+    first = build_history_table(history, 1, 'closing_price', 'descending')
+    second = build_history_table(history, 2, 'closing_price', 'descending')
+
+    assert first['收盤價'].to_pylist() == closes[:HISTORY_PAGE_SIZE]
+    assert second['收盤價'].to_pylist() == closes[HISTORY_PAGE_SIZE:2 * HISTORY_PAGE_SIZE]
+    assert build_history_table(history, 1, 'closing_price', 'ascending')['收盤價'][0].as_py() == closes[-1]
@@ -0,0 +1,63 @@
+import numpy as np
+import pandas as pd
+from data.database import indicators
+from conftest import split_by_date
+
+INDICATOR_SQL = f"""
+    SELECT stock_id, date, {', '.join(indicators.INDICATOR_COLUMNS)}
+    FROM stock_indicators
+    ORDER BY stock_id, date
+"""
+
+
+def fetch(db) -> pd.DataFrame:
+    return db.conn.execute(INDICATOR_SQL).fetchdf()
+
+
+def test_incremental_matches_full_recompute(new_writer, daily_frame):
+    full = new_writer('full')
+    full.upsert_daily_frame(daily_frame)
+    full.update_indicators(full=True)
+
+    incremental = new_writer('incremental')
+    for part in split_by_date(daily_frame, '2023-09-01', '2023-09-04', '2024-01-02', '2024-06-03'):
+        incremental.upsert_daily_frame(part)
+        # 股票數不是批次大小的倍數，也涵蓋最後一批較小的情況
+        incremental.update_indicators(batch_size=3)
+
+    expected = fetch(full)
+    result = fetch(incremental)
+    state = indicators.STATE_COLUMNS
+    display = [column for column in indicators.INDICATOR_COLUMNS if column not in state]
+    pd.testing.assert_frame_equal(result[['stock_id', 'date']], expected[['stock_id', 'date']])
+    # 狀態欄位保留完整精度，只有浮點數運算順序造成的誤差
+    pd.testing.assert_frame_equal(result[state], expected[state], check_exact=False, rtol=1e-9, atol=1e-9)
+    # 顯示欄位四捨五入到 DISPLAY_DECIMALS 位，誤差在四捨五入邊界上最多差一個單位
+    pd.testing.assert_frame_equal(result[display], expected[display], check_exact=False, rtol=0,
+                                  atol=10 ** -indicators.DISPLAY_DECIMALS + 1e-12)
+
+
+def test_matches_pandas_reference(new_writer, daily_frame):
+    db = new_writer()
+    db.upsert_daily_frame(daily_frame)
+    db.update_indicators(full=True)
+    result = fetch(db).set_index(['stock_id', 'date'])
+    source = daily_frame.assign(date=pd.to_datetime(daily_frame['date'])).set_index(['stock_id', 'date'])
+    close = source['closing_price'].groupby(level='stock_id')
+
+    ema_fast = close.transform(lambda s: s.ewm(span=indicators.MACD_FAST, adjust=False).mean())
+    np.testing.assert_allclose(result['ema_fast'], ema_fast.loc[result.index], rtol=1e-12)
+
+    middle = close.transform(lambda s: s.rolling(indicators.BOLLINGER_PERIOD).mean())
+    np.testing.assert_allclose(result['bb_middle'], middle.loc[result.index].round(indicators.DISPLAY_DECIMALS),
+                               atol=1e-9)
+    assert result['rsi'].dropna().between(0, 100).all()
+    assert result[['k', 'd']].dropna().stack().between(0, 100).all()
+
+
+def test_second_incremental_run_writes_nothing(new_writer, daily_frame):
+    db = new_writer()
+    db.upsert_daily_frame(daily_frame)
+    db.update_indicators()
+
+    assert db.update_indicators() == 0
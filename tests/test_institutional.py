@@ -0,0 +1,70 @@
+import numpy as np
+import pandas as pd
+from data.database.models import StockDB
+from conftest import split_by_date
+
+ROLLING_SQL = f"""
+    SELECT stock_id, date, {', '.join(f'{investor}_net' for investor in StockDB.INSTITUTIONAL_INVESTORS)},
+           {', '.join(StockDB.INSTITUTIONAL_DERIVED_COLUMNS)}
+    FROM institutional_daily
+    ORDER BY stock_id, date
+"""
+
+
+def fetch(db) -> pd.DataFrame:
+    return db.conn.execute(ROLLING_SQL).fetchdf()
+
+
+def test_incremental_matches_single_write(new_writer, institutional_frame):
+    full = new_writer('full')
+    full.upsert_institutional_frame(institutional_frame)
+
+    incremental = new_writer('incremental')
+    for part in split_by_date(institutional_frame, '2023-09-01', '2023-09-04', '2024-01-02', '2024-06-03'):
+        incremental.upsert_institutional_frame(part)
+
+    pd.testing.assert_frame_equal(fetch(incremental), fetch(full))
+
+
+def test_matches_rolling_sum_and_streak(new_writer, institutional_frame):
+    db = new_writer()
+    db.upsert_institutional_frame(institutional_frame)
+    result = fetch(db)
+    grouped = result.groupby('stock_id')
+
+    for investor, window in StockDB.INSTITUTIONAL_ROLLING:
+        expected = grouped[f'{investor}_net'].transform(lambda s: s.rolling(window, min_periods=1).sum())
+        np.testing.assert_array_equal(result[f'{investor}_net_{window}'], expected)
+
+    for investor in StockDB.INSTITUTIONAL_INVESTORS:
+        buying = result[f'{investor}_net'] > 0
+        # 每次未買超時重新計數
+        runs = (~buying).groupby(result['stock_id']).cumsum()
+        expected = buying.groupby([result['stock_id'], runs]).cumsum()
+        np.testing.assert_array_equal(result[f'{investor}_buy_streak'], expected)
+
+
+def test_rewriting_old_date_recomputes_later_rows(new_writer, institutional_frame):
+    corrected = institutional_frame.copy()
+    target = corrected['date'] == pd.Timestamp('2023-10-02')
+    assert target.any()
+    corrected.loc[target, 'foreign_net'] = -corrected.loc[target, 'foreign_net'] - 1_000_000
+
+    expected_db = new_writer('expected')
+    expected_db.upsert_institutional_frame(corrected)
+
+    db = new_writer('rewritten')
+    db.upsert_institutional_frame(institutional_frame)
+    db.upsert_institutional_frame(corrected[target])
+
+    pd.testing.assert_frame_equal(fetch(db), fetch(expected_db))
+
+
+def test_full_recompute_is_idempotent(new_writer, institutional_frame):
+    db = new_writer()
+    db.upsert_institutional_frame(institutional_frame)
+    before = fetch(db)
+
+    assert db.update_institutional_rolling() == 0
+    db.update_institutional_rolling(full=True)
+    pd.testing.assert_frame_equal(fetch(db), before)
@@ -0,0 +1,73 @@
+import numpy as np
+import pandas as pd
+from conftest import split_by_date
+
+MA_SQL = "SELECT stock_id, date, closing_price, ma5, ma10, ma20, ma60 FROM stock_daily ORDER BY stock_id, date"
+
+
+def test_incremental_matches_full_recompute(new_writer, daily_frame):
+    full = new_writer('full')
+    full.upsert_daily_frame(daily_frame)
+    full.update_moving_averages(full=True)
+
+    incremental = new_writer('incremental')
+    for part in split_by_date(daily_frame, '2023-09-01', '2024-01-02', '2024-06-03'):
+        incremental.upsert_daily_frame(part)
+        incremental.update_moving_averages()
+
+    expected = full.conn.execute(MA_SQL).fetchdf()
+    pd.testing.assert_frame_equal(incremental.conn.execute(MA_SQL).fetchdf(), expected)
+
+
+def test_matches_rolling_mean(new_writer, daily_frame):
+    db = new_writer()
+    db.upsert_daily_frame(daily_frame)
+    db.update_moving_averages(full=True)
+    result = db.conn.execute(MA_SQL).fetchdf()
+
+    for period in (5, 10, 20, 60):
+        rolling = result.groupby('stock_id')['closing_price'].transform(lambda s: s.rolling(period).mean())
+        # 前 period - 1 個交易日沒有均線
+        assert result[f'ma{period}'].isna().equals(rolling.isna())
+        np.testing.assert_allclose(result[f'ma{period}'].dropna(), rolling.dropna(), atol=0.005 + 1e-9)
+
+
+def test_second_incremental_run_updates_nothing(new_writer, daily_frame):
+    db = new_writer()
+    db.upsert_daily_frame(daily_frame)
+    db.update_moving_averages()
+
+    assert db.update_moving_averages() == 0
+
+
+def test_backfilled_history_is_fixed_by_full_recompute(new_writer, daily_frame):
+    expected_db = new_writer('expected')
+    expected_db.upsert_daily_frame(daily_frame)
+    expected_db.update_moving_averages(full=True)
+
+    # 先寫入缺少一段歷史的資料，補寫後以 full=True 重算
+    dates = pd.to_datetime(daily_frame['date'])
+    gap = (dates >= '2023-10-02') & (dates < '2023-11-01')
+    db = new_writer('backfilled')
+    db.upsert_daily_frame(daily_frame[~gap])
+    db.update_moving_averages()
+    db.upsert_daily_frame(daily_frame[gap])
+    db.update_moving_averages(full=True)
+
+    pd.testing.assert_frame_equal(db.conn.execute(MA_SQL).fetchdf(), expected_db.conn.execute(MA_SQL).fetchdf())
+
+
+def test_short_history_is_not_recomputed_until_it_has_enough_rows(new_writer, daily_frame):
+    first_days = daily_frame[daily_frame['stock_id'] == '1101'].head(8)
+    db = new_writer()
+    db.upsert_daily_frame(first_days.head(3))
+
+    # 不足 5 筆時沒有可計算的均線，重複執行不會再更新
+    assert db.update_moving_averages() == 0
+    db.upsert_daily_frame(first_days.tail(5))
+    assert db.update_moving_averages() == 8
+
+    expected = new_writer('expected')
+    expected.upsert_daily_frame(first_days)
+    expected.update_moving_averages(full=True)
+    pd.testing.assert_frame_equal(db.conn.execute(MA_SQL).fetchdf(), expected.conn.execute(MA_SQL).fetchdf())
@@ -0,0 +1,163 @@
+import os
+import threading
+import time
+from datetime import date
+import duckdb
+import pandas as pd
+import pytest
+from data.database.db_manager import DatabaseManager
+from data.database.parquet_store import ParquetPartitionStore
+from data.database.snapshot import SnapshotCache
+
+
+class FakeBlob:
+    def __init__(self, client, name):
+        self.client = client
+        self.name = name
+
+    @property
+    def generation(self):
+        return self.client.objects[self.name][0]
+
+    @property
+    def md5_hash(self):
+        return f"md5-{self.generation}"
+
+    def upload_from_filename(self, path, timeout=None):
+        with open(path, 'rb') as f:
+            content = f.read()
+        generation = self.client.objects.get(self.name, (0, b''))[0] + 1
+        self.client.objects[self.name] = (generation, content)
+
+    def download_to_filename(self, path):
+        gate = self.client.gates.get(self.name)
+        if gate is not None:
+            gate.wait(5)
+        self.client.downloads.append(self.name)
+        with open(path, 'wb') as f:
+            f.write(self.client.objects[self.name][1])
+
+
+class FakeStorageClient:
+    """以記憶體保存物件的 GCS client，gates 可讓指定物件的下載等待，模擬慢速下載"""
+    def __init__(self):
+        self.objects = {}
+        self.downloads = []
+        self.gates = {}
+
+    def bucket(self, name):
+        return self
+
+    def blob(self, name):
+        return FakeBlob(self, name)
+
+    def get_blob(self, name):
+        return FakeBlob(self, name) if name in self.objects else None
+
+    def list_blobs(self, prefix):
+        return [FakeBlob(self, name) for name in sorted(self.objects) if name.startswith(prefix)]
+
+
+@pytest.fixture
+def storage():
+    return FakeStorageClient()
+
+
+@pytest.fixture
+def store(tmp_path, storage):
+    return ParquetPartitionStore('bucket', cache_dir=str(tmp_path / 'cache'), ttl=0, storage_client=storage)
+
+
+@pytest.fixture
+def published(new_writer, daily_frame, institutional_frame, store):
+    """寫入端匯出全部分區並發布讀取端快照"""
+    writer = new_writer()
+    writer.parquet_store = store
+    writer.upsert_daily_frame(daily_frame)
+    writer.upsert_institutional_frame(institutional_frame)
+    writer.update_moving_averages(full=True)
+    writer.export_daily_partitions()
+    return writer
+
+
+def reader_snapshot(tmp_path, storage) -> SnapshotCache:
+    (tmp_path / 'reader').mkdir(exist_ok=True)
+    return SnapshotCache(str(tmp_path / 'reader' / 'StockHero.db'), 'bucket',
+                         blob_name='StockHero.reader.db', storage_client=storage)
+
+
+def test_reader_snapshot_has_no_stock_daily(published, storage, tmp_path):
+    snapshot = reader_snapshot(tmp_path, storage)
+    conn = duckdb.connect(snapshot.ensure_local(), read_only=True)
+    tables = {row[0] for row in conn.execute("SELECT table_name FROM duckdb_tables()").fetchall()}
+    conn.close()
+
+    assert 'stock_daily' not in tables
+    assert {'stock_summary', 'stock_info', 'schema_info'} <= tables
+
+
+def test_reader_queries_only_download_needed_partitions(published, storage, store, tmp_path):
+    snapshot = reader_snapshot(tmp_path, storage)
+    reader = DatabaseManager(snapshot.db_path, 'bucket', snapshot=snapshot, parquet_store=store, read_only=True)
+    reader.connect()
+    try:
+        storage.downloads.clear()
+        history = reader.get_stock_history('2330', date(2024, 5, 20), date(2024, 6, 10))
+        expected = published.conn.execute("""
+            SELECT * FROM stock_daily
+            WHERE stock_id = '2330' AND date BETWEEN DATE '2024-05-20' AND DATE '2024-06-10'
+            ORDER BY date DESC
+        """).fetchdf()
+
+        pd.testing.assert_frame_equal(history.reset_index(drop=True), expected, check_dtype=False)
+        assert sorted(storage.downloads) == [store.blob_name(2024, 5), store.blob_name(2024, 6)]
+        # 沒有分區的日期區間回傳空結果，不需要 stock_daily
+        assert reader.get_stock_history('2330', date(2030, 1, 1), date(2030, 1, 31)).empty
+        # 法人排行的收盤價同樣由分區取得
+        ranking = reader.get_institutional_ranking(reader.get_institutional_latest_date())
+        assert len(ranking) and ranking['closing_price'].notna().all()
+    finally:
+        reader.close()
+
+
+def test_download_of_one_partition_does_not_block_others(published, storage, store):
+    gate = storage.gates[store.blob_name(2024, 5)] = threading.Event()
+    slow = threading.Thread(target=store.ensure_partitions, args=(date(2024, 5, 1), date(2024, 5, 31)))
+    slow.start()
+    try:
+        # 5 月的下載還在等待時，查詢 6 月不受影響
+        paths = store.ensure_partitions(date(2024, 6, 1), date(2024, 6, 30))
+        assert len(paths) == 1
+        assert slow.is_alive()
+    finally:
+        gate.set()
+        slow.join()
+
+
+def test_concurrent_requests_download_a_partition_once(published, storage, store):
+    gate = storage.gates[store.blob_name(2024, 5)] = threading.Event()
+    results = []
+
+    def request():
+        results.append(store.ensure_partitions(date(2024, 5, 1), date(2024, 5, 31)))
+
+    threads = [threading.Thread(target=request) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.1)
+    gate.set()
+    for thread in threads:
+        thread.join()
+
+    assert storage.downloads.count(store.blob_name(2024, 5)) == 1
+    assert len(results) == 4 and all(paths == results[0] for paths in results)
+
+
+def test_updated_partition_replaces_old_file(published, storage, store):
+    old_path, = store.ensure_partitions(date(2024, 6, 1), date(2024, 6, 30))
+    published.export_daily_partitions([(2024, 6)])
+
+    new_path, = store.ensure_partitions(date(2024, 6, 1), date(2024, 6, 30))
+
+    assert new_path != old_path
+    assert not os.path.exists(old_path)
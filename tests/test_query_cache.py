@@ -0,0 +1,103 @@
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+from data.database.query_cache import QueryCache, estimate_size
+
+
+def block(kb: int):
+    """nbytes 正好為 kb KiB 的陣列"""
+    return np.zeros(kb * 1024, dtype=np.uint8)
+
+
+def load(cache, key, kb=1, version='v1'):
+    calls = []
+
+    def loader():
+        calls.append(key)
+        return block(kb)
+
+    cache.get_or_load(version, key, loader)
+    return bool(calls)
+
+
+def test_hit_returns_cached_value():
+    cache = QueryCache(max_bytes=10 * 1024)
+    first = cache.get_or_load('v1', 'a', lambda: block(1))
+    second = cache.get_or_load('v1', 'a', lambda: block(1))
+
+    assert second is first
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_evicts_least_recently_used_until_under_limit():
+    cache = QueryCache(max_bytes=3 * 1024)
+    for key in 'abc':
+        load(cache, key)
+    # 讀取 a 後，最久未使用的是 b
+    load(cache, 'a')
+    load(cache, 'd')
+
+    assert cache.total_bytes == 3 * 1024
+    assert cache.evictions == 1
+    assert load(cache, 'b') is True
+    assert load(cache, 'a') is False
+
+
+def test_large_entry_evicts_several_small_ones():
+    cache = QueryCache(max_bytes=4 * 1024)
+    for key in 'abcd':
+        load(cache, key)
+    load(cache, 'big', kb=3)
+
+    assert cache.total_bytes <= cache.max_bytes
+    assert cache.evictions == 3
+    assert cache.stats()['entries'] == 2
+
+
+def test_entry_larger_than_limit_is_not_cached():
+    cache = QueryCache(max_bytes=2 * 1024)
+    load(cache, 'a')
+    load(cache, 'huge', kb=3)
+
+    assert cache.total_bytes == 1024
+    assert load(cache, 'huge', kb=3) is True
+    assert load(cache, 'a') is False
+
+
+def test_sizer_overrides_size_estimate():
+    cache = QueryCache(max_bytes=10 * 1024)
+    cache.get_or_load('v1', 'figure', lambda: object(), sizer=lambda value: 4 * 1024)
+
+    assert cache.total_bytes == 4 * 1024
+
+
+def test_version_change_invalidates_everything():
+    cache = QueryCache(max_bytes=10 * 1024)
+    load(cache, 'a')
+    load(cache, 'b')
+
+    assert load(cache, 'a', version='v2') is True
+    assert cache.total_bytes == 1024
+
+
+def test_value_loaded_during_version_change_is_not_cached():
+    cache = QueryCache(max_bytes=10 * 1024)
+
+    def loader():
+        # 載入期間其他 session 已切換到新版本
+        cache.get_or_load('v2', 'other', lambda: block(1))
+        return block(1)
+
+    cache.get_or_load('v1', 'a', loader)
+    assert load(cache, 'a', version='v2') is True
+
+
+def test_estimate_size_of_query_results():
+    arr = block(4)
+    assert estimate_size(arr) == arr.nbytes
+    table = pa.table({'x': np.arange(1000, dtype=np.int64)})
+    assert estimate_size(table) == table.nbytes
+
+    df = pd.DataFrame({'x': np.arange(1000, dtype=np.int64), 's': ['abc'] * 1000})
+    # 字串欄位以樣本推估，至少包含數值欄位與每個字串物件的大小
+    assert estimate_size(df) >= 8000 + 1000 * len('abc')
@@ -0,0 +1,102 @@
+import os
+import duckdb
+import pytest
+from data.database.db_manager import DatabaseManager, SchemaVersionError, staging_db_manager
+from data.database.models import StockDB
+from data.database.snapshot import LocalSnapshot
+
+
+def new_reader(db_path: str) -> DatabaseManager:
+    reader = DatabaseManager(db_path, '', snapshot=LocalSnapshot(db_path), read_only=True)
+    reader.connect()
+    return reader
+
+
+BASELINE_STOCK_INFO_TABLE = """
+    CREATE TABLE IF NOT EXISTS stock_info (
+        stock_id VARCHAR PRIMARY KEY, stock_name VARCHAR, industry VARCHAR, follow BOOLEAN,
+        market_type VARCHAR, source VARCHAR, created_at TIMESTAMP, updated_at TIMESTAMP, conditions JSON
+    )
+"""
+
+
+def publish_baseline(db_path: str) -> str:
+    """發布沒有 schema_info 的資料庫，模擬加入結構版本之前寫入的檔案"""
+    publisher = LocalSnapshot(db_path)
+    conn = duckdb.connect(publisher.prepare_staging())
+    conn.execute("DROP TABLE IF EXISTS schema_info")
+    conn.execute(StockDB.CREATE_STOCK_DAILY_TABLE)
+    conn.execute(BASELINE_STOCK_INFO_TABLE)
+    conn.close()
+    return publisher.publish()
+
+
+def test_reader_reports_baseline_database_and_recovers_after_publish(tmp_path):
+    db_path = str(tmp_path / 'StockHero.db')
+    publish_baseline(db_path)
+
+    reader = new_reader(db_path)
+    try:
+        assert f"結構版本為 {StockDB.BASELINE_SCHEMA_VERSION}" in reader.check_schema()
+        assert 'staging_db_manager' in reader.schema_error
+
+        with staging_db_manager(db_path):
+            pass
+        reader.snapshot.refresh()
+
+        assert reader.check_schema() is None
+        with reader.cursor() as cur:
+            assert cur.execute("SELECT COUNT(*) FROM stock_summary").fetchone()[0] == 0
+    finally:
+        reader.close()
+
+
+def test_outdated_snapshot_is_not_switched_to(tmp_path):
+    db_path = str(tmp_path / 'StockHero.db')
+    with staging_db_manager(db_path):
+        pass
+    reader = new_reader(db_path)
+    try:
+        current = reader._open_path
+        baseline = publish_baseline(db_path)
+        reader.snapshot.refresh()
+
+        assert reader.check_schema() is None
+        assert reader._open_path == current
+        assert reader._rejected_path == baseline
+    finally:
+        reader.close()
+
+
+@pytest.mark.parametrize('damage', ['remove', 'corrupt'])
+def test_unreadable_snapshot_keeps_current_connection(tmp_path, damage):
+    db_path = str(tmp_path / 'StockHero.db')
+    with staging_db_manager(db_path):
+        pass
+    reader = new_reader(db_path)
+    try:
+        current = reader._open_path
+        with staging_db_manager(db_path):
+            pass
+        reader.snapshot.refresh()
+        # 讀取端還沒切換前，新版本已被發布端清除或檔案損毀
+        if damage == 'remove':
+            os.remove(reader.snapshot.path)
+        else:
+            with open(reader.snapshot.path, 'wb') as f:
+                f.write(b'not a database')
+
+        with reader.cursor() as cur:
+            assert cur.execute("SELECT COUNT(*) FROM stock_daily").fetchone()[0] == 0
+        assert reader._open_path == current
+    finally:
+        reader.close()
+
+
+def test_switching_rejects_outdated_database(tmp_path):
+    db_path = str(tmp_path / 'StockHero.db')
+    baseline = publish_baseline(db_path)
+    reader = DatabaseManager(db_path, '', snapshot=LocalSnapshot(db_path), read_only=True)
+
+    with pytest.raises(SchemaVersionError):
+        reader._open(baseline)
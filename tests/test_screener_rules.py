@@ -0,0 +1,124 @@
+import pandas as pd
+import pytest
+from data.database.screener_rules import compile_rule, RuleError, MAX_LOOKBACK
+
+
+def test_aliases_and_fields():
+    rule = compile_rule('close > ma20 and volume > 2 * avg(volume, 20)')
+
+    assert rule.fields == frozenset({'closing_price', 'ma20', 'trade_volume'})
+    assert 'closing_price > ma20' in rule.expression
+    assert 'AVG(trade_volume)' in rule.expression
+
+
+@pytest.mark.parametrize('text, lookback', [
+    ('close > 10', 1),
+    ('close > prev(close)', 2),
+    ('close > prev(close, 5)', 6),
+    ('volume > avg(volume, 20) or close > max(high, 60)', 60),
+    ('abs(change_pct) > 3 and not close < min(low, 10)', 10),
+])
+def test_lookback(text, lookback):
+    assert compile_rule(text).lookback == lookback
+
+
+def test_keywords_are_case_insensitive_and_whitespace_is_ignored():
+    assert compile_rule('  CLOSE>MA20 AND Volume>0 ').expression == compile_rule('close > ma20 and volume > 0').expression
+
+
+def test_division_by_zero_is_null():
+    assert 'NULLIF(lowest_price, 0)' in compile_rule('high / low > 1.05').expression
+
+
+@pytest.mark.parametrize('text, position', [
+    ('', 0),
+    ('close', 0),
+    ('close + 1', 0),
+    ('price > 10', 0),
+    ('close > ma20 and', 16),
+    ('close > median(close, 5)', 8),
+    ('close > 1 > 0', 10),
+    ('close > 10 close', 11),
+    ('(close > 10', 11),
+    ('close > avg(close, 0)', 19),
+    (f'close > avg(close, {MAX_LOOKBACK + 1})', 19),
+    ('close > avg(close, 2.5)', 19),
+    ('close > avg(avg(close, 5), 5)', 12),
+    ('close > ma20 and 5', 17),
+    ('and close > 0', 0),
+])
+def test_errors_report_position(text, position):
+    with pytest.raises(RuleError) as error:
+        compile_rule(text)
+    assert error.value.position == position
+
+
+@pytest.mark.parametrize('text', [
+    "close > 0; DROP TABLE stock_daily",
+    "close > 0 -- comment",
+    "close > 0 /* comment */",
+    "close > '0'",
+    'close > "ma20"',
+    "close > 0) OR (1 = 1",
+    "close > 0 union select * from stock_info",
+    "stock_id = stock_id",
+    "close > ma20 or read_csv(x)",
+    "close > avg(close, 5) over ()",
+])
+def test_rejects_sql_injection(text):
+    with pytest.raises(RuleError):
+        compile_rule(text)
+
+
+RULES = [
+    'close > ma20',
+    'volume > avg(volume, 20)',
+    'close >= prev(close) or change_pct < -1',
+    'not (high - low) / close > 0.02',
+]
+
+
+@pytest.fixture
+def screener_db(new_writer, daily_frame):
+    db = new_writer()
+    db.upsert_daily_frame(daily_frame)
+    db.update_moving_averages(full=True)
+    return db
+
+
+def evaluate_latest(frame: pd.DataFrame, text: str) -> set:
+    """以 pandas 逐檔計算最新交易日是否符合規則，作為 SQL 結果的對照"""
+    matched = set()
+    latest = frame['date'].max()
+    for stock_id, rows in frame.sort_values('date').groupby('stock_id'):
+        last = rows.iloc[-1]
+        if last['date'] != latest:
+            continue
+        result = {
+            'close > ma20': last['closing_price'] > last['ma20'],
+            'volume > avg(volume, 20)': last['trade_volume'] > rows['trade_volume'].iloc[-20:].mean(),
+            'close >= prev(close) or change_pct < -1':
+                last['closing_price'] >= rows['closing_price'].iloc[-2] or last['change_percent'] < -1,
+            'not (high - low) / close > 0.02':
+                not (last['highest_price'] - last['lowest_price']) / last['closing_price'] > 0.02,
+        }[text]
+        if result:
+            matched.add(stock_id)
+    return matched
+
+
+def test_screen_by_rule_matches_pandas(screener_db):
+    frame = screener_db.conn.execute("SELECT * FROM stock_daily").fetchdf()
+    found = 0
+    for text in RULES:
+        result = screener_db.screen_by_rule(text)
+        assert set(result['stock_id'].to_pylist()) == evaluate_latest(frame, text), text
+        found += result.num_rows
+    assert found > 0
+
+
+def test_rejected_rule_leaves_data_untouched(screener_db):
+    before = screener_db.conn.execute("SELECT COUNT(*) FROM stock_daily").fetchone()[0]
+    with pytest.raises(RuleError):
+        screener_db.screen_by_rule("close > 0; DELETE FROM stock_daily")
+    assert screener_db.conn.execute("SELECT COUNT(*) FROM stock_daily").fetchone()[0] == before
@@ -0,0 +1,151 @@
+import os
+import duckdb
+import pytest
+from data.database.snapshot import SnapshotCache, LocalSnapshot
+
+
+class FakeBlob:
+    def __init__(self, client, generation, content):
+        self.client = client
+        self.generation = generation
+        self.md5_hash = f"md5-{generation}"
+        self.content = content
+
+    def download_to_filename(self, path):
+        self.client.downloads += 1
+        with open(path, 'wb') as f:
+            f.write(self.content)
+
+
+class FakeStorageClient:
+    """只實作 SnapshotCache 用到的 bucket().get_blob()，並記錄下載次數"""
+    def __init__(self):
+        self.blob = None
+        self.downloads = 0
+
+    def publish(self, generation, content):
+        self.blob = FakeBlob(self, generation, content)
+
+    def bucket(self, name):
+        return self
+
+    def get_blob(self, name):
+        return self.blob
+
+
+@pytest.fixture
+def storage():
+    return FakeStorageClient()
+
+
+def read(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def test_snapshot_cache_downloads_versioned_file(tmp_path, storage):
+    storage.publish(1, b'v1')
+    cache = SnapshotCache(str(tmp_path / 'StockHero.db'), 'bucket', storage_client=storage)
+
+    path = cache.ensure_local()
+
+    assert path == str(tmp_path / 'StockHero.1.db')
+    assert read(path) == b'v1'
+    assert cache.current() == (path, '1')
+    assert not os.path.exists(f"{path}.download")
+
+
+def test_snapshot_cache_skips_download_when_version_unchanged(tmp_path, storage):
+    storage.publish(1, b'v1')
+    cache = SnapshotCache(str(tmp_path / 'StockHero.db'), 'bucket', storage_client=storage)
+    cache.ensure_local()
+
+    assert cache.refresh() is False
+    assert storage.downloads == 1
+
+
+def test_snapshot_cache_swaps_to_new_version_and_keeps_old_file(tmp_path, storage):
+    storage.publish(1, b'v1')
+    cache = SnapshotCache(str(tmp_path / 'StockHero.db'), 'bucket', storage_client=storage)
+    old_path = cache.ensure_local()
+
+    storage.publish(2, b'v2')
+    assert cache.refresh() is True
+
+    path, version = cache.current()
+    assert (path, version) == (str(tmp_path / 'StockHero.2.db'), '2')
+    assert read(path) == b'v2'
+    # 舊檔案由讀取端在 cursor 都歸還後才刪除
+    assert read(old_path) == b'v1'
+
+
+def test_snapshot_cache_reuses_metadata_after_restart(tmp_path, storage):
+    storage.publish(1, b'v1')
+    db_path = str(tmp_path / 'StockHero.db')
+    SnapshotCache(db_path, 'bucket', storage_client=storage).ensure_local()
+
+    restarted = SnapshotCache(db_path, 'bucket', storage_client=storage)
+    assert restarted.ensure_local() == str(tmp_path / 'StockHero.1.db')
+    assert storage.downloads == 1
+
+
+def test_snapshot_cache_ignores_metadata_of_missing_file(tmp_path, storage):
+    storage.publish(1, b'v1')
+    db_path = str(tmp_path / 'StockHero.db')
+    os.remove(SnapshotCache(db_path, 'bucket', storage_client=storage).ensure_local())
+
+    assert SnapshotCache(db_path, 'bucket', storage_client=storage).path is None
+
+
+def test_snapshot_cache_missing_blob_raises(tmp_path, storage):
+    cache = SnapshotCache(str(tmp_path / 'StockHero.db'), 'bucket', storage_client=storage)
+    with pytest.raises(FileNotFoundError):
+        cache.refresh()
+
+
+def test_local_snapshot_first_staging_is_empty_database(tmp_path):
+    publisher = LocalSnapshot(str(tmp_path / 'StockHero.db'))
+    assert not LocalSnapshot.exists(publisher.db_path)
+
+    staging_path = publisher.prepare_staging()
+
+    conn = duckdb.connect(staging_path)
+    assert conn.execute("SELECT COUNT(*) FROM duckdb_tables()").fetchone()[0] == 0
+    conn.close()
+
+
+def test_local_snapshot_publish_is_seen_by_reader(tmp_path):
+    db_path = str(tmp_path / 'StockHero.db')
+    publisher = LocalSnapshot(db_path)
+    conn = duckdb.connect(publisher.prepare_staging())
+    conn.execute("CREATE TABLE t AS SELECT 1 AS v")
+    conn.close()
+    published = publisher.publish()
+
+    assert LocalSnapshot.exists(db_path)
+    assert not os.path.exists(publisher.staging_path)
+    reader = LocalSnapshot(db_path)
+    assert reader.ensure_local() == published
+
+    # 下一次發布以目前版本為起點，讀取端 refresh 後切換
+    conn = duckdb.connect(publisher.prepare_staging())
+    assert conn.execute("SELECT v FROM t").fetchone()[0] == 1
+    conn.execute("INSERT INTO t VALUES (2)")
+    conn.close()
+    republished = publisher.publish()
+
+    assert reader.refresh() is True
+    assert reader.path == republished
+    assert reader.refresh() is False
+
+
+def test_local_snapshot_prunes_old_versions(tmp_path):
+    db_path = str(tmp_path / 'StockHero.db')
+    publisher = LocalSnapshot(db_path, keep=2)
+    published = []
+    for _ in range(4):
+        publisher.prepare_staging()
+        published.append(publisher.publish())
+
+    assert [os.path.exists(path) for path in published] == [False, False, True, True]
+    assert publisher.path == published[-1]
@@ -0,0 +1,48 @@
+import json
+from data.database.models import StockDB
+
+FLAGS_SQL = f"SELECT stock_id, {', '.join(StockDB.CONDITION_COLUMNS)} FROM stock_info ORDER BY stock_id"
+
+
+def follow(db, stock_ids):
+    for stock_id in stock_ids:
+        db.upsert_stock_info(stock_id, f"測試{stock_id}", '測試業', True, '上市', 'test')
+
+
+def test_matches_latest_two_days(new_writer, daily_frame):
+    db = new_writer()
+    db.upsert_daily_frame(daily_frame)
+    db.update_moving_averages(full=True)
+    stock_ids = sorted(daily_frame['stock_id'].unique())
+    follow(db, stock_ids)
+
+    assert db.evaluate_stock_conditions() == len(stock_ids)
+
+    frame = db.conn.execute("SELECT * FROM stock_daily ORDER BY stock_id, date").fetchdf()
+    latest = frame.groupby('stock_id').tail(1).set_index('stock_id')
+    previous = frame.groupby('stock_id').nth(-2).set_index('stock_id')
+    flags = db.conn.execute(FLAGS_SQL).fetchdf().set_index('stock_id')
+    expected_volume = latest['trade_volume'] > 2 * previous['trade_volume']
+    assert flags['volume_increase'].tolist() == expected_volume.tolist()
+    for period in (5, 10, 20, 60):
+        expected = latest['closing_price'] > latest[f'ma{period}']
+        assert flags[f'above_ma{period}'].tolist() == expected.tolist()
+
+
+def test_stock_without_latest_row_is_reset(new_writer, daily_frame):
+    db = new_writer()
+    db.upsert_daily_frame(daily_frame)
+    db.update_moving_averages(full=True)
+    follow(db, sorted(daily_frame['stock_id'].unique()))
+    # 先讓所有條件成立，模擬上一次判斷的結果
+    db.conn.execute(f"UPDATE stock_info SET {', '.join(f'{column} = TRUE' for column in StockDB.CONDITION_COLUMNS)}")
+
+    # 1101 最新交易日停牌
+    latest_date = daily_frame['date'].max()
+    db.conn.execute("DELETE FROM stock_daily WHERE stock_id = '1101' AND date = ?", [latest_date])
+    db.evaluate_stock_conditions()
+
+    flags = db.conn.execute(FLAGS_SQL).fetchdf().set_index('stock_id')
+    assert not flags.loc['1101'].any()
+    conditions = db.conn.execute("SELECT conditions FROM stock_info WHERE stock_id = '1101'").fetchone()[0]
+    assert not any(json.loads(conditions).values())
@@ -0,0 +1,80 @@
+import pytest
+from utils.symbol_index import SymbolIndex, normalize
+
+STOCKS = [
+    ('2330', '台積電', '半導體業'),
+    ('2303', '聯電', '半導體業'),
+    ('8299', '群聯', '半導體業'),
+    ('6770', '力積電', '半導體業'),
+    ('1101', '台泥', '水泥工業'),
+    ('2317', '鴻海', '其他電子業'),
+    ('0050', '元大台灣50', 'ETF'),
+    ('9999', None, None),
+]
+
+
+@pytest.fixture(scope='module')
+def index():
+    return SymbolIndex(*zip(*STOCKS))
+
+
+def test_normalize():
+    assert normalize(' ２３３０ ') == '2330'
+    assert normalize('ETF') == 'etf'
+    assert normalize(None) == ''
+
+
+@pytest.mark.parametrize('query, expected', [
+    # 代碼完全相同排在代碼開頭相同之前
+    ('2330', ['2330']),
+    ('23', ['2303', '2317', '2330']),
+    # 名稱開頭相同
+    ('台', ['1101', '2330', '0050']),
+    # 名稱完全相同，再來是名稱包含輸入
+    ('聯電', ['2303']),
+    ('聯', ['2303', '8299']),
+    ('積電', ['2330', '6770']),
+    # 名稱依序包含每個字，排在順序不同之前
+    ('台電', ['2330']),
+    ('電台', ['2330']),
+    # 產業別排在最後
+    ('半導體', ['2303', '2330', '6770', '8299']),
+    ('etf', ['0050']),
+    ('ｅｔｆ', ['0050']),
+])
+def test_search_ranking(index, query, expected):
+    assert index.search(query) == expected
+
+
+def test_tiers_are_ordered(index):
+    # 「電」：名稱包含的股票依代碼排序，產業別「其他電子業」的鴻海排在最後
+    assert index.search('電') == ['2303', '2330', '6770', '2317']
+
+
+def test_industry_can_be_excluded(index):
+    assert index.search('半導體', industry=False) == []
+    assert index.search('電', industry=False) == ['2303', '2330', '6770']
+
+
+def test_limit_keeps_best_matches(index):
+    assert index.search('23', limit=2) == ['2303', '2317']
+    assert index.search('半導體', limit=1) == ['2303']
+
+
+def test_matches_do_not_span_fields(index):
+    assert index.search('2330台積電') == []
+    assert index.search('電半導') == []
+    assert index.search('\x00') == []
+    assert index.search('') == []
+
+
+def test_resolve_and_labels(index):
+    assert index.resolve('台積電') == '2330'
+    assert index.resolve(' ２３３０') == '2330'
+    assert index.resolve('台積') is None
+    assert index.label('2330') == '2330 台積電'
+    assert index.label('9999') == '9999'
+    assert index.name('0000') == ''
+    assert index.industry('2303') == '半導體業'
+    assert len(index) == len(STOCKS)
+    assert index.nbytes > 0
@@ -0,0 +1,95 @@
+import numpy as np
+
+
+def pivot_closes(dates, stock_ids, closes, symbols: list):
+    """
+    將 (日期, 股票, 收盤價) 的長表轉為對齊的 日期 × 股票 矩陣
+    Args:
+        dates, stock_ids, closes: 查詢結果的三個欄位
+        symbols: 矩陣欄位的股票順序
+    Returns:
+        (升序的交易日, shape 為 (交易日數, 股票數) 的收盤價矩陣)，該日沒有交易的位置為 NaN
+    """
+    dates = np.asarray(dates, dtype='datetime64[D]')
+    unique_dates, rows = np.unique(dates, return_inverse=True)
+    order = np.argsort(symbols)
+    sorted_symbols = np.asarray(symbols, dtype=object)[order]
+    columns = order[np.searchsorted(sorted_symbols, np.asarray(stock_ids, dtype=object))]
+
+    matrix = np.full((len(unique_dates), len(symbols)), np.nan)
+    matrix[rows, columns] = np.asarray(closes, dtype=float)
+    return unique_dates, matrix
+
+
+def forward_fill(matrix: np.ndarray) -> np.ndarray:
+    """各欄以前一個有值的列補上 NaN（停牌日沿用前一日收盤價），第一筆資料之前維持 NaN"""
+    valid = ~np.isnan(matrix)
+    index = np.where(valid, np.arange(len(matrix))[:, None], 0)
+    np.maximum.accumulate(index, axis=0, out=index)
+    # 第一筆資料之前 index 為 0，若第 0 列沒有資料則結果仍為 NaN
+    return matrix[index, np.arange(matrix.shape[1])]
+
+
+def normalized_returns(matrix: np.ndarray) -> np.ndarray:
+    """以各股票在區間內第一個收盤價為基準的累積報酬（%）"""
+    filled = forward_fill(matrix)
+    first_rows = np.argmax(~np.isnan(filled), axis=0)
+    base = filled[first_rows, np.arange(filled.shape[1])]
+    return (filled / base - 1) * 100
+
+
+def daily_returns(matrix: np.ndarray) -> np.ndarray:
+    """每日報酬率，第一列與上市前為 NaN，停牌日為 0"""
+    filled = forward_fill(matrix)
+    returns = np.full(filled.shape, np.nan)
+    returns[1:] = filled[1:] / filled[:-1] - 1
+    return returns
+
+
+def correlation_matrix(returns: np.ndarray) -> np.ndarray:
+    """
+    報酬率的相關係數矩陣，每一對股票只使用兩者都有報酬率的交易日
+    以矩陣乘法一次算出所有配對的加總，不逐對計算
+    """
+    valid = (~np.isnan(returns)).astype(float)
+    values = np.where(valid > 0, returns, 0.0)
+    count = valid.T @ valid
+    # sum_x[i, j] 為股票 i 在與 j 共同有值的交易日的加總
+    sum_x = values.T @ valid
+    sum_xx = (values ** 2).T @ valid
+    sum_xy = values.T @ values
+    with np.errstate(invalid='ignore', divide='ignore'):
+        covariance = count * sum_xy - sum_x * sum_x.T
+        variance = (count * sum_xx - sum_x ** 2) * (count * sum_xx - sum_x ** 2).T
+        correlation = covariance / np.sqrt(variance)
+    correlation[count < 2] = np.nan
+    return np.clip(correlation, -1, 1)
+
+
+def rolling_correlation(returns: np.ndarray, base: int, window: int) -> np.ndarray:
+    """
+    各股票與第 base 檔股票最近 window 個交易日報酬率的滾動相關係數
+    以累積和計算每個視窗的加總，時間複雜度與視窗長度無關；視窗內有缺值時為 NaN
+    Returns:
+        shape 與 returns 相同的矩陣，base 欄固定為 1（有資料時）
+    """
+    y = returns[:, [base]]
+    valid = ~np.isnan(returns) & ~np.isnan(y)
+    x = np.where(valid, returns, 0.0)
+    y = np.where(valid, y, 0.0)
+
+    def window_sum(values):
+        cumulative = np.cumsum(values, axis=0)
+        result = cumulative.copy()
+        result[window:] -= cumulative[:-window]
+        return result
+
+    count = window_sum(valid.astype(float))
+    sum_x, sum_y = window_sum(x), window_sum(y)
+    sum_xx, sum_yy, sum_xy = window_sum(x * x), window_sum(y * y), window_sum(x * y)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        covariance = window * sum_xy - sum_x * sum_y
+        variance = (window * sum_xx - sum_x ** 2) * (window * sum_yy - sum_y ** 2)
+        correlation = covariance / np.sqrt(variance)
+    correlation[count < window] = np.nan
+    return np.clip(correlation, -1, 1)
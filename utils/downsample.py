@@ -0,0 +1,67 @@
+import numpy as np
+from config.config import CHART_MAX_POINTS
+
+# K 線週期與每個週期約略包含的交易日數
+RESOLUTION_TRADING_DAYS = {
+    'day': 1,
+    'week': 5,
+    'month': 21,
+}
+
+def choose_resolution(row_count: int, max_points: int = CHART_MAX_POINTS) -> str:
+    """依日資料筆數選擇能讓 K 線數量不超過 max_points 的最細週期"""
+    for resolution, days in RESOLUTION_TRADING_DAYS.items():
+        if row_count / days <= max_points:
+            return resolution
+    return 'month'
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets 降採樣，保留折線的視覺形狀
+    Args:
+        x: 遞增的 x 座標（數值）
+        y: y 座標
+        threshold: 要保留的點數
+    Returns:
+        保留點的索引
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    # 頭尾固定保留，其餘點平均分到 threshold - 2 個桶子，每個桶子挑一個點
+    every = (n - 2) / (threshold - 2)
+    indices = np.empty(threshold, dtype=np.int64)
+    indices[0] = 0
+    a = 0
+    for i in range(threshold - 2):
+        start = int(i * every) + 1
+        end = int((i + 1) * every) + 1
+        next_end = min(int((i + 2) * every) + 1, n)
+
+        # 下一個桶子的平均點作為三角形的第三個頂點
+        avg_x = x[end:next_end].mean()
+        avg_y = y[end:next_end].mean()
+
+        areas = np.abs(
+            (x[a] - avg_x) * (y[start:end] - y[a])
+            - (x[a] - x[start:end]) * (avg_y - y[a])
+        )
+        a = start + int(np.argmax(areas))
+        indices[i + 1] = a
+    indices[-1] = n - 1
+    return indices
+
+def downsample_series(dates, values, threshold: int = CHART_MAX_POINTS):
+    """
+    將日期序列以 LTTB 降採樣，缺值（例如均線初期）會先移除
+    Returns:
+        (降採樣後的日期, 降採樣後的數值)
+    """
+    dates = np.asarray(dates)
+    values = np.asarray(values, dtype=float)
+    valid = ~np.isnan(values)
+    dates, values = dates[valid], values[valid]
+    x = dates.astype('datetime64[ns]').astype(np.int64).astype(float)
+    keep = lttb_indices(x, values, threshold)
+    return dates[keep], values[keep]
@@ -0,0 +1,210 @@
+import time
+import threading
+import functools
+from types import SimpleNamespace
+from bisect import bisect_left
+import pyarrow as pa
+from config.config import METRICS_LOG_INTERVAL
+from config.logger import setup_logging
+
+# 設置 logger
+logger = setup_logging()
+
+# 延遲直方圖的桶上界（毫秒），超過最後一個上界的值放在溢位桶
+LATENCY_BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000)
+
+
+class Histogram:
+    """固定桶的延遲直方圖，只保留各桶計數，記錄成本固定且不隨樣本數增加"""
+    def __init__(self, bounds=LATENCY_BUCKETS_MS):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+
+    def quantile(self, q: float) -> float:
+        """以樣本所在桶的上界估計分位數，落在溢位桶時回傳最大值"""
+        if self.count == 0:
+            return 0.0
+        rank = q * self.count
+        cumulative = 0
+        for bound, count in zip(self.bounds, self.counts):
+            cumulative += count
+            if cumulative >= rank:
+                return min(bound, self.max)
+        return self.max
+
+    def to_dict(self) -> dict:
+        return {
+            'count': self.count,
+            'mean_ms': self.total / self.count if self.count else 0.0,
+            'p50_ms': self.quantile(0.5),
+            'p95_ms': self.quantile(0.95),
+            'p99_ms': self.quantile(0.99),
+            'max_ms': self.max,
+            'buckets': {
+                f"le_{bound}": count for bound, count in zip(self.bounds, self.counts) if count
+            } | ({'overflow': self.counts[-1]} if self.counts[-1] else {}),
+        }
+
+
+class MetricsRegistry:
+    """
+    程序內共用的效能統計，依 (種類, 名稱) 記錄延遲直方圖、回傳筆數與位元組數
+    每隔 log_interval 秒將統計輸出為結構化 log
+    """
+    def __init__(self, log_interval: float = METRICS_LOG_INTERVAL):
+        self.log_interval = log_interval
+        self._lock = threading.Lock()
+        self._series = {}
+        self._logged_at = time.monotonic()
+
+    def record(self, kind: str, name: str, seconds: float, rows: int = None, nbytes: int = None):
+        """
+        記錄一次查詢或頁面渲染
+        Args:
+            kind: 種類（query / page）
+            name: 查詢或頁面名稱
+            seconds: 耗時秒數
+            rows: 回傳筆數
+            nbytes: 回傳資料的位元組數
+        """
+        with self._lock:
+            series = self._series.get((kind, name))
+            if series is None:
+                series = self._series[(kind, name)] = {'latency': Histogram(), 'rows': 0, 'bytes': 0}
+            series['latency'].observe(seconds * 1000)
+            series['rows'] += rows or 0
+            series['bytes'] += nbytes or 0
+            due = time.monotonic() - self._logged_at >= self.log_interval
+            if due:
+                self._logged_at = time.monotonic()
+        if due:
+            self.log_summary()
+
+    def snapshot(self) -> list:
+        """目前所有統計，每個 (種類, 名稱) 一筆"""
+        with self._lock:
+            return [
+                {'kind': kind, 'name': name, **series['latency'].to_dict(),
+                 'rows': series['rows'], 'bytes': series['bytes']}
+                for (kind, name), series in sorted(self._series.items())
+            ]
+
+    def log_summary(self):
+        """將統計輸出為結構化 log（Cloud Logging 中為 jsonPayload）"""
+        for entry in self.snapshot():
+            logger.info(
+                f"metrics {entry['kind']}={entry['name']} count={entry['count']} "
+                f"p50={entry['p50_ms']:.0f}ms p95={entry['p95_ms']:.0f}ms max={entry['max_ms']:.0f}ms "
+                f"rows={entry['rows']} bytes={entry['bytes']}",
+                extra={'json_fields': {'event': 'metrics', **entry}}
+            )
+
+    def reset(self):
+        with self._lock:
+            self._series.clear()
+
+
+# 程序內共用的統計
+metrics = MetricsRegistry()
+
+
+def instrument_page(name: str):
+    """記錄元件 render 函數耗時的裝飾器"""
+    def decorator(render):
+        @functools.wraps(render)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return render(*args, **kwargs)
+            finally:
+                metrics.record('page', name, time.perf_counter() - started)
+        return wrapper
+    return decorator
+
+
+class TimedCursor:
+    """
+    包裝 DuckDB cursor，量測每個查詢從 execute 到取回結果的耗時，連同結果交給 on_query 記錄
+    其餘屬性（description、register 等）直接轉給原本的 cursor
+    """
+    def __init__(self, cursor, name: str, on_query):
+        self._cursor = cursor
+        self._name = name
+        self._on_query = on_query
+        self._sql = None
+        self._params = None
+        self._started = None
+
+    def execute(self, sql: str, params=None):
+        self._sql, self._params = sql, params
+        self._started = time.perf_counter()
+        if params is None:
+            self._cursor.execute(sql)
+        else:
+            self._cursor.execute(sql, params)
+        return self
+
+    def _finish(self, rows: int, result):
+        if self._started is None:
+            return
+        seconds = time.perf_counter() - self._started
+        self._started = None
+        self._on_query(self._name, self._sql, self._params, seconds, rows, result)
+
+    def fetchdf(self):
+        result = self._cursor.fetchdf()
+        self._finish(len(result), result)
+        return result
+
+    def fetch_arrow_table(self):
+        result = self._cursor.fetch_arrow_table()
+        self._finish(result.num_rows, result)
+        return result
+
+    def fetchall(self):
+        result = self._cursor.fetchall()
+        self._finish(len(result), result)
+        return result
+
+    def fetchone(self):
+        result = self._cursor.fetchone()
+        self._finish(int(result is not None), result)
+        return result
+
+    def fetchnumpy(self):
+        result = self._cursor.fetchnumpy()
+        self._finish(len(next(iter(result.values()), ())), result)
+        return result
+
+    def fetch_record_batch(self, rows_per_batch: int = 1000000):
+        """
+        串流讀取結果，最後一個 batch 讀完時才記錄，耗時包含呼叫端處理各 batch 的時間
+        沒有讀完就丟棄的 reader 不會被記錄
+        """
+        reader = self._cursor.fetch_record_batch(rows_per_batch)
+        query = (self._sql, self._params, self._started)
+        self._started = None
+        return pa.RecordBatchReader.from_batches(reader.schema, self._record_batches(reader, *query))
+
+    def _record_batches(self, reader, sql, params, started):
+        rows = nbytes = 0
+        for batch in reader:
+            rows += batch.num_rows
+            nbytes += batch.nbytes
+            yield batch
+        if started is not None:
+            # 各 batch 已交給呼叫端，只回報累計的大小
+            self._on_query(self._name, sql, params, time.perf_counter() - started, rows,
+                           SimpleNamespace(nbytes=nbytes))
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
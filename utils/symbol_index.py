@@ -0,0 +1,169 @@
+import sys
+import unicodedata
+from bisect import bisect_left, bisect_right
+
+# 各種比對方式的排序，數字越小越前面
+MATCH_EXACT = 0           # 代碼或名稱完全相同
+MATCH_ID_PREFIX = 1       # 代碼開頭相同
+MATCH_NAME_PREFIX = 2     # 名稱開頭相同
+MATCH_SUBSTRING = 3       # 代碼或名稱包含輸入
+MATCH_FUZZY_ORDERED = 4   # 名稱依序包含輸入的每個字，例如「台積」對「台灣積體電路」
+MATCH_FUZZY = 5           # 名稱包含輸入的每個字，順序不同
+MATCH_INDUSTRY = 6        # 產業別包含輸入
+
+# 子字串索引中分隔代碼、名稱與產業別的字元，輸入會先移除這些字元，比對結果不會跨欄位或跨股票
+_FIELD_SEPARATOR = '\x00'
+_ROW_SEPARATOR = '\x01'
+
+
+def normalize(text) -> str:
+    """比對用的字串：全形轉半形、英文轉小寫、移除空白"""
+    if text is None:
+        return ''
+    text = unicodedata.normalize('NFKC', str(text)).casefold()
+    return ''.join(text.split()).replace(_FIELD_SEPARATOR, '').replace(_ROW_SEPARATOR, '')
+
+
+class SymbolIndex:
+    """
+    股票代碼、名稱與產業別的記憶體索引，建立後不再修改，可由多個 session 共用
+    - 前綴：代碼與名稱各自排序，以二分搜尋找出範圍
+    - 子字串：全部股票串成一個字串，以 str.find 在 C 層搜尋
+    - 模糊：名稱中每個字對應的股票集合，取交集後再檢查字的順序
+    """
+    def __init__(self, stock_ids, stock_names, industries):
+        # 依代碼排序，子字串比對依序找到的結果即為代碼順序
+        rows = sorted(zip(map(str, stock_ids), stock_names, industries))
+        self.stock_ids = [stock_id for stock_id, _, _ in rows]
+        self.stock_names = [name or '' for _, name, _ in rows]
+        self.industries = [industry or '' for _, _, industry in rows]
+        self._rows = {stock_id: row for row, stock_id in enumerate(self.stock_ids)}
+
+        ids = [normalize(stock_id) for stock_id in self.stock_ids]
+        names = [normalize(name) for name in self.stock_names]
+        self._names = names
+        self._exact = {}
+        for row, (stock_id, name) in enumerate(zip(ids, names)):
+            self._exact.setdefault(stock_id, row)
+            if name:
+                self._exact.setdefault(name, row)
+
+        self._id_keys = sorted((stock_id, row) for row, stock_id in enumerate(ids))
+        self._name_keys = sorted((name, row) for row, name in enumerate(names) if name)
+
+        # 每檔股票在子字串索引中的起點，以及產業別的起點（用來區分比對到的欄位）
+        parts = []
+        self._starts, self._industry_starts = [], []
+        offset = 0
+        for stock_id, name, industry in zip(ids, names, self.industries):
+            self._starts.append(offset)
+            self._industry_starts.append(offset + len(stock_id) + len(name) + 2)
+            part = f"{stock_id}{_FIELD_SEPARATOR}{name}{_FIELD_SEPARATOR}{normalize(industry)}{_ROW_SEPARATOR}"
+            parts.append(part)
+            offset += len(part)
+        self._text = ''.join(parts)
+
+        self._char_rows = {}
+        for row, name in enumerate(names):
+            for char in set(name):
+                self._char_rows.setdefault(char, set()).add(row)
+
+    def __len__(self):
+        return len(self.stock_ids)
+
+    @property
+    def nbytes(self) -> int:
+        """估計佔用的記憶體，供查詢快取計算容量"""
+        per_row = sum(sys.getsizeof(value) for value in (
+            self.stock_ids[:1] + self.stock_names[:1] + self.industries[:1] + self._names[:1]
+        )) + 200
+        return sys.getsizeof(self._text) + per_row * len(self) + 100 * len(self._char_rows)
+
+    def name(self, stock_id: str) -> str:
+        """股票名稱，不存在時為空字串"""
+        row = self._rows.get(stock_id)
+        return '' if row is None else self.stock_names[row]
+
+    def industry(self, stock_id: str) -> str:
+        """產業別，不存在時為空字串"""
+        row = self._rows.get(stock_id)
+        return '' if row is None else self.industries[row]
+
+    def label(self, stock_id: str) -> str:
+        """顯示用的「代碼 名稱」"""
+        return f"{stock_id} {self.name(stock_id)}".strip()
+
+    def resolve(self, query: str):
+        """代碼或名稱完全相同的股票代碼，沒有時回傳 None"""
+        row = self._exact.get(normalize(query))
+        return None if row is None else self.stock_ids[row]
+
+    def search(self, query: str, limit: int = None, industry: bool = True) -> list:
+        """
+        依相符程度排序的股票代碼，同一種比對方式依代碼排序
+        Args:
+            query: 輸入的代碼、名稱或名稱中的部分字
+            limit: 最多回傳的筆數，None 為全部
+            industry: 是否也比對產業別
+        """
+        return [self.stock_ids[row] for _, row in self._search(normalize(query), limit, industry)]
+
+    def _search(self, query: str, limit, industry: bool) -> list:
+        if not query:
+            return []
+        found = {}
+
+        def add(row, kind):
+            if row not in found:
+                found[row] = kind
+
+        def full():
+            return limit is not None and len(found) >= limit
+
+        # 完全相同與前綴
+        exact = self._exact.get(query)
+        if exact is not None:
+            add(exact, MATCH_EXACT)
+        for keys, kind in ((self._id_keys, MATCH_ID_PREFIX), (self._name_keys, MATCH_NAME_PREFIX)):
+            start = bisect_left(keys, (query,))
+            end = bisect_right(keys, (query + '\U0010ffff',))
+            for _, row in keys[start:end]:
+                add(row, kind)
+
+        # 子字串：股票依代碼排序，比對到後直接跳到下一檔股票，取到 limit 筆即可停止
+        industry_rows = []
+        position = self._text.find(query)
+        while position != -1 and not full():
+            row = bisect_right(self._starts, position) - 1
+            if position < self._industry_starts[row]:
+                add(row, MATCH_SUBSTRING)
+            elif industry:
+                industry_rows.append(row)
+            if row + 1 == len(self._starts):
+                break
+            position = self._text.find(query, self._starts[row + 1])
+
+        # 模糊：名稱包含輸入的每個字
+        if not full():
+            chars = set(query)
+            candidates = None
+            for char in sorted(chars, key=lambda c: len(self._char_rows.get(c, ()))):
+                rows = self._char_rows.get(char)
+                if not rows:
+                    candidates = set()
+                    break
+                candidates = set(rows) if candidates is None else candidates & rows
+                if not candidates:
+                    break
+            for row in sorted(candidates or (), key=self.stock_ids.__getitem__):
+                if row in found:
+                    continue
+                remaining = iter(self._names[row])
+                ordered = all(char in remaining for char in query)
+                add(row, MATCH_FUZZY_ORDERED if ordered else MATCH_FUZZY)
+
+        for row in industry_rows:
+            add(row, MATCH_INDUSTRY)
+
+        matches = sorted(found.items(), key=lambda item: (item[1], self.stock_ids[item[0]]))
+        return [(kind, row) for row, kind in matches[:limit]]